@@ -1,7 +1,10 @@
 import pygame
 import sys
 import subprocess
-from database import Database
+from database import get_database, start_background_connect, database_status, DB_CONNECTING, DB_DEGRADED
+from async_database import AsyncDatabase, FrameTasks, wait_for_async_database
+from read_cache import ReadCache
+import asyncio
 import datetime
 import math
 
@@ -39,8 +42,18 @@ small_font = pygame.font.SysFont('timesnewroman', 20)
 tiny_font = pygame.font.SysFont('timesnewroman', 16)
 button_font = pygame.font.SysFont('timesnewroman', 20, bold=True)
 
-# Create database instance
-db = Database()
+# Shared database instance, opened in the background (as in main.py) so the
+# window draws at once; the first loads wait for it off the pygame thread
+start_background_connect()
+
+# Session history: rows per page (as many as fit on screen) and how many
+# pages stay in memory for paging back without a query
+HISTORY_ROW_HEIGHT = 44
+HISTORY_ROWS = max(5, (SCREEN_HEIGHT - 340) // HISTORY_ROW_HEIGHT)
+HISTORY_CACHED_PAGES = 20
+
+# Search runs this long after the last keystroke, not on every one
+SEARCH_DEBOUNCE_MS = 300
 
 class Button:
     def __init__(self, x, y, width, height, text, color=BUTTON_COLOR, hover_color=BUTTON_HOVER):
@@ -71,6 +84,180 @@ class Button:
     def update_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
 
+class SessionHistory:
+    """Pages through a user's study sessions, newest first
+
+    Each page is fetched by the (start_time, id) of the last row on the page
+    before it, so a deep page costs the same one index seek as the first.
+    Pages already seen are kept in a small LRU, and the next page is loaded
+    in the background while the current one is on screen.
+    """
+    
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.pages = ReadCache(HISTORY_CACHED_PAGES, ttl=None)
+        self.reset(None)
+    
+    def reset(self, user_id):
+        """Forget every page, e.g. after switching user or refreshing"""
+        self.user_id = user_id
+        self.cursors = [None]  # cursors[n] is the (start_time, id) page n starts after
+        self.page = 0
+        self.rows = None  # current page, None while loading
+        self.loading = set()
+        self.pages.clear()
+    
+    def has_newer(self):
+        return self.page > 0
+    
+    def has_older(self):
+        return self.rows is not None and len(self.cursors) > self.page + 1
+    
+    def newer(self):
+        if self.has_newer():
+            self.show(self.page - 1)
+    
+    def older(self):
+        if self.has_older():
+            self.show(self.page + 1)
+    
+    def show(self, page):
+        self.page = page
+        found, rows = self.pages.get((self.user_id, self.cursors[page]))
+        if found:
+            self.rows = rows
+            self._prefetch()
+        else:
+            self.rows = None
+            self._load(page)
+    
+    def _load(self, page):
+        key = (self.user_id, self.cursors[page])
+        db = get_database()
+        if not db or key in self.loading:
+            return
+        self.loading.add(key)
+        self.tasks.start(AsyncDatabase(db).get_session_history(self.user_id, self.cursors[page], HISTORY_ROWS),
+                         lambda rows: self._loaded(page, key, rows), "Loading session history")
+    
+    def retry(self):
+        """Load the current page if it's missing and nothing is fetching it (call once per frame)
+
+        _load() skips a page while the database is connecting or offline;
+        this picks it up again once it's there.
+        """
+        if self.user_id is not None and self.rows is None and (self.user_id, self.cursors[self.page]) not in self.loading:
+            self._load(self.page)
+    
+    def _loaded(self, page, key, rows):
+        self.loading.discard(key)
+        if key[0] != self.user_id or len(self.cursors) <= page or self.cursors[page] != key[1]:
+            # Reset (or switched user) while this page was loading
+            return
+        if not rows and page > 0:
+            # The previous page happened to end exactly at the oldest session
+            del self.cursors[page:]
+            if self.page >= page:
+                self.show(page - 1)
+            return
+        self.pages.put(key, rows)
+        if len(rows) == HISTORY_ROWS and len(self.cursors) == page + 1:
+            self.cursors.append((rows[-1]['start_time'], rows[-1]['id']))
+        if page == self.page:
+            self.rows = rows
+            self._prefetch()
+    
+    def _prefetch(self):
+        """Start loading the page after the current one, unless it's already cached"""
+        if len(self.cursors) > self.page + 1:
+            key = (self.user_id, self.cursors[self.page + 1])
+            if key not in self.loading and not self.pages.get(key)[0]:
+                self._load(self.page + 1)
+
+class SearchBox:
+    """Search box in the header that searches sessions and todos as you type
+
+    A query goes out once typing pauses for SEARCH_DEBOUNCE_MS; answers to
+    queries that have since been retyped are dropped when they arrive.
+    """
+    
+    def __init__(self, tasks, x, y, width, height):
+        self.tasks = tasks
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = ""
+        self.active = False
+        self.user_id = None
+        self.results = None  # {'sessions': [...], 'todos': [...]}, None while searching
+        self._due = None  # pygame ticks at which to send the pending query
+        self._sequence = 0  # bumped per query, so only the latest one's answer is shown
+    
+    def showing(self):
+        """True while there is a query whose results replace the overview"""
+        return bool(self.text.strip())
+    
+    def set_user(self, user_id):
+        self.user_id = user_id
+        self._changed()
+    
+    def clear(self):
+        self.text = ""
+        self.active = False
+        self._changed()
+    
+    def handle_event(self, event):
+        """Take clicks on the box and keys typed into it; returns True if the event was used"""
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            self.active = self.rect.collidepoint(event.pos)
+            return self.active
+        if event.type != pygame.KEYDOWN or not self.active:
+            return False
+        if event.key == pygame.K_ESCAPE:
+            self.clear()
+        elif event.key == pygame.K_BACKSPACE:
+            self.text = self.text[:-1]
+            self._changed()
+        elif event.key == pygame.K_RETURN:
+            # Don't wait out the pause
+            self._due = pygame.time.get_ticks() if self.showing() else None
+        elif event.unicode and event.unicode.isprintable() and len(self.text) < 50:
+            self.text += event.unicode
+            self._changed()
+        return True
+    
+    def update(self):
+        """Send the pending query once typing has paused; call once per frame"""
+        if self._due is not None and pygame.time.get_ticks() >= self._due:
+            self._due = None
+            self._search()
+    
+    def _changed(self):
+        self._sequence += 1
+        self.results = None
+        self._due = pygame.time.get_ticks() + SEARCH_DEBOUNCE_MS if self.showing() else None
+    
+    def _search(self):
+        db = get_database()
+        if not db:
+            self.results = {'sessions': [], 'todos': []}
+            return
+        sequence = self._sequence
+        self.tasks.start(AsyncDatabase(db).search(self.user_id, self.text),
+                         lambda results: self._found(sequence, results), "Searching")
+    
+    def _found(self, sequence, results):
+        if sequence == self._sequence:
+            self.results = results
+    
+    def draw(self, screen):
+        color = HIGHLIGHT if self.active else DARK_PANEL
+        pygame.draw.rect(screen, TODO_ITEM_BG, self.rect, border_radius=10)
+        pygame.draw.rect(screen, color, self.rect, 2, border_radius=10)
+        if self.active:
+            text = small_font.render(self.text + "|", True, TEXT_COLOR)
+        else:
+            text = small_font.render(self.text or "Search sessions and tasks...", True, ACCENT_SILVER)
+        screen.blit(text, (self.rect.x + 12, self.rect.centery - text.get_height()//2))
+
 def get_current_user():
     """Get current user from file"""
     try:
@@ -84,17 +271,11 @@ def get_current_user():
         pass
     return 1, "Default User"
 
-def get_all_users():
+async def get_all_users():
     """Get all users from database"""
-    try:
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM users ORDER BY username")
-            users = cursor.fetchall()
-            cursor.close()
-            return users
-    except Exception as e:
-        print(f"Error loading users: {e}")
+    adb = await wait_for_async_database()
+    if adb:
+        return await adb.get_all_users()
     return []
 
 def switch_user(user_id, username):
@@ -122,14 +303,21 @@ def format_time(minutes):
         else:
             return f"{hours}h {mins}m"
 
-def get_personal_analytics(user_id):
-    """Get personal analytics data from database"""
-    if db.connection is None:
+async def get_personal_analytics(user_id):
+    """Get personal analytics data from database (awaitable, so the dashboard keeps drawing)"""
+    adb = await wait_for_async_database()
+    if not adb or not adb.db.is_connected():
         print("Database connection not available")
         return None
         
     try:
-        analytics = db.get_study_analytics(user_id)
+        # Loaded once here rather than on every frame in draw_analytics_dashboard
+        analytics, completed_tasks = await asyncio.gather(
+            adb.get_study_analytics(user_id),
+            adb.get_completed_todos(user_id, limit=10)
+        )
+        if analytics is not None:
+            analytics['completed_tasks'] = completed_tasks
         return analytics
     except Exception as e:
         print(f"Error getting analytics data: {e}")
@@ -213,7 +401,111 @@ def draw_mini_chart(screen, x, y, width, height, data_points, color=HIGHLIGHT):
         pygame.draw.circle(screen, color, point, 5)
         pygame.draw.circle(screen, TEXT_COLOR, point, 3)
 
-def draw_analytics_dashboard(screen, user_id, username, analytics, all_users=None, show_user_dropdown=False):
+def draw_session_history(screen, history):
+    """Draw the current page of session history as a table"""
+    panel_y = 150
+    panel_rect = pygame.Rect(50, panel_y, SCREEN_WIDTH - 100, HISTORY_ROWS * HISTORY_ROW_HEIGHT + 70)
+    
+    # Shadow
+    shadow = pygame.Rect(panel_rect.x + 5, panel_rect.y + 5, panel_rect.width, panel_rect.height)
+    pygame.draw.rect(screen, SHADOW_COLOR, shadow, border_radius=12)
+    
+    # Panel background
+    pygame.draw.rect(screen, PANEL_BG, panel_rect, border_radius=12)
+    pygame.draw.rect(screen, BORDER_COLOR, panel_rect, 2, border_radius=12)
+    
+    # Column headers
+    columns = [("Date", 0), ("Time", 220), ("Duration", 340), ("Focus", 480), ("Subject", 620), ("Notes", 820)]
+    for title, offset in columns:
+        header = small_font.render(title, True, HIGHLIGHT)
+        screen.blit(header, (panel_rect.x + 20 + offset, panel_y + 20))
+    
+    if history.rows is None:
+        status = database_status()
+        message = {DB_CONNECTING: "Connecting to database...", DB_DEGRADED: "Database offline"}.get(status, "Loading...")
+        loading_text = text_font.render(message, True, ACCENT_SILVER)
+        screen.blit(loading_text, loading_text.get_rect(center=panel_rect.center))
+    elif not history.rows:
+        empty_text = text_font.render("No study sessions yet", True, ACCENT_SILVER)
+        screen.blit(empty_text, empty_text.get_rect(center=panel_rect.center))
+    else:
+        notes_chars = max(10, (panel_rect.width - 860) // 10)
+        for i, session in enumerate(history.rows):
+            row_y = panel_y + 55 + i * HISTORY_ROW_HEIGHT
+            row_rect = pygame.Rect(panel_rect.x + 10, row_y, panel_rect.width - 20, HISTORY_ROW_HEIGHT - 6)
+            pygame.draw.rect(screen, TODO_ITEM_BG, row_rect, border_radius=8)
+            
+            start = session['start_time']
+            focus = session.get('focus_rating')
+            notes = session.get('notes') or ""
+            if len(notes) > notes_chars:
+                notes = notes[:notes_chars - 3] + "..."
+            cells = [
+                (start.strftime("%a %b %d, %Y"), TEXT_COLOR),
+                (start.strftime("%H:%M"), TEXT_COLOR),
+                (format_time(session.get('duration_minutes')), TEXT_COLOR),
+                ("★" * int(focus) if focus else "—", ACCENT_GOLD if focus else ACCENT_SILVER),
+                (session.get('subject_tag') or "—", TEXT_COLOR),
+                (notes, ACCENT_SILVER),
+            ]
+            for (text, color), (_, offset) in zip(cells, columns):
+                cell = small_font.render(text, True, color)
+                screen.blit(cell, (panel_rect.x + 20 + offset, row_y + 9))
+    
+    page_text = small_font.render(f"Page {history.page + 1}", True, ACCENT_SILVER)
+    screen.blit(page_text, (SCREEN_WIDTH//2 - page_text.get_width()//2, SCREEN_HEIGHT - 75))
+
+def draw_search_results(screen, search):
+    """Draw matching sessions and todos side by side, best matches first"""
+    panel_y = 150
+    panel_height = SCREEN_HEIGHT - panel_y - 50
+    column_width = (SCREEN_WIDTH - 130) // 2
+    results = search.results
+    sessions = results['sessions'] if results else []
+    todos = results['todos'] if results else []
+    row_height = 40
+    max_rows = (panel_height - 70) // row_height
+    
+    for index, (title, rows) in enumerate([("Sessions", sessions), ("Tasks", todos)]):
+        panel_rect = pygame.Rect(50 + index * (column_width + 30), panel_y, column_width, panel_height)
+        shadow = pygame.Rect(panel_rect.x + 5, panel_rect.y + 5, panel_rect.width, panel_rect.height)
+        pygame.draw.rect(screen, SHADOW_COLOR, shadow, border_radius=12)
+        pygame.draw.rect(screen, PANEL_BG, panel_rect, border_radius=12)
+        pygame.draw.rect(screen, BORDER_COLOR, panel_rect, 2, border_radius=12)
+        
+        header = text_font.render(f"{title} ({len(rows)})" if results else title, True, HIGHLIGHT)
+        screen.blit(header, (panel_rect.x + 20, panel_y + 15))
+        
+        if results is None:
+            message = text_font.render("Searching...", True, ACCENT_SILVER)
+            screen.blit(message, message.get_rect(center=panel_rect.center))
+            continue
+        if not rows:
+            message = text_font.render("No matches", True, ACCENT_SILVER)
+            screen.blit(message, message.get_rect(center=panel_rect.center))
+            continue
+        
+        text_chars = max(10, (column_width - 60) // 10)
+        for i, row in enumerate(rows[:max_rows]):
+            row_y = panel_y + 60 + i * row_height
+            row_rect = pygame.Rect(panel_rect.x + 10, row_y, panel_rect.width - 20, row_height - 6)
+            pygame.draw.rect(screen, TODO_ITEM_BG, row_rect, border_radius=8)
+            if title == "Sessions":
+                text = (f"{row['start_time'].strftime('%b %d, %Y')}  ·  {format_time(row.get('duration_minutes'))}"
+                        f"  ·  {row.get('subject_tag') or '—'}")
+                if row.get('notes'):
+                    text += f"  ·  {row['notes']}"
+                color = TEXT_COLOR
+            else:
+                text = ("✓ " if row['completed'] else "○ ") + row['task']
+                color = SUCCESS_GREEN if row['completed'] else TEXT_COLOR
+            if len(text) > text_chars:
+                text = text[:text_chars - 3] + "..."
+            cell = small_font.render(text, True, color)
+            screen.blit(cell, (row_rect.x + 10, row_y + 7))
+
+def draw_analytics_dashboard(screen, user_id, username, analytics, all_users=None, show_user_dropdown=False, loading=False,
+                             history=None, search=None):
     """Draw the enhanced analytics dashboard"""
     screen.fill(BACKGROUND)
     
@@ -280,6 +572,19 @@ def draw_analytics_dashboard(screen, user_id, username, analytics, all_users=Non
     date_text = tiny_font.render(datetime.datetime.now().strftime("%B %d, %Y"), True, ACCENT_SILVER)
     screen.blit(date_text, (SCREEN_WIDTH - 200, 90))
     
+    if search is not None:
+        draw_search_results(screen, search)
+        return
+    
+    if history is not None:
+        draw_session_history(screen, history)
+        return
+    
+    if loading and not analytics:
+        loading_text = header_font.render("Loading...", True, ACCENT_SILVER)
+        screen.blit(loading_text, (SCREEN_WIDTH//2 - loading_text.get_width()//2, SCREEN_HEIGHT//2 - 50))
+        return
+    
     if not analytics or not analytics.get('records'):
         # No data state - improved
         no_data_y = SCREEN_HEIGHT // 2 - 100
@@ -407,42 +712,8 @@ def draw_analytics_dashboard(screen, user_id, username, analytics, all_users=Non
     pygame.draw.rect(screen, PANEL_BG, tasks_panel, border_radius=12)
     pygame.draw.rect(screen, BORDER_COLOR, tasks_panel, 2, border_radius=12)
     
-    # Get tasks from database
-    completed_tasks = []
-    if db and db.connection:
-        try:
-            cursor = db.connection.cursor(dictionary=True)
-            
-            # Try to get tasks with completed_at column
-            try:
-                query = """
-                    SELECT task, completed_at 
-                    FROM todos 
-                    WHERE user_id = %s 
-                    AND completed = 1 
-                    ORDER BY id DESC
-                    LIMIT 10
-                """
-                cursor.execute(query, (user_id,))
-                completed_tasks = cursor.fetchall()
-            except:
-                # Fallback if completed_at doesn't exist - just get completed tasks
-                query = """
-                    SELECT task
-                    FROM todos 
-                    WHERE user_id = %s 
-                    AND completed = 1 
-                    ORDER BY id DESC
-                    LIMIT 10
-                """
-                cursor.execute(query, (user_id,))
-                completed_tasks = cursor.fetchall()
-            
-            cursor.close()
-            
-        except Exception as e:
-            print(f"Error loading tasks: {e}")
-            completed_tasks = []
+    # Tasks loaded alongside the rest of the analytics
+    completed_tasks = analytics.get('completed_tasks', [])
     
     # Draw tasks inside panel
     if completed_tasks and len(completed_tasks) > 0:
@@ -499,17 +770,47 @@ def main():
     # Get current user
     user_id, username = get_current_user()
     
-    # Get all users for dropdown
-    all_users = get_all_users()
+    # Database reads run in the background; results are picked up each frame
+    tasks = FrameTasks()
+    state = {'analytics': None, 'all_users': [], 'loading_user': user_id}
+    
+    def load_analytics(for_user):
+        state['loading_user'] = for_user
+        
+        def loaded(result):
+            # Ignore a slow answer for a user we've already switched away from
+            if state['loading_user'] == for_user:
+                state['analytics'] = result
+                state['loading_user'] = None
+        tasks.start(get_personal_analytics(for_user), loaded, "Loading analytics")
+    
+    def load_users():
+        tasks.start(get_all_users(), lambda users: state.update(all_users=users), "Loading users")
+    
+    # Session history, shown instead of the overview when toggled on
+    history = SessionHistory(tasks)
+    show_history = False
     
-    # Get analytics data
-    analytics = get_personal_analytics(user_id)
+    def load_history(for_user):
+        history.reset(for_user)
+        history.show(0)
+    
+    # Search box; while it holds a query its results are shown instead
+    search = SearchBox(tasks, SCREEN_WIDTH - 760, 35, 400, 40)
+    search.set_user(user_id)
+    
+    # Get all users for dropdown, and analytics data
+    load_users()
+    load_analytics(user_id)
     
     clock = pygame.time.Clock()
     
     # Create buttons
     back_button = Button(30, 30, 140, 50, "← Back")
     refresh_button = Button(SCREEN_WIDTH - 170, 30, 140, 50, "Refresh")
+    history_button = Button(SCREEN_WIDTH - 340, 30, 140, 50, "History")
+    newer_button = Button(SCREEN_WIDTH//2 - 230, SCREEN_HEIGHT - 90, 140, 50, "← Newer")
+    older_button = Button(SCREEN_WIDTH//2 + 90, SCREEN_HEIGHT - 90, 140, 50, "Older →")
     
     # Dropdown state
     show_user_dropdown = False
@@ -526,6 +827,8 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif search.handle_event(event):
+                pass
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if back_button.is_clicked(mouse_pos):
                     pygame.quit()
@@ -534,8 +837,22 @@ def main():
                     except Exception as e:
                         return
                 elif refresh_button.is_clicked(mouse_pos):
-                    analytics = get_personal_analytics(user_id)
-                    all_users = get_all_users()
+                    load_analytics(user_id)
+                    load_users()
+                    search.set_user(user_id)
+                    if show_history:
+                        load_history(user_id)
+                    else:
+                        history.reset(None)
+                elif history_button.is_clicked(mouse_pos):
+                    show_history = not show_history
+                    history_button.text = "Overview" if show_history else "History"
+                    if show_history and history.user_id != user_id:
+                        load_history(user_id)
+                elif show_history and not search.showing() and newer_button.is_clicked(mouse_pos):
+                    history.newer()
+                elif show_history and not search.showing() and older_button.is_clicked(mouse_pos):
+                    history.older()
                 
                 # Check user dropdown toggle
                 elif user_dropdown_rect and user_dropdown_rect.collidepoint(mouse_pos):
@@ -550,22 +867,52 @@ def main():
                                 if switch_user(uid, uname):
                                     user_id = uid
                                     username = uname
-                                    analytics = get_personal_analytics(user_id)
+                                    state['analytics'] = None
+                                    load_analytics(user_id)
+                                    search.set_user(user_id)
+                                    if show_history:
+                                        load_history(user_id)
+                                    else:
+                                        history.reset(None)
                             show_user_dropdown = False
                             break
                 else:
                     # Click outside dropdown - close it
                     show_user_dropdown = False
+            elif event.type == pygame.MOUSEWHEEL and show_history and not search.showing():
+                # Wheel up pages towards newer sessions, down towards older ones
+                if event.y > 0:
+                    history.newer()
+                elif event.y < 0:
+                    history.older()
+        
+        search.update()
+        if show_history:
+            history.retry()
+        tasks.poll()
         
         # Update button hover states
         back_button.update_hover(mouse_pos)
         refresh_button.update_hover(mouse_pos)
+        history_button.update_hover(mouse_pos)
+        newer_button.update_hover(mouse_pos)
+        older_button.update_hover(mouse_pos)
         
         # Draw everything with error handling
         try:
-            draw_analytics_dashboard(screen, user_id, username, analytics, all_users, show_user_dropdown)
+            draw_analytics_dashboard(screen, user_id, username, state['analytics'], state['all_users'],
+                                     show_user_dropdown, loading=state['loading_user'] is not None,
+                                     history=history if show_history else None,
+                                     search=search if search.showing() else None)
             back_button.draw(screen)
             refresh_button.draw(screen)
+            history_button.draw(screen)
+            search.draw(screen)
+            if show_history and not search.showing():
+                if history.has_newer():
+                    newer_button.draw(screen)
+                if history.has_older():
+                    older_button.draw(screen)
         except Exception as e:
             # If drawing fails, show error message
             screen.fill(BACKGROUND)
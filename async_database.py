@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import threading
+
+from database import get_database, wait_for_database
+
+# Threads running blocking Database calls for the async API; kept at or
+# below pool_size so waiting calls queue here instead of holding a pygame frame
+DEFAULT_WORKERS = 2
+
+_executor = None
+_loop = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the bounded thread pool shared by every AsyncDatabase"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="db-async")
+        return _executor
+
+
+def get_loop():
+    """Return the event loop that runs awaitables started from pygame loops, starting it on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="db-event-loop", daemon=True).start()
+        return _loop
+
+
+class AsyncDatabase:
+    """Awaitable mirror of a Database: await adb.get_todos(user_id) instead of db.get_todos(user_id)
+
+    Each call runs the blocking method on the shared bounded executor, so
+    the event loop (and the screen drawing from it) never waits on MySQL.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_executor(), functools.partial(method, *args, **kwargs))
+        return call
+
+
+def get_async_database():
+    """Return an AsyncDatabase over the shared Database, or None if there isn't one"""
+    db = get_database()
+    return AsyncDatabase(db) if db else None
+
+
+async def wait_for_async_database():
+    """Await the shared Database's first connect attempt without blocking the loop
+
+    Returns an AsyncDatabase over it, or None if it's unavailable.
+    """
+    db = await asyncio.get_running_loop().run_in_executor(None, wait_for_database)
+    return AsyncDatabase(db) if db else None
+
+
+class FrameTasks:
+    """Runs awaitables for a pygame loop, which can't await them itself
+
+    start() schedules a coroutine and returns at once; call poll() once per
+    frame and each finished coroutine's on_done(result) runs there, on the
+    pygame thread, so callbacks can touch UI state freely.
+    """
+
+    def __init__(self):
+        self._tasks = []  # (concurrent.futures.Future, on_done, description)
+
+    def start(self, coro, on_done, description="Loading"):
+        future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+        self._tasks.append((future, on_done, description))
+        return future
+
+    def busy(self):
+        """True while anything started here is still running"""
+        return any(not future.done() for future, _, _ in self._tasks)
+
+    def poll(self):
+        """Hand finished results to their callbacks"""
+        # One done() per task, so one finishing mid-poll lands in exactly one list
+        finished, pending = [], []
+        for task in self._tasks:
+            (finished if task[0].done() else pending).append(task)
+        if not finished:
+            return
+        self._tasks = pending
+        for future, on_done, description in finished:
+            try:
+                on_done(future.result())
+            except Exception as e:
+                print(f"{description} failed: {e}")
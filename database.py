@@ -1,43 +1,791 @@
 import mysql.connector
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import functools
+import gzip
 import hashlib
+import json
 import os
+import random
+import threading
 import time
+import uuid
+import weakref
+
+import migrations
+import query_stats
+import read_cache
+import replicas
+import text_search
+
+CONFIG_FILE = "mysql_config.json"
+
+DEFAULT_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'focus_app',
+    'port': 3306,
+    'auth_plugin': 'mysql_native_password'
+}
+
+# The config the app last connected with; startup falls back to it when
+# mysql_config.json has been edited into one that doesn't connect
+LAST_GOOD_CONFIG_FILE = "last_good_config.json"
+STARTUP_CONNECT_TIMEOUT = 3  # seconds the startup probe waits for a MySQL server to answer
+RECONNECT_INTERVAL = 30  # seconds between background attempts while the database is unavailable
+# Every other connection (pooled, replica, setup) gives up on a silent server after this,
+# instead of the OS's TCP timeout; a connection_timeout in mysql_config.json wins
+DEFAULT_CONNECTION_TIMEOUT = 5  # seconds
+
+# Client errors meaning no server answered at all (host down, refused, unknown host, dropped)
+UNREACHABLE_ERRNOS = (2002, 2003, 2005, 2013)
+# Server errors that retrying the same connection can't fix: access denied, unknown database
+NO_RETRY_ERRNOS = (1045, 1049)
+
+# database_status() values
+DB_CONNECTING = 'connecting'
+DB_AVAILABLE = 'available'
+DB_DEGRADED = 'degraded'  # no database; writes go to the offline journal
+
+# Keys in mysql_config.json that configure the app, not mysql.connector.connect()
+APP_CONFIG_KEYS = (
+    'pool_size', 'pool_timeout', 'analytics_mode', 'backend', 'sqlite_path',
+    'slow_query_ms', 'query_stats_at_exit', 'keepalive_interval', 'prepared_statements',
+    'cache_size', 'cache_ttl', 'session_retention_months', 'session_compaction_months', 'shards',
+    'read_replicas', 'replica_max_lag',
+)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_TIMEOUT = 10  # seconds to wait for a free connection
+
+# Idle connections are pinged (and reconnected if the server dropped them,
+# e.g. after wait_timeout) before being handed out again
+PING_AFTER_IDLE = 30  # seconds
+DEFAULT_KEEPALIVE_INTERVAL = 300  # seconds between background pings; 0 turns them off
+
+# Idempotent methods re-run after losing their connection mid-call
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # seconds; doubled each attempt, with full jitter
+
+# How get_study_analytics sends its queries:
+#   'sequential' - one after another on one connection
+#   'batch'      - one multi-statement round trip
+#   'parallel'   - fanned out over pooled connections
+ANALYTICS_MODES = ('sequential', 'batch', 'parallel')
+DEFAULT_ANALYTICS_MODE = 'sequential'
+
+# Hot reads on study_sessions are bounded by start_time so MySQL only
+# touches the newest monthly partitions
+RECENT_SESSIONS_DAYS = 90
+SUBJECTS_DAYS = 365
+EARLIEST_SESSION = datetime(1970, 1, 1)
+
+# get_session_history() pages newest first; before=None starts above every session
+HISTORY_PAGE_SIZE = 20
+LATEST_SESSION = (datetime(9999, 12, 31), 0)
+
+SEARCH_LIMIT = 20  # results of each kind returned by search()
+
+# archive_old_sessions() moves sessions older than this to study_sessions_archive
+DEFAULT_SESSION_RETENTION_MONTHS = 24
+
+# compact_old_sessions() folds sessions older than this into study_subject_rollup
+# and deletes them; kept past the archive window so archived months stay browsable
+DEFAULT_SESSION_COMPACTION_MONTHS = 36
+COMPACT_BATCH_SIZE = 500  # sessions per compaction transaction (whole days, so a busy day may exceed it)
+
+
+# Hot statements, shared by the Database methods below and by
+# check_query_plans() so the EXPLAIN check always sees the real SQL.
+# Every read is a range or ref lookup on a primary key or an index from
+# migration 4. Other backends swap in their own dialect via Database.queries.
+QUERIES = {
+    # Weekly study time (last 4 weeks), from the daily rollup
+    'weekly_data': """
+        SELECT 
+            YEARWEEK(day) DIV 100 as year,
+            YEARWEEK(day) MOD 100 as week,
+            SUM(total_minutes) as total_minutes,
+            SUM(session_count) as session_count,
+            SUM(focus_sum) / NULLIF(SUM(focus_count), 0) as avg_focus
+        FROM study_daily_rollup 
+        WHERE user_id = %s AND day >= %s
+        GROUP BY YEARWEEK(day)
+        ORDER BY year DESC, week DESC
+        LIMIT 4
+    """,
+    # Daily study time for last 7 days
+    'daily_data': """
+        SELECT 
+            day as date,
+            total_minutes as daily_minutes,
+            session_count as sessions,
+            focus_sum / NULLIF(focus_count, 0) as avg_focus
+        FROM study_daily_rollup 
+        WHERE user_id = %s AND day >= %s
+        ORDER BY date DESC
+    """,
+    # Lifetime records
+    'records': """
+        SELECT 
+            MAX(max_session) as longest_session,
+            SUM(total_minutes) / NULLIF(SUM(session_count), 0) as avg_session_length,
+            SUM(total_minutes) as total_study_time,
+            SUM(session_count) as total_sessions,
+            MAX(max_focus) as best_focus,
+            SUM(focus_sum) / NULLIF(SUM(focus_count), 0) as avg_focus_lifetime
+        FROM study_daily_rollup 
+        WHERE user_id = %s
+    """,
+    # Most productive day of week
+    'best_day': """
+        SELECT 
+            DAYNAME(day) as day_name,
+            SUM(total_minutes) / SUM(session_count) as avg_minutes,
+            SUM(session_count) as session_count
+        FROM study_daily_rollup 
+        WHERE user_id = %s
+        GROUP BY DAYNAME(day)
+        ORDER BY avg_minutes DESC
+        LIMIT 1
+    """,
+    # Subject/tag analysis over the last SUBJECTS_DAYS (not lifetime: older
+    # sessions are archived or compacted out of study_sessions). Not rolled
+    # up; served by idx_sessions_user_subject
+    'subjects': """
+        SELECT 
+            subject_tag,
+            SUM(duration_minutes) as total_time,
+            COUNT(*) as session_count,
+            AVG(focus_rating) as avg_focus
+        FROM study_sessions 
+        WHERE user_id = %s AND start_time >= %s AND subject_tag > ''
+        GROUP BY subject_tag
+        ORDER BY total_time DESC
+        LIMIT 5
+    """,
+    # Actual personal records from personal_records table
+    'personal_records': """
+        SELECT record_type, record_value, achieved_at 
+        FROM personal_records 
+        WHERE user_id = %s
+    """,
+    'recent_sessions': """
+        SELECT 
+            start_time, duration_minutes, focus_rating, subject_tag, notes
+        FROM study_sessions 
+        WHERE user_id = %s AND start_time >= %s
+        ORDER BY start_time DESC 
+        LIMIT %s
+    """,
+    # One page of history, keyset-paginated on idx_sessions_history: seeks
+    # straight to the (start_time, id) after the previous page's last row, so
+    # page 500 costs the same as page 1 (OFFSET would read all rows before it)
+    'session_history': """
+        SELECT 
+            id, start_time, duration_minutes, focus_rating, subject_tag, notes
+        FROM study_sessions 
+        WHERE user_id = %s AND start_time <= %s AND (start_time < %s OR id < %s)
+        ORDER BY start_time DESC, id DESC 
+        LIMIT %s
+    """,
+    # The same page read from archived sessions, which are all older than live ones
+    'session_history_archive': """
+        SELECT 
+            id, start_time, duration_minutes, focus_rating, subject_tag, notes
+        FROM study_sessions_archive 
+        WHERE user_id = %s AND start_time <= %s AND (start_time < %s OR id < %s)
+        ORDER BY start_time DESC, id DESC 
+        LIMIT %s
+    """,
+    # Full-text search; both %s in MATCH are the same boolean-mode query from
+    # Database._search_terms (see _match_params). MATCH in WHERE makes the
+    # FULLTEXT index find the matching rows; the user and range filter those.
+    'search_sessions': """
+        SELECT 
+            session_id as id, start_time, duration_minutes, subject_tag, notes,
+            MATCH(subject_tag, notes) AGAINST (%s IN BOOLEAN MODE) as score
+        FROM study_session_search 
+        WHERE MATCH(subject_tag, notes) AGAINST (%s IN BOOLEAN MODE)
+            AND user_id = %s AND start_time >= %s AND start_time < %s
+        ORDER BY score DESC 
+        LIMIT %s
+    """,
+    'search_todos': """
+        SELECT 
+            id, task, completed, 
+            MATCH(task) AGAINST (%s IN BOOLEAN MODE) as score
+        FROM todos 
+        WHERE MATCH(task) AGAINST (%s IN BOOLEAN MODE) AND user_id = %s 
+        ORDER BY score DESC 
+        LIMIT %s
+    """,
+    # A search that only names a month: that month's sessions, newest first
+    'sessions_in_period': """
+        SELECT id, start_time, duration_minutes, subject_tag, notes, 0 as score
+        FROM study_sessions 
+        WHERE user_id = %s AND start_time >= %s AND start_time < %s
+        UNION ALL
+        SELECT id, start_time, duration_minutes, subject_tag, notes, 0 as score
+        FROM study_sessions_archive 
+        WHERE user_id = %s AND start_time >= %s AND start_time < %s
+        ORDER BY start_time DESC 
+        LIMIT %s
+    """,
+    'study_time_by_period': """
+        SELECT SUM(duration_minutes) 
+        FROM study_sessions 
+        WHERE user_id = %s AND start_time >= %s
+    """,
+    'todos': """
+        SELECT id, client_id, task, completed 
+        FROM todos 
+        WHERE user_id = %s 
+        ORDER BY created_at ASC
+    """,
+    'completed_todos': """
+        SELECT task 
+        FROM todos 
+        WHERE user_id = %s AND completed = 1 
+        ORDER BY id DESC 
+        LIMIT %s
+    """,
+    'blocked_sites': """
+        SELECT website FROM blocked_sites WHERE user_id = %s ORDER BY website
+    """,
+    'session_insert': """
+        INSERT INTO study_sessions 
+        (user_id, start_time, end_time, duration_minutes, focus_rating, subject_tag, distractions_count, notes, client_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    # Folds one day's new sessions into its study_daily_rollup row
+    'rollup_upsert': """
+        INSERT INTO study_daily_rollup 
+        (user_id, day, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_minutes = total_minutes + VALUES(total_minutes),
+            session_count = session_count + VALUES(session_count),
+            focus_sum = focus_sum + VALUES(focus_sum),
+            focus_count = focus_count + VALUES(focus_count),
+            max_session = GREATEST(max_session, VALUES(max_session)),
+            max_focus = COALESCE(GREATEST(max_focus, VALUES(max_focus)), max_focus, VALUES(max_focus))
+    """,
+    # Adds compacted sessions to their user/day/subject row
+    'subject_rollup_upsert': """
+        INSERT INTO study_subject_rollup 
+        (user_id, day, subject_tag, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_minutes = total_minutes + VALUES(total_minutes),
+            session_count = session_count + VALUES(session_count),
+            focus_sum = focus_sum + VALUES(focus_sum),
+            focus_count = focus_count + VALUES(focus_count),
+            max_session = GREATEST(max_session, VALUES(max_session)),
+            max_focus = COALESCE(GREATEST(max_focus, VALUES(max_focus)), max_focus, VALUES(max_focus))
+    """,
+    # Insert-or-update by the client's id, so replaying a change is harmless
+    'todo_upsert': """
+        INSERT INTO todos (user_id, client_id, task, completed)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE task = VALUES(task), completed = VALUES(completed)
+    """,
+    # Keeps the higher of the stored and new value, so no SELECT is needed first.
+    # achieved_at is assigned first because MySQL applies these left to right.
+    'record_upsert': """
+        INSERT INTO personal_records (user_id, record_type, record_value)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            achieved_at = IF(VALUES(record_value) > record_value, CURRENT_TIMESTAMP, achieved_at),
+            record_value = GREATEST(record_value, VALUES(record_value))
+    """,
+}
+
+# Tables written by Database.dump, parents before children so restore
+# never inserts a row before the user it points at
+BACKUP_TABLES = ('users', 'blocked_sites', 'todos', 'study_sessions', 'study_sessions_archive', 'personal_records',
+                 'study_daily_rollup', 'study_subject_rollup')
+BACKUP_FORMAT = "focus_app-dump"
+DUMP_FETCH_SIZE = 10000  # rows held in memory at once while dumping
+RESTORE_BATCH_SIZE = 5000  # rows per executemany
+RESTORE_COMMIT_ROWS = 100000  # rows per restore transaction
+
+
+def _json_value(value):
+    """Encode column values json can't: dates as MySQL-style strings, decimals as floats"""
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"Can't dump {type(value).__name__}")
+
+
+def load_config():
+    """Load MySQL settings from mysql_config.json, falling back to defaults"""
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r') as f:
+                return json.load(f)
+        except:
+            pass
+    return DEFAULT_CONFIG.copy()
+
+
+def connect_args(config):
+    """Strip app-only keys so the rest can be passed to mysql.connector.connect()"""
+    args = {key: value for key, value in config.items() if key not in APP_CONFIG_KEYS}
+    args.setdefault('connection_timeout', DEFAULT_CONNECTION_TIMEOUT)
+    return args
+
+
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections shared by every Database in this process"""
+
+    def __init__(self, config, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT):
+        self.config = config
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self._idle = []  # (connection, monotonic time it was released)
+        self._open = 0
+        self.schema_checked = False
+        self._keepalive = None
+        self._cond = threading.Condition()
+
+    def get_connection(self):
+        """Check out an idle connection, opening a new one while below pool size"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        f"No MySQL connection free after {self.timeout:g}s (pool_size={self.size})"
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+            else:
+                conn = None
+                self._open += 1
+
+        if conn is not None:
+            if time.monotonic() - idle_since < PING_AFTER_IDLE or self._alive(conn):
+                return conn
+            # Could not be revived; open a fresh one in its slot
+            self._close_quietly(conn)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _connect(self):
+        """Open a new connection (overridden by other backends)"""
+        return mysql.connector.connect(**self.config)
+
+    def _alive(self, conn):
+        """Ping conn, reconnecting it if the server closed it; False if that fails"""
+        try:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            self.discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a broken connection and free its slot"""
+        self._close_quietly(conn)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def ping_idle(self, min_idle):
+        """Ping connections idle for at least min_idle seconds, dropping any that are dead"""
+        now = time.monotonic()
+        with self._cond:
+            stale = [entry for entry in self._idle if now - entry[1] >= min_idle]
+            self._idle = [entry for entry in self._idle if now - entry[1] < min_idle]
+        for conn, _ in stale:
+            if self._alive(conn):
+                with self._cond:
+                    self._idle.append((conn, time.monotonic()))
+                    self._cond.notify()
+            else:
+                self.discard(conn)
+
+    def start_keepalive(self, interval):
+        """Ping idle connections from a daemon thread so the server never times them out"""
+        if interval <= 0 or self._keepalive is not None:
+            return
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.ping_idle(interval)
+                except Exception as e:
+                    print(f"Error keeping connections alive: {e}")
+
+        self._keepalive = threading.Thread(target=_run, name="db-keepalive", daemon=True)
+        self._keepalive.start()
+
+
+class PreparedCursor(query_stats.InstrumentedCursor):
+    """A connection's cached prepared cursor, lent out for one call
+
+    close() hands it back instead of deallocating the server-side statement.
+    """
+
+    def fetchone(self):
+        # Read to the end so the statement is ready for its next execute
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def close(self):
+        self._finish()
+
+
+# raw connection -> (connection_id, {(statement name, dictionary): prepared cursor});
+# entries go away with their connection
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def prepared_cursors(conn):
+    """The prepared cursor cache for a raw connection, emptied if it has reconnected since"""
+    connection_id = getattr(conn, 'connection_id', None)
+    with _prepared_lock:
+        entry = _prepared.get(conn)
+        if entry is None or entry[0] != connection_id:
+            # A reconnect (e.g. the pool's ping) dropped every statement on the server
+            entry = _prepared[conn] = (connection_id, {})
+        return entry[1]
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config):
+    """Return the process-wide pool for this config, creating it on first use"""
+    args = connect_args(config)
+    key = tuple(sorted((name, str(value)) for name, value in args.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                args,
+                config.get('pool_size', DEFAULT_POOL_SIZE),
+                config.get('pool_timeout', DEFAULT_POOL_TIMEOUT)
+            )
+            pool.start_keepalive(config.get('keepalive_interval', DEFAULT_KEEPALIVE_INTERVAL))
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """Close idle pooled connections (registered to run at exit)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
+
+
+def open_database(config=None):
+    """Create a Database for the backend named in the config ('mysql' or 'sqlite'), or a sharded one"""
+    config = config if config else load_config()
+    if config.get('shards'):
+        from sharding import ShardedDatabase
+        return ShardedDatabase(config)
+    if config.get('backend') == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(config)
+    return Database(config)
+
+
+def load_last_good_config():
+    """The config the app last connected with, or None"""
+    try:
+        with open(LAST_GOOD_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_last_good_config(config):
+    temp = LAST_GOOD_CONFIG_FILE + ".tmp"
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        os.replace(temp, LAST_GOOD_CONFIG_FILE)
+    except (OSError, TypeError) as e:
+        print(f"⚠️ Could not save {LAST_GOOD_CONFIG_FILE}: {e}")
+
+
+def server_reachable(config):
+    """True if config's MySQL server(s) answer within STARTUP_CONNECT_TIMEOUT
+    
+    Only says whether the server is up: a refused login or a missing
+    database still counts, since Database.connect() knows how to handle those.
+    """
+    if config.get('shards'):
+        from sharding import shard_configs
+        return all(server_reachable(shard) for shard in shard_configs(config))
+    if config.get('backend') == 'sqlite':
+        return True
+    args = dict(connect_args(config), connection_timeout=STARTUP_CONNECT_TIMEOUT)
+    try:
+        mysql.connector.connect(**args).close()
+        return True
+    except mysql.connector.Error as err:
+        if isinstance(err, mysql.connector.errors.InterfaceError) or err.errno in UNREACHABLE_ERRNOS:
+            print(f"⚠️ MySQL server {config.get('host', 'localhost')} is unreachable: {err}")
+            return False
+        return True
+
+
+def _open_first_working(config):
+    """Open config's database, falling back to the last config that connected; None if neither does
+    
+    A server that doesn't answer the quick probe is skipped, rather than
+    waiting out Database.connect()'s retries and password guesses.
+    """
+    last_good = load_last_good_config()
+    candidates = [config] + ([last_good] if last_good and last_good != config else [])
+    for candidate in candidates:
+        if not server_reachable(candidate):
+            continue
+        try:
+            db = open_database(candidate)
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            continue
+        if db.is_connected():
+            if candidate is last_good:
+                print(f"⚠️ {CONFIG_FILE} did not connect; using the last configuration that did")
+            save_last_good_config(candidate)
+            return db
+    return None
+
+
+_shared_db = None
+_shared_db_lock = threading.Lock()
+_db_status = DB_CONNECTING
+_connect_thread = None
+_first_attempt_done = threading.Event()
+
+
+def database_status():
+    """DB_CONNECTING until the shared Database has been tried, then DB_AVAILABLE or DB_DEGRADED"""
+    return _db_status
+
+
+def _set_shared_database(db):
+    global _shared_db, _db_status
+    _shared_db = db
+    _db_status = DB_AVAILABLE if db else DB_DEGRADED
+    _first_attempt_done.set()
+    if db:
+        print("✅ Database available")
+    else:
+        print(f"⚠️ Database unavailable; offline writes are kept and synced when it's back "
+              f"(retrying every {RECONNECT_INTERVAL}s)")
+
+
+def _connect_until_available(config):
+    while True:
+        db = _open_first_working(config or load_config())
+        with _shared_db_lock:
+            # Report going degraded once, not on every failed retry
+            if db or _db_status != DB_DEGRADED:
+                _set_shared_database(db)
+        if db:
+            return
+        time.sleep(RECONNECT_INTERVAL)
+
+
+def _start_connect_thread(config):
+    """Start _connect_until_available(config) unless it's already running; call with _shared_db_lock held"""
+    global _connect_thread
+    if _connect_thread is None and _shared_db is None:
+        _connect_thread = threading.Thread(target=_connect_until_available, args=(config,),
+                                           name="database-connect", daemon=True)
+        _connect_thread.start()
+
+
+def start_background_connect(config=None):
+    """Open the shared Database on a daemon thread, retrying while the server is down
+    
+    Returns at once, so the first window can be shown straight away; poll
+    database_status() to find out how it went. get_database() returns None
+    until it has connected.
+    """
+    with _shared_db_lock:
+        _start_connect_thread(config)
+
+
+def wait_for_database(timeout=None):
+    """Return the shared Database once the background connect has made its first attempt
+    
+    Starts that connect if nothing has yet. None if the attempt failed (or
+    timeout passed first); for a screen's first load, run off its UI thread.
+    """
+    start_background_connect()
+    _first_attempt_done.wait(timeout)
+    return _shared_db
+
+
+def clear_read_cache():
+    """Forget cached reads, e.g. after a subprocess screen has returned: it may have written"""
+    with _shared_db_lock:
+        db = _shared_db
+    if db:
+        db.clear_cache()
+
+
+def get_database():
+    """Return the Database shared by every screen in this process, or None while it's unavailable
+    
+    The first call opens it, waiting at most a few seconds if the server
+    is down; after that it is retried in the background and calls return
+    None at once until it's back.
+    """
+    with _shared_db_lock:
+        if _shared_db is None and _connect_thread is None:
+            _set_shared_database(_open_first_working(load_config()))
+            _start_connect_thread(None)
+        return _shared_db
+
+
+# Per-thread record of how the current Database call went: whether it hit a
+# database error at all, and whether that error lost the connection
+_call_state = threading.local()
+
+
+def idempotent(method):
+    """Re-run a Database method, after a jittered backoff, if its connection dropped mid-call
+
+    Only for methods that are safe to repeat: the methods catch and report
+    errors themselves, so _connection() flags a lost connection here instead.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_call_state, 'active', False):
+            # Nested call; the outermost one does the retrying
+            return method(self, *args, **kwargs)
+        _call_state.active = True
+        try:
+            for attempt in range(RETRY_ATTEMPTS):
+                _call_state.lost_connection = False
+                _call_state.failed = False
+                result = method(self, *args, **kwargs)
+                if not _call_state.lost_connection or attempt == RETRY_ATTEMPTS - 1:
+                    return result
+                delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+                print(f"Connection lost; retrying {method.__name__} in {delay:.1f}s...")
+                time.sleep(delay)
+        finally:
+            _call_state.active = False
+    return wrapper
+
+
+def cached(method):
+    """Serve a Database read from self.cache, keyed by (method name, *args)
+
+    Writes invalidate the same keys. Results of calls that hit a database
+    error (the method's fallback value) are not stored, nor are results
+    read while a write invalidated the cache. The cache is per process:
+    after another process (screen) may have written, call clear_read_cache().
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__,) + args
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        generation = self.cache.generation
+        _call_state.failed = False
+        value = method(self, *args)
+        if not _call_state.failed:
+            self.cache.put(key, value, generation)
+        return value
+    return wrapper
+
 
 class Database:
+    # SQL dialect used by the methods below
+    queries = QUERIES
+    
+    # Statements that start a read-consistent dump, and wrap a bulk restore
+    SNAPSHOT_START = "START TRANSACTION WITH CONSISTENT SNAPSHOT"
+    BULK_LOAD_START = ("SET FOREIGN_KEY_CHECKS = 0", "SET UNIQUE_CHECKS = 0")
+    BULK_LOAD_END = ("SET FOREIGN_KEY_CHECKS = 1", "SET UNIQUE_CHECKS = 1")
+    
+    # Insert that skips rows whose unique key already exists
+    INSERT_IGNORE = "INSERT IGNORE"
+    
+    # Every table sessions live in; rollups are rebuilt from all of them
+    SESSION_TABLES = ('study_sessions', 'study_sessions_archive')
+    
     def __init__(self, config=None):
-        # Use provided config or default
-        if config:
-            self.config = config
-        else:
-            # Try to load from config file if exists
-            config_file = "mysql_config.json"
-            if os.path.exists(config_file):
-                try:
-                    import json
-                    with open(config_file, 'r') as f:
-                        config = json.load(f)
-                        self.config = config
-                except:
-                    self.config = {
-                        'host': 'localhost',
-                        'user': 'root',
-                        'password': '',
-                        'database': 'focus_app',
-                        'port': 3306,
-                        'auth_plugin': 'mysql_native_password'
-                    }
-            else:
-                self.config = {
-                    'host': 'localhost',
-                    'user': 'root',
-                    'password': '',
-                    'database': 'focus_app',
-                    'port': 3306,
-                    'auth_plugin': 'mysql_native_password'
-                }
+        # Use provided config or the saved one
+        self.config = config if config else load_config()
+        self.pool = None
+        self.cache = read_cache.ReadCache(
+            self.config.get('cache_size', read_cache.DEFAULT_CACHE_SIZE),
+            self.config.get('cache_ttl', read_cache.DEFAULT_CACHE_TTL)
+        )
+        query_stats.configure(self.config)
+        query_stats.get_stats().register_names(self.queries)
         
-        self.connection = None
+        # Read replicas: each entry overrides the primary's settings (usually just host)
+        self.replicas = [
+            replicas.Replica(f"{replica.get('host', self.config.get('host'))}:{replica.get('port', self.config.get('port', 3306))}",
+                             get_pool(dict(self.config, **replica)))
+            for replica in self.config.get('read_replicas', ())
+        ]
+        self.max_replica_lag = self.config.get('replica_max_lag', replicas.DEFAULT_REPLICA_MAX_LAG)
+        # Pinned long enough for any replica we'd read from to have caught up
+        self.read_pins = replicas.ReadPins(self.max_replica_lag + replicas.REPLICA_CHECK_INTERVAL)
         self.connect()
         
     def connect(self):
@@ -48,14 +796,17 @@ class Database:
         for attempt in range(max_retries):
             try:
                 print(f"Attempting to connect to MySQL database (attempt {attempt + 1}/{max_retries})...")
-                self.connection = mysql.connector.connect(**self.config)
+                self.pool = get_pool(self.config)
+                with self._connection():
+                    pass
                 print("✅ Connected to local MySQL database")
                 self.initialize_database()
                 return True
             except mysql.connector.Error as err:
                 print(f"❌ Database connection error: {err}")
+                self.pool = None
                 
-                if attempt < max_retries - 1:
+                if attempt < max_retries - 1 and err.errno not in NO_RETRY_ERRNOS:
                     print(f"Retrying in {retry_delay} seconds...")
                     time.sleep(retry_delay)
                 else:
@@ -64,6 +815,80 @@ class Database:
                     return self.create_database()
                     
         return False
+
+    def is_connected(self):
+        """True once a connection pool is available"""
+        return self.pool is not None
+    
+    def clear_cache(self):
+        self.cache.clear()
+
+    @contextmanager
+    def _connection(self, replica=None):
+        """Check a pooled connection out for the duration of a with-block (from replica's pool, if given)"""
+        if self.pool is None:
+            _call_state.failed = True
+            raise mysql.connector.errors.InterfaceError("Not connected to MySQL")
+        pool = replica.pool if replica else self.pool
+        try:
+            conn = pool.get_connection()
+        except mysql.connector.Error:
+            _call_state.failed = True
+            if replica:
+                # @idempotent's retry goes to the primary
+                _call_state.lost_connection = True
+                replica.mark_down()
+            raise
+        broken = False
+        try:
+            # Every statement run through the wrapper is timed into query_stats
+            yield query_stats.InstrumentedConnection(conn, query_stats.get_stats())
+        except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+            broken = True
+            _call_state.lost_connection = True
+            _call_state.failed = True
+            if replica:
+                replica.mark_down()
+            raise
+        except mysql.connector.Error:
+            _call_state.failed = True
+            raise
+        finally:
+            if broken:
+                pool.discard(conn)
+            else:
+                pool.release(conn)
+    
+    def _read_replica(self, user_id):
+        """Replica to serve a read of user_id's data from, or None to use the primary
+        
+        Only replicas within replica_max_lag of the primary qualify, and none
+        do for a user who wrote in the last few seconds (see ReadPins).
+        """
+        if not self.replicas or self.read_pins.is_pinned(user_id):
+            return None
+        fresh = [replica for replica in self.replicas if replica.usable(self.max_replica_lag)]
+        return random.choice(fresh) if fresh else None
+    
+    def _pin_reads(self, *user_ids):
+        """Send these users' reads to the primary until replicas have their latest write"""
+        if self.replicas:
+            for user_id in set(user_ids):
+                self.read_pins.pin(user_id)
+            
+    def _statement(self, conn, name, dictionary=False):
+        """Cursor for the hot statement queries[name], prepared once per connection and reused
+        
+        Pass self.queries[name] itself to execute(): the connector only skips
+        re-preparing when it gets the very same string.
+        """
+        if not self.config.get('prepared_statements', True):
+            return conn.cursor(dictionary=dictionary)
+        cursors = prepared_cursors(conn._raw)
+        cursor = cursors.get((name, dictionary))
+        if cursor is None:
+            cursor = cursors[(name, dictionary)] = conn._raw.cursor(prepared=True, dictionary=dictionary)
+        return PreparedCursor(cursor, query_stats.get_stats())
             
     def create_database(self):
         """Create database and tables if they don't exist"""
@@ -71,7 +896,7 @@ class Database:
             print("Attempting to create database...")
             
             # First, try to connect without database specified
-            temp_config = self.config.copy()
+            temp_config = connect_args(self.config)
             if 'database' in temp_config:
                 temp_config.pop('database')
             
@@ -120,70 +945,9 @@ class Database:
             cursor.execute("CREATE DATABASE IF NOT EXISTS focus_app")
             cursor.execute("USE focus_app")
             
-            # Create users table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INT PRIMARY KEY AUTO_INCREMENT,
-                    username VARCHAR(50) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create study_sessions table (enhanced for analytics)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS study_sessions (
-                    id INT PRIMARY KEY AUTO_INCREMENT,
-                    user_id INT NOT NULL,
-                    start_time DATETIME NOT NULL,
-                    end_time DATETIME,
-                    duration_minutes INT,
-                    focus_rating INT,  # 1-5 stars
-                    subject_tag VARCHAR(50),  # What were you studying?
-                    notes TEXT,
-                    distractions_count INT DEFAULT 0,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
-            
-            # Create blocked_sites table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS blocked_sites (
-                    id INT PRIMARY KEY AUTO_INCREMENT,
-                    user_id INT NOT NULL,
-                    website VARCHAR(255) NOT NULL,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    UNIQUE KEY unique_user_site (user_id, website)
-                )
-            """)
-            
-            # Create todos table for task management
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS todos (
-                    id INT PRIMARY KEY AUTO_INCREMENT,
-                    user_id INT NOT NULL,
-                    task VARCHAR(500) NOT NULL,
-                    completed BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
-            
-            # Create personal_records table for achievements
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS personal_records (
-                    id INT PRIMARY KEY AUTO_INCREMENT,
-                    user_id INT NOT NULL,
-                    record_type VARCHAR(50) NOT NULL,  # 'longest_session', 'best_focus', etc.
-                    record_value FLOAT NOT NULL,
-                    achieved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    UNIQUE KEY unique_user_record (user_id, record_type)
-                )
-            """)
+            # Create or upgrade every table
+            migrations.run_migrations(conn)
             
-            conn.commit()
             cursor.close()
             conn.close()
             
@@ -191,7 +955,7 @@ class Database:
             self.config['database'] = 'focus_app'
             
             # Now connect to the new database with updated config
-            self.connection = mysql.connector.connect(**self.config)
+            self.pool = get_pool(self.config)
             print("✅ Database and tables created successfully")
             return True
             
@@ -209,437 +973,1014 @@ class Database:
             return False
     
     def initialize_database(self):
-        """Initialize database by creating tables if they don't exist"""
-        cursor = self.connection.cursor()
-        
+        """Bring the schema up to date, skipping all DDL when schema_version is current"""
+        if self.pool.schema_checked:
+            # Another Database in this process already did the check
+            return
         try:
-            # Check if study_sessions table exists
-            cursor.execute("SHOW TABLES LIKE 'study_sessions'")
-            if not cursor.fetchone():
-                # Create all tables
-                self.create_database()
-            else:
-                # Check if study_sessions table has focus_rating column
-                cursor.execute("SHOW COLUMNS FROM study_sessions LIKE 'focus_rating'")
-                if not cursor.fetchone():
-                    # Add focus_rating column if it doesn't exist
-                    try:
-                        cursor.execute("ALTER TABLE study_sessions ADD COLUMN focus_rating INT")
-                        cursor.execute("ALTER TABLE study_sessions ADD COLUMN subject_tag VARCHAR(50)")
-                        cursor.execute("ALTER TABLE study_sessions ADD COLUMN distractions_count INT DEFAULT 0")
-                        self.connection.commit()
-                        print("✅ Added analytics columns to study_sessions table")
-                    except mysql.connector.Error as err:
-                        print(f"Note: Could not add columns (might already exist): {err}")
-                        
+            with self._connection() as conn:
+                version, partitions_until = migrations.schema_status(conn)
+                if version < migrations.LATEST_VERSION:
+                    migrations.run_migrations(conn)
+                elif migrations.partitions_due(partitions_until):
+                    # Months keep passing even when the schema doesn't change
+                    migrations.maintain_session_partitions(conn)
+            self.pool.schema_checked = True
         except mysql.connector.Error as err:
             print(f"Error checking tables: {err}")
             # Try to create database
             self.create_database()
-            
-        cursor.close()
+    
+    def _plan_samples(self, user_id):
+        """(key, sql, params) for every hot query, with realistic parameters"""
+        samples = [(key, sql, params) for key, sql, params, _ in self._analytics_queries(user_id)]
+        month_ago = datetime.now() - timedelta(days=30)
+        samples += [
+            ('recent_sessions', self.queries['recent_sessions'], (user_id, month_ago, 10)),
+            ('session_history', self.queries['session_history'], (user_id, month_ago, month_ago, 0, HISTORY_PAGE_SIZE)),
+            ('session_history_archive', self.queries['session_history_archive'],
+             (user_id, month_ago, month_ago, 0, HISTORY_PAGE_SIZE)),
+            ('study_time_by_period', self.queries['study_time_by_period'], (user_id, month_ago)),
+            ('search_sessions', self.queries['search_sessions'],
+             (*self._match_params(self._search_terms(['study'])), user_id, EARLIEST_SESSION, LATEST_SESSION[0],
+              SEARCH_LIMIT)),
+            ('search_todos', self.queries['search_todos'],
+             (*self._match_params(self._search_terms(['study'])), user_id, SEARCH_LIMIT)),
+            ('todos', self.queries['todos'], (user_id,)),
+            ('completed_todos', self.queries['completed_todos'], (user_id, 10)),
+            ('blocked_sites', self.queries['blocked_sites'], (user_id,)),
+        ]
+        return samples
+    
+    def check_query_plans(self, user_id):
+        """EXPLAIN every hot query and return the ones that fall back to a full table scan"""
+        samples = self._plan_samples(user_id)
+        
+        full_scans = []
+        with self._connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for key, sql, params in samples:
+                cursor.execute("EXPLAIN " + sql, params)
+                for step in cursor.fetchall():
+                    # type ALL = reads every row of the table
+                    if step['type'] == 'ALL' and not step['table'].startswith('<'):
+                        full_scans.append((key, step['table'], step['rows']))
+            cursor.close()
+        return full_scans
+    
+    def query_summary(self):
+        """Latency/row-count table for every statement this process has run"""
+        return query_stats.get_stats().format_summary()
     
     def hash_password(self, password):
         """Hash password for storage"""
         return hashlib.sha256(password.encode()).hexdigest()
     
-    def create_user(self, username, password):
-        """Create a new user"""
+    def create_user(self, username, password, user_id=None):
+        """Create a new user (with the given id, if any; sharding picks ids itself)"""
         try:
-            cursor = self.connection.cursor()
-            password_hash = self.hash_password(password)
-            
-            cursor.execute(
-                "INSERT INTO users (username, password_hash) VALUES (%s, %s)",
-                (username, password_hash)
-            )
-            self.connection.commit()
-            user_id = cursor.lastrowid
-            cursor.close()
-            return user_id
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                password_hash = self.hash_password(password)
+                
+                if user_id is None:
+                    cursor.execute(
+                        "INSERT INTO users (username, password_hash) VALUES (%s, %s)",
+                        (username, password_hash)
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO users (id, username, password_hash) VALUES (%s, %s, %s)",
+                        (user_id, username, password_hash)
+                    )
+                conn.commit()
+                user_id = cursor.lastrowid if user_id is None else user_id
+                cursor.close()
+                return user_id
         except mysql.connector.Error as err:
             print(f"Error creating user: {err}")
             return None
+        finally:
+            self.cache.invalidate(('get_all_users',), ('get_user_by_username', username))
     
+    @idempotent
     def verify_user(self, username, password):
         """Verify user credentials"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            password_hash = self.hash_password(password)
-            
-            cursor.execute(
-                "SELECT id, username FROM users WHERE username = %s AND password_hash = %s",
-                (username, password_hash)
-            )
-            user = cursor.fetchone()
-            cursor.close()
-            return user
+            with self._connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                password_hash = self.hash_password(password)
+                
+                cursor.execute(
+                    "SELECT id, username FROM users WHERE username = %s AND password_hash = %s",
+                    (username, password_hash)
+                )
+                user = cursor.fetchone()
+                cursor.close()
+                return user
         except mysql.connector.Error as err:
             print(f"Error verifying user: {err}")
             return None
     
+    @cached
+    @idempotent
     def get_user_by_username(self, username):
         """Get user by username"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(
-                "SELECT id, username, created_at FROM users WHERE username = %s",
-                (username,)
-            )
-            user = cursor.fetchone()
-            cursor.close()
-            return user
+            with self._connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "SELECT id, username, created_at FROM users WHERE username = %s",
+                    (username,)
+                )
+                user = cursor.fetchone()
+                cursor.close()
+                return user
+        except mysql.connector.Error as err:
+            print(f"Error getting user: {err}")
+            return None
+    
+    @cached
+    @idempotent
+    def get_user_by_id(self, user_id):
+        """Get user by id"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "SELECT id, username FROM users WHERE id = %s",
+                    (user_id,)
+                )
+                user = cursor.fetchone()
+                cursor.close()
+                return user
         except mysql.connector.Error as err:
             print(f"Error getting user: {err}")
             return None
     
+    @cached
+    @idempotent
     def get_all_users(self):
         """Get all users (for login screen)"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT id, username FROM users ORDER BY username")
-            users = cursor.fetchall()
-            cursor.close()
-            return users
+            with self._connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT id, username FROM users ORDER BY username")
+                users = cursor.fetchall()
+                cursor.close()
+                return users
         except mysql.connector.Error as err:
             print(f"Error getting users: {err}")
             return []
     
+    @idempotent
     def update_username(self, user_id, new_username):
         """Update username"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "UPDATE users SET username = %s WHERE id = %s",
-                (new_username, user_id)
-            )
-            self.connection.commit()
-            cursor.close()
-            return cursor.rowcount > 0
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE users SET username = %s WHERE id = %s",
+                    (new_username, user_id)
+                )
+                conn.commit()
+                updated = cursor.rowcount > 0
+                cursor.close()
+                return updated
         except mysql.connector.Error as err:
             print(f"Error updating username: {err}")
             return False
+        finally:
+            self._forget_user(user_id)
+            self.cache.invalidate(('get_user_by_username', new_username))
     
+    @idempotent
     def update_password(self, user_id, new_password):
         """Update password"""
         try:
-            cursor = self.connection.cursor()
-            password_hash = self.hash_password(new_password)
-            cursor.execute(
-                "UPDATE users SET password_hash = %s WHERE id = %s",
-                (password_hash, user_id)
-            )
-            self.connection.commit()
-            cursor.close()
-            return cursor.rowcount > 0
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                password_hash = self.hash_password(new_password)
+                cursor.execute(
+                    "UPDATE users SET password_hash = %s WHERE id = %s",
+                    (password_hash, user_id)
+                )
+                conn.commit()
+                updated = cursor.rowcount > 0
+                cursor.close()
+                return updated
         except mysql.connector.Error as err:
             print(f"Error updating password: {err}")
             return False
     
+    @idempotent
     def delete_user(self, user_id):
         """Delete user and all their data"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Delete in correct order (due to foreign keys)
-            cursor.execute("DELETE FROM blocked_sites WHERE user_id = %s", (user_id,))
-            cursor.execute("DELETE FROM study_sessions WHERE user_id = %s", (user_id,))
-            cursor.execute("DELETE FROM personal_records WHERE user_id = %s", (user_id,))
-            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-            
-            self.connection.commit()
-            cursor.close()
-            return True
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                # Delete in correct order (due to foreign keys)
+                cursor.execute("DELETE FROM blocked_sites WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM todos WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM study_sessions WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM study_sessions_archive WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM study_session_search WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM study_daily_rollup WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM study_subject_rollup WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM personal_records WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                
+                conn.commit()
+                cursor.close()
+                return True
         except mysql.connector.Error as err:
             print(f"Error deleting user: {err}")
             return False
+        finally:
+            self._forget_user(user_id)
+            self.cache.invalidate(('get_blocked_sites', user_id), ('get_todos', user_id))
+    
+    def _forget_user(self, user_id):
+        """Drop cached lookups of a user whose name changed or who was deleted"""
+        self.cache.invalidate(('get_all_users',), ('get_user_by_id', user_id))
+        self.cache.invalidate_where(
+            lambda key, value: key[0] == 'get_user_by_username' and value and value['id'] == user_id
+        )
     
     # Blocked sites management
     def add_blocked_site(self, user_id, website):
         """Add a website to block list"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "INSERT INTO blocked_sites (user_id, website) VALUES (%s, %s)",
-                (user_id, website)
-            )
-            self.connection.commit()
-            cursor.close()
-            return True
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO blocked_sites (user_id, website) VALUES (%s, %s)",
+                    (user_id, website)
+                )
+                conn.commit()
+                cursor.close()
+                return True
         except mysql.connector.Error as err:
             print(f"Error adding blocked site: {err}")
             return False
+        finally:
+            self.cache.invalidate(('get_blocked_sites', user_id))
     
+    @cached
+    @idempotent
     def get_blocked_sites(self, user_id):
         """Get all blocked sites for a user"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "SELECT website FROM blocked_sites WHERE user_id = %s ORDER BY website",
-                (user_id,)
-            )
-            sites = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            return sites
+            with self._connection() as conn:
+                cursor = self._statement(conn, 'blocked_sites')
+                cursor.execute(self.queries['blocked_sites'], (user_id,))
+                sites = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+                return sites
         except mysql.connector.Error as err:
             print(f"Error getting blocked sites: {err}")
             return []
     
+    @idempotent
     def remove_blocked_site(self, user_id, website):
         """Remove a website from block list"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "DELETE FROM blocked_sites WHERE user_id = %s AND website = %s",
-                (user_id, website)
-            )
-            self.connection.commit()
-            cursor.close()
-            return cursor.rowcount > 0
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "DELETE FROM blocked_sites WHERE user_id = %s AND website = %s",
+                    (user_id, website)
+                )
+                conn.commit()
+                removed = cursor.rowcount > 0
+                cursor.close()
+                return removed
         except mysql.connector.Error as err:
             print(f"Error removing blocked site: {err}")
             return False
+        finally:
+            self.cache.invalidate(('get_blocked_sites', user_id))
     
     # Study sessions management (enhanced for analytics)
-    def record_study_session(self, user_id, duration_minutes, focus_rating=None, subject_tag=None, distractions_count=0, notes=None):
+    def record_study_session(self, user_id, duration_minutes, focus_rating=None, subject_tag=None, distractions_count=0, notes=None,
+                             client_id=None, start_time=None):
         """Record a study session with analytics data"""
+        # A client_id makes the insert safe to retry: a repeat finds the first copy
+        return self._record_study_session(
+            user_id, duration_minutes, focus_rating, subject_tag, distractions_count, notes,
+            client_id or uuid.uuid4().hex, start_time or datetime.now()
+        )
+    
+    @idempotent
+    def _record_study_session(self, user_id, duration_minutes, focus_rating, subject_tag, distractions_count, notes,
+                              client_id, start_time):
         try:
-            cursor = self.connection.cursor()
-            start_time = datetime.now()
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            
-            cursor.execute("""
-                INSERT INTO study_sessions 
-                (user_id, start_time, end_time, duration_minutes, focus_rating, subject_tag, distractions_count, notes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (user_id, start_time, end_time, duration_minutes, focus_rating, subject_tag, distractions_count, notes))
-            
-            self.connection.commit()
-            session_id = cursor.lastrowid
-            
-            # Update personal records
-            self._update_personal_records(user_id, duration_minutes, focus_rating)
-            
-            cursor.close()
-            return session_id
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                session_id = self._insert_session(
+                    conn, user_id, duration_minutes, focus_rating, subject_tag,
+                    distractions_count, notes, client_id, start_time
+                )
+                self._record_personal_bests(cursor, [(user_id, duration_minutes, focus_rating)])
+                
+                # Session, rollup and records land together or not at all
+                conn.commit()
+                cursor.close()
+                self._pin_reads(user_id)
+                return session_id
+        except mysql.connector.errors.IntegrityError as err:
+            # Already saved, e.g. the commit went through but its reply was lost
+            existing = self._session_id(client_id)
+            if existing is None:
+                print(f"Error recording study session: {err}")
+            return existing
         except mysql.connector.Error as err:
             print(f"Error recording study session: {err}")
             return None
     
-    def _update_personal_records(self, user_id, duration_minutes, focus_rating):
-        """Update personal records for achievements"""
+    def _session_id(self, client_id):
+        """Id of the session recorded under client_id, or None"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Check for longest session record
-            cursor.execute("""
-                SELECT record_value FROM personal_records 
-                WHERE user_id = %s AND record_type = 'longest_session'
-            """, (user_id,))
-            result = cursor.fetchone()
-            
-            if not result or duration_minutes > result[0]:
-                # New longest session!
-                cursor.execute("""
-                    INSERT INTO personal_records (user_id, record_type, record_value)
-                    VALUES (%s, 'longest_session', %s)
-                    ON DUPLICATE KEY UPDATE record_value = VALUES(record_value)
-                """, (user_id, duration_minutes))
-            
-            # Check for best focus record
-            if focus_rating:
-                cursor.execute("""
-                    SELECT record_value FROM personal_records 
-                    WHERE user_id = %s AND record_type = 'best_focus'
-                """, (user_id,))
-                result = cursor.fetchone()
-                
-                if not result or focus_rating > result[0]:
-                    # New best focus!
-                    cursor.execute("""
-                        INSERT INTO personal_records (user_id, record_type, record_value)
-                        VALUES (%s, 'best_focus', %s)
-                        ON DUPLICATE KEY UPDATE record_value = VALUES(record_value)
-                    """, (user_id, focus_rating))
-            
-            self.connection.commit()
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM study_sessions WHERE client_id = %s", (client_id,))
+                row = cursor.fetchone()
+                cursor.close()
+                return row[0] if row else None
+        except mysql.connector.Error:
+            return None
+    
+    def record_study_sessions(self, sessions):
+        """Record many sessions (dicts of record_study_session's arguments) in one transaction
+        
+        Returns how many were recorded, or None if the batch failed and nothing was saved.
+        """
+        rows = []
+        rollups = {}
+        for session in sessions:
+            user_id = session['user_id']
+            duration = session['duration_minutes']
+            focus = session.get('focus_rating')
+            start_time = session.get('start_time') or datetime.now()
+            rows.append((
+                user_id, start_time, start_time + timedelta(minutes=duration), duration, focus,
+                session.get('subject_tag'), session.get('distractions_count', 0), session.get('notes'),
+                session.get('client_id')
+            ))
             
+            # Sum per user and day here so each rollup row is written once
+            day = rollups.setdefault((user_id, start_time.date()), [0, 0, 0, 0, 0, None])
+            day[0] += duration
+            day[1] += 1
+            day[2] += focus or 0
+            day[3] += 1 if focus else 0
+            day[4] = max(day[4], duration)
+            day[5] = max(day[5] or 0, focus) if focus else day[5]
+        
+        if not rows:
+            return 0
+        
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(self.queries['session_insert'], rows)
+                cursor.executemany(
+                    self.queries['rollup_upsert'],
+                    [(user_id, day, *totals) for (user_id, day), totals in rollups.items()]
+                )
+                self._record_personal_bests(cursor, [(row[0], row[3], row[4]) for row in rows])
+                conn.commit()
+                cursor.close()
+                self._pin_reads(*(row[0] for row in rows))
+                return len(rows)
         except mysql.connector.Error as err:
-            print(f"Error updating records: {err}")
+            print(f"Error recording study sessions: {err}")
+            return None
+    
+    def _insert_session(self, conn, user_id, duration_minutes, focus_rating=None, subject_tag=None, distractions_count=0,
+                        notes=None, client_id=None, start_time=None):
+        """Insert a session and fold it into the daily rollup (caller commits)"""
+        start_time = start_time or datetime.now()
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        
+        cursor = self._statement(conn, 'session_insert')
+        cursor.execute(self.queries['session_insert'], (
+            user_id, start_time, end_time, duration_minutes, focus_rating,
+            subject_tag, distractions_count, notes, client_id
+        ))
+        session_id = cursor.lastrowid
+        cursor.close()
+        
+        # Keep the daily rollup in step with study_sessions (same transaction)
+        cursor = self._statement(conn, 'rollup_upsert')
+        cursor.execute(self.queries['rollup_upsert'], (
+            user_id, start_time.date(), duration_minutes, 1,
+            focus_rating or 0, 1 if focus_rating else 0, duration_minutes, focus_rating
+        ))
+        cursor.close()
+        return session_id
+    
+    def _record_personal_bests(self, cursor, sessions):
+        """Raise longest_session/best_focus records from (user_id, duration, focus) tuples (caller commits)"""
+        # Only each user's best in this batch can beat the stored record
+        best = {}
+        for user_id, duration_minutes, focus_rating in sessions:
+            if duration_minutes is not None:
+                key = (user_id, 'longest_session')
+                best[key] = max(best.get(key, duration_minutes), duration_minutes)
+            if focus_rating:
+                key = (user_id, 'best_focus')
+                best[key] = max(best.get(key, focus_rating), focus_rating)
+        
+        if best:
+            cursor.executemany(
+                self.queries['record_upsert'],
+                [(user_id, record_type, value) for (user_id, record_type), value in best.items()]
+            )
     
     # Analytics functions (for AnalyticsDashboard.py)
-    def get_study_analytics(self, user_id):
+    def _analytics_queries(self, user_id):
+        """Return (key, sql, params, fetch_one) for each query behind get_study_analytics"""
+        today = datetime.now().date()
+        
+        # WEEK()/YEARWEEK() default to Sunday-start weeks; cover this week and the 3 before it
+        week_start = today - timedelta(days=(today.weekday() + 1) % 7 + 21)
+        week_ago = today - timedelta(days=7)
+        
+        return [
+            ('weekly_data', self.queries['weekly_data'], (user_id, week_start), False),
+            ('daily_data', self.queries['daily_data'], (user_id, week_ago), False),
+            ('records', self.queries['records'], (user_id,), True),
+            ('best_day', self.queries['best_day'], (user_id,), True),
+            ('subjects', self.queries['subjects'], (user_id, today - timedelta(days=SUBJECTS_DAYS)), False),
+            ('personal_records', self.queries['personal_records'], (user_id,), False),
+        ]
+    
+    @idempotent
+    def get_study_analytics(self, user_id, mode=None):
         """Get comprehensive study analytics for dashboard"""
+        mode = mode or self.config.get('analytics_mode', DEFAULT_ANALYTICS_MODE)
+        if mode not in ANALYTICS_MODES:
+            print(f"Unknown analytics_mode '{mode}', using {DEFAULT_ANALYTICS_MODE}")
+            mode = DEFAULT_ANALYTICS_MODE
+        
+        queries = self._analytics_queries(user_id)
+        replica = self._read_replica(user_id)
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            if mode == 'batch':
+                return self._analytics_batch(queries, replica)
+            if mode == 'parallel':
+                return self._analytics_parallel(queries, replica)
+            return self._analytics_sequential(queries, replica)
+        except mysql.connector.Error as err:
+            print(f"Error getting analytics: {err}")
+            return None
+    
+    def _analytics_sequential(self, queries, replica=None):
+        """Run the analytics queries one at a time on one connection"""
+        with self._connection(replica) as conn:
             analytics = {}
             
-            # Today's date and 30 days ago
-            today = datetime.now().date()
-            thirty_days_ago = today - timedelta(days=30)
-            
-            # Weekly study time (last 4 weeks)
-            cursor.execute("""
-                SELECT 
-                    YEAR(start_time) as year,
-                    WEEK(start_time) as week,
-                    SUM(duration_minutes) as total_minutes,
-                    COUNT(*) as session_count,
-                    AVG(focus_rating) as avg_focus
-                FROM study_sessions 
-                WHERE user_id = %s 
-                GROUP BY YEAR(start_time), WEEK(start_time)
-                ORDER BY year DESC, week DESC
-                LIMIT 4
-            """, (user_id,))
-            analytics['weekly_data'] = cursor.fetchall()
-            
-            # Daily study time for last 7 days
-            cursor.execute("""
-                SELECT 
-                    DATE(start_time) as date,
-                    SUM(duration_minutes) as daily_minutes,
-                    COUNT(*) as sessions,
-                    AVG(focus_rating) as avg_focus
-                FROM study_sessions 
-                WHERE user_id = %s AND DATE(start_time) >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-                GROUP BY DATE(start_time)
-                ORDER BY date DESC
-            """, (user_id,))
-            analytics['daily_data'] = cursor.fetchall()
-            
-            # Personal records
-            cursor.execute("""
-                SELECT 
-                    MAX(duration_minutes) as longest_session,
-                    AVG(duration_minutes) as avg_session_length,
-                    SUM(duration_minutes) as total_study_time,
-                    COUNT(*) as total_sessions,
-                    MAX(focus_rating) as best_focus,
-                    AVG(focus_rating) as avg_focus_lifetime
-                FROM study_sessions 
-                WHERE user_id = %s
-            """, (user_id,))
-            analytics['records'] = cursor.fetchone()
+            for key, sql, params, fetch_one in queries:
+                cursor = self._statement(conn, key, dictionary=True)
+                cursor.execute(sql, params)
+                analytics[key] = cursor.fetchone() if fetch_one else cursor.fetchall()
+                cursor.close()
             
-            # Most productive day of week
-            cursor.execute("""
-                SELECT 
-                    DAYNAME(start_time) as day_name,
-                    AVG(duration_minutes) as avg_minutes,
-                    COUNT(*) as session_count
-                FROM study_sessions 
-                WHERE user_id = %s
-                GROUP BY DAYNAME(start_time)
-                ORDER BY avg_minutes DESC
-                LIMIT 1
-            """, (user_id,))
-            analytics['best_day'] = cursor.fetchone()
-            
-            # Subject/tag analysis
-            cursor.execute("""
-                SELECT 
-                    subject_tag,
-                    SUM(duration_minutes) as total_time,
-                    COUNT(*) as session_count,
-                    AVG(focus_rating) as avg_focus
-                FROM study_sessions 
-                WHERE user_id = %s AND subject_tag IS NOT NULL AND subject_tag != ''
-                GROUP BY subject_tag
-                ORDER BY total_time DESC
-                LIMIT 5
-            """, (user_id,))
-            analytics['subjects'] = cursor.fetchall()
+            return analytics
+    
+    def _analytics_batch(self, queries, replica=None):
+        """Send every analytics query in one multi-statement round trip"""
+        sql = ";".join(query.strip() for _, query, _, _ in queries)
+        params = tuple(value for _, _, query_params, _ in queries for value in query_params)
+        
+        with self._connection(replica) as conn:
+            cursor = conn.cursor(dictionary=True)
+            analytics = {}
             
-            # Get actual personal records from personal_records table
-            cursor.execute("""
-                SELECT record_type, record_value, achieved_at 
-                FROM personal_records 
-                WHERE user_id = %s
-            """, (user_id,))
-            analytics['personal_records'] = cursor.fetchall()
+            # Results come back in statement order
+            results = cursor.execute(sql, params, multi=True)
+            for (key, _, _, fetch_one), result in zip(queries, results):
+                rows = result.fetchall()
+                analytics[key] = (rows[0] if rows else None) if fetch_one else rows
             
             cursor.close()
             return analytics
-            
+    
+    def _analytics_parallel(self, queries, replica=None):
+        """Run each analytics query on its own pooled connection and merge the results"""
+        def run(query):
+            key, sql, params, fetch_one = query
+            with self._connection(replica) as conn:
+                cursor = self._statement(conn, key, dictionary=True)
+                cursor.execute(sql, params)
+                result = cursor.fetchone() if fetch_one else cursor.fetchall()
+                cursor.close()
+                return key, result
+        
+        # Never ask for more connections than the pool can hand out
+        pool = replica.pool if replica else self.pool
+        workers = max(1, min(len(queries), pool.size if pool else 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                return dict(executor.map(run, queries))
+            except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+                # Lost on a worker thread; flag it on this one for @idempotent
+                _call_state.lost_connection = True
+                raise
+    
+    def backfill_daily_rollups(self, user_id=None):
+        """Rebuild study_daily_rollup from raw and compacted sessions for one user, or everyone"""
+        try:
+            with self._connection() as conn:
+                return migrations.backfill_daily_rollups(
+                    conn, None if user_id is None else [user_id], self.SESSION_TABLES, compacted=True
+                )
         except mysql.connector.Error as err:
-            print(f"Error getting analytics: {err}")
+            print(f"Error backfilling daily rollups: {err}")
+            return None
+    
+    def archive_old_sessions(self, retention_months=None):
+        """Move sessions from months older than the retention window to study_sessions_archive
+        
+        Whole monthly partitions are moved, so only months that ended before
+        the cutoff go. Daily rollups are untouched, so analytics still count
+        archived sessions. Returns how many sessions were archived, or None on failure.
+        """
+        months = self._months_setting(retention_months, 'session_retention_months', DEFAULT_SESSION_RETENTION_MONTHS)
+        if months is None:
+            return None
+        today = date.today()
+        cutoff = migrations.month_start(today, -months)
+        try:
+            with self._connection() as conn:
+                # Split off any months still in p_future first, so they can be archived
+                migrations.maintain_session_partitions(conn)
+                archived = migrations.archive_session_partitions(conn, cutoff)
+            return sum(archived.values())
+        except mysql.connector.Error as err:
+            print(f"Error archiving sessions: {err}")
+            return None
+    
+    def _months_setting(self, months, key, default):
+        """months if given (0 included), else the config's key, else default; None if it's negative"""
+        if months is None:
+            months = self.config.get(key, default)
+        if int(months) < 0:
+            print(f"❌ {key} must be 0 or more, not {months}")
+            return None
+        return int(months)
+    
+    def compact_old_sessions(self, older_than_months=None):
+        """Fold sessions older than the compaction window into study_subject_rollup, then delete them
+        
+        Each user's old days go a few hundred sessions at a time. In one short
+        transaction a batch's per-day, per-subject totals are added, checked
+        against study_daily_rollup for the same days, and its sessions
+        deleted, so a run that stops part way can simply be run again.
+        Analytics read the daily rollup and don't change; compacted sessions
+        drop out of history and search. Returns how many sessions were
+        compacted, or None on failure.
+        """
+        months = self._months_setting(older_than_months, 'session_compaction_months', DEFAULT_SESSION_COMPACTION_MONTHS)
+        if months is None:
+            return None
+        cutoff = datetime.combine(migrations.month_start(date.today(), -months), datetime.min.time())
+        compacted = 0
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM users ORDER BY id")
+                user_ids = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+                for user_id in user_ids:
+                    for since, until in self._compaction_batches(conn, user_id, cutoff):
+                        compacted += self._compact_days(conn, user_id, since, until)
+            return compacted
+        except mysql.connector.Error as err:
+            print(f"Error compacting sessions: {err}")
+            return None
+    
+    def _compaction_batches(self, conn, user_id, cutoff):
+        """Split a user's days before cutoff into [since, until) ranges of about COMPACT_BATCH_SIZE sessions"""
+        cursor = conn.cursor()
+        counts = {}
+        for table in self.SESSION_TABLES:
+            cursor.execute(
+                f"SELECT DATE(start_time), COUNT(*) FROM {table} "
+                "WHERE user_id = %s AND start_time < %s GROUP BY DATE(start_time)",
+                (user_id, cutoff)
+            )
+            for day, count in cursor.fetchall():
+                # DATE() comes back as text from SQLite
+                day = date.fromisoformat(str(day))
+                counts[day] = counts.get(day, 0) + count
+        cursor.close()
+        
+        batches, since, size = [], None, 0
+        for day in sorted(counts):
+            if since is not None and size + counts[day] > COMPACT_BATCH_SIZE:
+                batches.append((since, day))
+                since, size = None, 0
+            if since is None:
+                since = day
+            size += counts[day]
+        if since is not None:
+            batches.append((since, max(counts) + timedelta(days=1)))
+        return [(datetime.combine(since, datetime.min.time()), datetime.combine(until, datetime.min.time()))
+                for since, until in batches]
+    
+    def _compact_days(self, conn, user_id, since, until):
+        """Compact every session of a user between since and until (whole days) in one transaction"""
+        cursor = conn.cursor(dictionary=True)
+        sessions = {}
+        for table in self.SESSION_TABLES:
+            cursor.execute(
+                f"SELECT id, start_time, duration_minutes, focus_rating, subject_tag FROM {table} "
+                "WHERE user_id = %s AND start_time >= %s AND start_time < %s",
+                (user_id, since, until)
+            )
+            sessions[table] = cursor.fetchall()
+        
+        # [total_minutes, session_count, focus_sum, focus_count, max_session, max_focus]
+        totals = {}
+        for rows in sessions.values():
+            for row in rows:
+                minutes, focus = row['duration_minutes'] or 0, row['focus_rating']
+                total = totals.setdefault((row['start_time'].date(), row['subject_tag'] or ''), [0, 0, 0, 0, 0, None])
+                total[0] += minutes
+                total[1] += 1
+                total[4] = max(total[4], minutes)
+                if focus is not None:
+                    total[2] += focus
+                    total[3] += 1
+                    total[5] = focus if total[5] is None else max(total[5], focus)
+        cursor.executemany(self.queries['subject_rollup_upsert'],
+                           [(user_id, day, subject, *total) for (day, subject), total in totals.items()])
+        
+        # Together the compacted rows must now say exactly what the dashboard's daily rollup does
+        days = (user_id, since.date(), until.date())
+        cursor.execute(
+            "SELECT COALESCE(SUM(total_minutes), 0) as minutes, COALESCE(SUM(session_count), 0) as sessions "
+            "FROM study_daily_rollup WHERE user_id = %s AND day >= %s AND day < %s", days
+        )
+        expected = cursor.fetchone()
+        cursor.execute(
+            "SELECT COALESCE(SUM(total_minutes), 0) as minutes, COALESCE(SUM(session_count), 0) as sessions "
+            "FROM study_subject_rollup WHERE user_id = %s AND day >= %s AND day < %s", days
+        )
+        actual = cursor.fetchone()
+        if (int(actual['minutes']), int(actual['sessions'])) != (int(expected['minutes']), int(expected['sessions'])):
+            conn.rollback()
+            cursor.close()
+            raise mysql.connector.errors.IntegrityError(
+                f"user {user_id}, {since.date()} to {until.date()}: compacted totals {dict(actual)} don't match "
+                f"study_daily_rollup {dict(expected)}; nothing deleted (run backfill-rollups, then compact again)"
+            )
+        
+        for table, rows in sessions.items():
+            if rows:
+                # The start_time range lets MySQL prune to the partitions involved
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE user_id = %s AND start_time >= %s AND start_time < %s "
+                    f"AND id IN ({', '.join(['%s'] * len(rows))})",
+                    (user_id, since, until, *(row['id'] for row in rows))
+                )
+        cursor.execute(
+            "DELETE FROM study_session_search WHERE user_id = %s AND start_time >= %s AND start_time < %s",
+            (user_id, since, until)
+        )
+        conn.commit()
+        cursor.close()
+        return sum(len(rows) for rows in sessions.values())
+    
+    # Backup and restore (db_tools.py dump / restore)
+    def dump(self, path):
+        """Stream every table into a gzip'd JSON-lines file; returns {table: rows} or None on failure
+        
+        Rows are read with fetchmany on an unbuffered cursor, so memory
+        stays flat however large the tables are.
+        """
+        counts = {}
+        try:
+            with self._connection() as conn, gzip.open(path, 'wt', encoding='utf-8') as out:
+                cursor = conn.cursor()
+                # One snapshot for all tables, so the dump is consistent
+                cursor.execute(self.SNAPSHOT_START)
+                out.write(json.dumps({'format': BACKUP_FORMAT, 'created_at': datetime.now().isoformat(" ", "seconds")}) + "\n")
+                
+                for table in BACKUP_TABLES:
+                    cursor.execute(f"SELECT * FROM {table} ORDER BY 1")
+                    columns = [column[0] for column in cursor.description]
+                    out.write(json.dumps({'table': table, 'columns': columns}) + "\n")
+                    
+                    rows = 0
+                    while True:
+                        batch = cursor.fetchmany(DUMP_FETCH_SIZE)
+                        if not batch:
+                            break
+                        for row in batch:
+                            out.write(json.dumps(list(row), default=_json_value) + "\n")
+                        rows += len(batch)
+                    out.write(json.dumps({'end': table, 'rows': rows}) + "\n")
+                    counts[table] = rows
+                    print(f"  {table}: {rows} rows")
+                
+                conn.rollback()
+                cursor.close()
+            return counts
+        except (mysql.connector.Error, OSError) as err:
+            print(f"Error dumping database: {err}")
+            return None
+    
+    def restore(self, path):
+        """Load a file written by dump() into this (empty) database; returns {table: rows} or None on failure"""
+        counts = {}
+        try:
+            with self._connection() as conn, gzip.open(path, 'rt', encoding='utf-8') as f:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM users")
+                if cursor.fetchone()[0]:
+                    print("Refusing to restore into a database that already has users")
+                    cursor.close()
+                    return None
+                
+                header = json.loads(f.readline())
+                if header.get('format') != BACKUP_FORMAT:
+                    print(f"{path} is not a focus_app dump")
+                    cursor.close()
+                    return None
+                
+                for statement in self.BULK_LOAD_START:
+                    cursor.execute(statement)
+                try:
+                    table, insert, batch, uncommitted = None, None, [], 0
+                    for line in f:
+                        item = json.loads(line)
+                        if isinstance(item, list):
+                            batch.append(item)
+                            if len(batch) >= RESTORE_BATCH_SIZE:
+                                cursor.executemany(insert, batch)
+                                uncommitted += len(batch)
+                                counts[table] += len(batch)
+                                batch = []
+                                # Large transactions, but not one the size of the whole dump
+                                if uncommitted >= RESTORE_COMMIT_ROWS:
+                                    conn.commit()
+                                    uncommitted = 0
+                        elif 'table' in item:
+                            table = item['table']
+                            columns = ", ".join(item['columns'])
+                            placeholders = ", ".join(["%s"] * len(item['columns']))
+                            insert = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+                            counts[table] = 0
+                        elif 'end' in item:
+                            if batch:
+                                cursor.executemany(insert, batch)
+                                counts[table] += len(batch)
+                                batch = []
+                            conn.commit()
+                            uncommitted = 0
+                            print(f"  {table}: {counts[table]} rows")
+                finally:
+                    for statement in self.BULK_LOAD_END:
+                        cursor.execute(statement)
+                cursor.close()
+                # Derived from sessions, so not in the dump
+                migrations.rebuild_session_search(conn, tables=self.SESSION_TABLES)
+            return counts
+        except (mysql.connector.Error, OSError, ValueError) as err:
+            print(f"Error restoring database: {err}")
             return None
+        finally:
+            self.cache.clear()
     
+    @idempotent
     def get_recent_sessions(self, user_id, limit=10):
         """Get recent study sessions"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    start_time, duration_minutes, focus_rating, subject_tag, notes
-                FROM study_sessions 
-                WHERE user_id = %s 
-                ORDER BY start_time DESC 
-                LIMIT %s
-            """, (user_id, limit))
-            sessions = cursor.fetchall()
-            cursor.close()
-            return sessions
+            with self._connection(self._read_replica(user_id)) as conn:
+                cursor = self._statement(conn, 'recent_sessions', dictionary=True)
+                since = datetime.now() - timedelta(days=RECENT_SESSIONS_DAYS)
+                cursor.execute(self.queries['recent_sessions'], (user_id, since, limit))
+                sessions = cursor.fetchall()
+                if len(sessions) < limit:
+                    # Quiet lately; look through all of history instead
+                    cursor.execute(self.queries['recent_sessions'], (user_id, EARLIEST_SESSION, limit))
+                    sessions = cursor.fetchall()
+                cursor.close()
+                return sessions
         except mysql.connector.Error as err:
             print(f"Error getting recent sessions: {err}")
             return []
     
+    @idempotent
+    def get_session_history(self, user_id, before=None, limit=HISTORY_PAGE_SIZE):
+        """One page of sessions, newest first, older than before
+
+        before is the (start_time, id) of the last session on the previous
+        page, or None for the first page. Live sessions are followed by
+        archived ones, so paging runs through the user's whole history.
+        """
+        start_time, session_id = before or LATEST_SESSION
+        try:
+            with self._connection(self._read_replica(user_id)) as conn:
+                cursor = self._statement(conn, 'session_history', dictionary=True)
+                cursor.execute(self.queries['session_history'], (user_id, start_time, start_time, session_id, limit))
+                sessions = cursor.fetchall()
+                cursor.close()
+                if len(sessions) < limit:
+                    if sessions:
+                        start_time, session_id = sessions[-1]['start_time'], sessions[-1]['id']
+                    cursor = self._statement(conn, 'session_history_archive', dictionary=True)
+                    cursor.execute(self.queries['session_history_archive'],
+                                   (user_id, start_time, start_time, session_id, limit - len(sessions)))
+                    sessions += cursor.fetchall()
+                    cursor.close()
+                return sessions
+        except mysql.connector.Error as err:
+            print(f"Error getting session history: {err}")
+            return []
+    
+    def _search_terms(self, words):
+        """Boolean-mode query matching any of words, as a prefix so half-typed words match"""
+        return " ".join(f"{word}*" for word in words)
+    
+    def _match_params(self, terms):
+        """The search queries' leading parameters: MATCH appears once for the score and once in WHERE"""
+        return (terms, terms)
+    
+    @idempotent
+    def search(self, user_id, query, limit=SEARCH_LIMIT):
+        """Find a user's sessions and todos matching query, best matches first
+        
+        Words match the start of words in session subjects and notes and in
+        todo text. A month or year in the query limits sessions to it, so
+        "chemistry march" finds last March's chemistry sessions.
+        Returns {'sessions': [...], 'todos': [...]}.
+        """
+        words, period = text_search.parse_query(query)
+        results = {'sessions': [], 'todos': []}
+        if not words and not period:
+            return results
+        since, until = period or (EARLIEST_SESSION, LATEST_SESSION[0])
+        try:
+            with self._connection(self._read_replica(user_id)) as conn:
+                if words:
+                    terms = self._match_params(self._search_terms(words))
+                    cursor = self._statement(conn, 'search_sessions', dictionary=True)
+                    cursor.execute(self.queries['search_sessions'], (*terms, user_id, since, until, limit))
+                    results['sessions'] = cursor.fetchall()
+                    cursor.close()
+                    cursor = self._statement(conn, 'search_todos', dictionary=True)
+                    cursor.execute(self.queries['search_todos'], (*terms, user_id, limit))
+                    results['todos'] = cursor.fetchall()
+                    cursor.close()
+                else:
+                    cursor = self._statement(conn, 'sessions_in_period', dictionary=True)
+                    cursor.execute(self.queries['sessions_in_period'],
+                                   (user_id, since, until, user_id, since, until, limit))
+                    results['sessions'] = cursor.fetchall()
+                    cursor.close()
+            return results
+        except mysql.connector.Error as err:
+            print(f"Error searching: {err}")
+            return results
+    
+    @idempotent
     def get_study_time_by_period(self, user_id, days=30):
         """Get study time for a specific period"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT SUM(duration_minutes) 
-                FROM study_sessions 
-                WHERE user_id = %s AND start_time >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            """, (user_id, days))
-            result = cursor.fetchone()
-            cursor.close()
-            return result[0] or 0
+            with self._connection(self._read_replica(user_id)) as conn:
+                cursor = self._statement(conn, 'study_time_by_period')
+                since = datetime.now() - timedelta(days=days)
+                cursor.execute(self.queries['study_time_by_period'], (user_id, since))
+                result = cursor.fetchone()
+                cursor.close()
+                return result[0] or 0
         except mysql.connector.Error as err:
             print(f"Error getting study time: {err}")
             return 0
 
 
+    @cached
+    @idempotent
     def get_todos(self, user_id):
         """Get all todos for a user"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, task, completed 
-                FROM todos 
-                WHERE user_id = %s 
-                ORDER BY created_at ASC
-            """, (user_id,))
-            todos = cursor.fetchall()
-            cursor.close()
-            return todos
+            with self._connection() as conn:
+                cursor = self._statement(conn, 'todos', dictionary=True)
+                cursor.execute(self.queries['todos'], (user_id,))
+                todos = cursor.fetchall()
+                cursor.close()
+                return todos
         except Exception as err:
             print(f"Error getting todos: {err}")
             return []
     
-    def save_todos(self, user_id, todos):
-        """Save todos for a user (replaces all existing todos)"""
+    @idempotent
+    def get_completed_todos(self, user_id, limit=10):
+        """Get the most recently added completed todos (for the dashboard)"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Delete existing todos for this user
-            cursor.execute("DELETE FROM todos WHERE user_id = %s", (user_id,))
-            
-            # Insert new todos
-            for task, completed in todos:
-                cursor.execute("""
-                    INSERT INTO todos (user_id, task, completed) 
-                    VALUES (%s, %s, %s)
-                """, (user_id, task, completed))
-            
-            self.connection.commit()
-            cursor.close()
-            return True
+            with self._connection(self._read_replica(user_id)) as conn:
+                cursor = self._statement(conn, 'completed_todos', dictionary=True)
+                cursor.execute(self.queries['completed_todos'], (user_id, limit))
+                todos = cursor.fetchall()
+                cursor.close()
+                return todos
+        except mysql.connector.Error as err:
+            print(f"Error getting completed todos: {err}")
+            return []
+    
+    @idempotent
+    def save_todo_changes(self, user_id, upserts=(), deletes=()):
+        """Apply a todo list diff in one transaction
+        
+        upserts: [(client_id, task, completed)], deletes: [client_id]
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                self._apply_todo_changes(cursor, user_id, upserts, deletes)
+                conn.commit()
+                cursor.close()
+                # The dashboard's completed-tasks list reads from replicas
+                self._pin_reads(user_id)
+                return True
             
-        except Exception as err:
+        except mysql.connector.Error as err:
             print(f"Error saving todos: {err}")
-            self.connection.rollback()
             return False
+        finally:
+            self.cache.invalidate(('get_todos', user_id))
+    
+    def _apply_todo_changes(self, cursor, user_id, upserts, deletes):
+        """Batch a todo diff onto cursor; safe to repeat (caller commits)"""
+        if upserts:
+            cursor.executemany(
+                self.queries['todo_upsert'],
+                [(user_id, client_id, task, completed) for client_id, task, completed in upserts]
+            )
+        if deletes:
+            cursor.executemany(
+                "DELETE FROM todos WHERE client_id = %s AND user_id = %s",
+                [(client_id, user_id) for client_id in deletes]
+            )
+    
+    def replay_writes(self, entries):
+        """Apply journaled offline writes in one transaction, skipping any already applied
+        
+        Unlike the other methods this raises mysql.connector.Error, so the
+        replayer can tell an outage (keep the entries) from a bad entry.
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                for entry in entries:
+                    op, args = entry['op'], entry['args']
+                
+                    if op == 'session':
+                        cursor.execute("SELECT id FROM study_sessions WHERE client_id = %s", (args['client_id'],))
+                        if cursor.fetchone():
+                            continue
+                        self._insert_session(
+                            conn, args['user_id'], args['duration_minutes'], args.get('focus_rating'),
+                            args.get('subject_tag'), args.get('distractions_count', 0), args.get('notes'),
+                            args['client_id'], datetime.fromisoformat(args['start_time'])
+                        )
+                        self._record_personal_bests(cursor, [(args['user_id'], args['duration_minutes'], args.get('focus_rating'))])
+                
+                    elif op == 'todo_changes':
+                        self._apply_todo_changes(cursor, args['user_id'], args['upserts'], args['deletes'])
+                
+                    elif op == 'add_blocked_site':
+                        cursor.execute(
+                            "SELECT id FROM blocked_sites WHERE user_id = %s AND website = %s",
+                            (args['user_id'], args['website'])
+                        )
+                        if not cursor.fetchone():
+                            cursor.execute(
+                                "INSERT INTO blocked_sites (user_id, website) VALUES (%s, %s)",
+                                (args['user_id'], args['website'])
+                            )
+                
+                    elif op == 'remove_blocked_site':
+                        cursor.execute(
+                            "DELETE FROM blocked_sites WHERE user_id = %s AND website = %s",
+                            (args['user_id'], args['website'])
+                        )
+                
+                    else:
+                        print(f"⚠️ Skipping unknown journal entry {op}")
+            
+                conn.commit()
+                cursor.close()
+                self._pin_reads(*(entry['args']['user_id'] for entry in entries if entry['op'] in ('session', 'todo_changes')))
+        finally:
+            for entry in entries:
+                user_id = entry['args'].get('user_id')
+                if entry['op'] == 'todo_changes':
+                    self.cache.invalidate(('get_todos', user_id))
+                elif entry['op'] in ('add_blocked_site', 'remove_blocked_site'):
+                    self.cache.invalidate(('get_blocked_sites', user_id))
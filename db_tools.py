@@ -0,0 +1,213 @@
+from datetime import datetime
+import argparse
+import csv
+import json
+import sys
+
+from database import get_database
+import workload
+
+
+def check_plans(db, args):
+    """Fail if any hot query's EXPLAIN shows a full table scan"""
+    full_scans = db.check_query_plans(args.user_id)
+    if not full_scans:
+        print("✅ All hot queries use an index")
+        return 0
+    for key, table, rows in full_scans:
+        estimate = f" (~{rows} rows)" if rows is not None else ""
+        print(f"❌ {key}: full scan of {table}{estimate}")
+    return 1
+
+
+def backfill_rollups(db, args):
+    """Recompute study_daily_rollup from study_sessions and compacted totals"""
+    users = db.backfill_daily_rollups(args.user_id)
+    if users is None:
+        return 1
+    print(f"✅ Rebuilt daily rollups for {users} user(s)")
+    return 0
+
+
+def archive_sessions(db, args):
+    """Move sessions older than the retention window into study_sessions_archive"""
+    archived = db.archive_old_sessions(args.retention_months)
+    if archived is None:
+        return 1
+    print(f"✅ Archived {archived} sessions")
+    return 0
+
+
+def compact_sessions(db, args):
+    """Fold sessions older than the compaction window into per-day, per-subject totals"""
+    compacted = db.compact_old_sessions(args.older_than_months)
+    if compacted is None:
+        return 1
+    print(f"✅ Compacted {compacted} sessions")
+    return 0
+
+
+def rebalance_shards(db, args):
+    """Move users whose id now hashes to a different shard (after adding one)"""
+    if not hasattr(db, 'rebalance'):
+        print("❌ No shards configured in mysql_config.json")
+        return 1
+    moves = db.rebalance([args.user_id] if args.user_id else None, args.dry_run)
+    if moves is None:
+        return 1
+    if args.dry_run:
+        for user_id, source, target in moves:
+            print(f"  user {user_id}: shard {source} -> {target}")
+        print(f"{len(moves)} user(s) would move")
+    else:
+        print(f"✅ Moved {len(moves)} user(s)")
+    return 0
+
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def import_sessions(db, args):
+    """Bulk-load historic sessions from a CSV file"""
+    # Columns: user_id, start_time, duration_minutes, and optionally
+    # focus_rating, subject_tag, notes
+    imported = 0
+    batch = []
+    with open(args.csv_file, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            batch.append({
+                'user_id': int(row['user_id']),
+                'start_time': datetime.fromisoformat(row['start_time']),
+                'duration_minutes': int(row['duration_minutes']),
+                'focus_rating': int(row['focus_rating']) if row.get('focus_rating') else None,
+                'subject_tag': row.get('subject_tag') or None,
+                'notes': row.get('notes') or None,
+            })
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                if db.record_study_sessions(batch) is None:
+                    print(f"❌ Import stopped after {imported} sessions")
+                    return 1
+                imported += len(batch)
+                batch = []
+    if batch:
+        if db.record_study_sessions(batch) is None:
+            print(f"❌ Import stopped after {imported} sessions")
+            return 1
+        imported += len(batch)
+    print(f"✅ Imported {imported} sessions")
+    return 0
+
+
+def dump(db, args):
+    """Write every table to a compressed dump file"""
+    print(f"Dumping to {args.file}...")
+    counts = db.dump(args.file)
+    if counts is None:
+        return 1
+    print(f"✅ Dumped {sum(counts.values())} rows")
+    return 0
+
+
+def restore(db, args):
+    """Load a dump file into an empty database"""
+    print(f"Restoring from {args.file}...")
+    counts = db.restore(args.file)
+    if counts is None:
+        return 1
+    print(f"✅ Restored {sum(counts.values())} rows")
+    return 0
+
+
+def generate(db, args):
+    """Fill the configured database with synthetic users and sessions"""
+    user_ids = workload.generate(db, args.users, args.sessions_per_user, args.todos, args.sites, args.seed)
+    print(f"✅ Generated {len(user_ids)} user(s) with {len(user_ids) * args.sessions_per_user} sessions")
+    return 0
+
+
+def benchmark(db, args):
+    """Time every Database method on fresh datasets of each size and write a report"""
+    report = workload.run_benchmark(db.config, args.sizes, args.sessions_per_user, args.repeat)
+    workload.write_report(report, args.report)
+    print(f"\n✅ Report written to {args.report}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\nCompared with {args.compare} (median latency):")
+        for line in workload.compare_reports(previous, report):
+            print(line)
+    return 0
+
+
+def _sizes(value):
+    return [int(size) for size in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Focus app database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plans = commands.add_parser("check-plans", help="EXPLAIN hot queries and fail on full table scans")
+    plans.add_argument("--user-id", type=int, default=1, help="user whose data the queries are planned for")
+    plans.set_defaults(handler=check_plans)
+
+    backfill = commands.add_parser("backfill-rollups", help="rebuild the daily analytics rollup from raw sessions")
+    backfill.add_argument("--user-id", type=int, help="only rebuild this user (default: everyone)")
+    backfill.set_defaults(handler=backfill_rollups)
+
+    archiver = commands.add_parser("archive-sessions", help="move old months of sessions into study_sessions_archive")
+    archiver.add_argument("--retention-months", type=int,
+                          help="months of sessions to keep live (default: session_retention_months, else 24)")
+    archiver.set_defaults(handler=archive_sessions)
+
+    compactor = commands.add_parser("compact-sessions",
+                                    help="replace very old sessions with per-day, per-subject totals")
+    compactor.add_argument("--older-than-months", type=int,
+                           help="compact sessions older than this (default: session_compaction_months, else 36)")
+    compactor.set_defaults(handler=compact_sessions)
+
+    rebalancer = commands.add_parser("rebalance-shards", help="move users onto the shard their id hashes to")
+    rebalancer.add_argument("--user-id", type=int, help="only move this user (default: everyone misplaced)")
+    rebalancer.add_argument("--dry-run", action="store_true", help="list the moves without making them")
+    rebalancer.set_defaults(handler=rebalance_shards)
+
+    importer = commands.add_parser("import-sessions", help="bulk-load historic sessions from a CSV file")
+    importer.add_argument("csv_file", help="CSV with user_id, start_time, duration_minutes[, focus_rating, subject_tag, notes]")
+    importer.set_defaults(handler=import_sessions)
+
+    dumper = commands.add_parser("dump", help="stream the whole database into a compressed file")
+    dumper.add_argument("file", help="output file, e.g. focus_app.jsonl.gz")
+    dumper.set_defaults(handler=dump)
+
+    restorer = commands.add_parser("restore", help="load a dump into an empty database")
+    restorer.add_argument("file", help="file written by the dump command")
+    restorer.set_defaults(handler=restore)
+
+    generator = commands.add_parser("generate", help="fill the database with synthetic users, sessions, todos and blocked sites")
+    generator.add_argument("--users", type=int, default=10)
+    generator.add_argument("--sessions-per-user", type=int, default=workload.DEFAULT_SESSIONS_PER_USER)
+    generator.add_argument("--todos", type=int, default=20, help="todos per user")
+    generator.add_argument("--sites", type=int, default=5, help="blocked sites per user")
+    generator.add_argument("--seed", type=int, default=1)
+    generator.set_defaults(handler=generate)
+
+    bench = commands.add_parser("benchmark", help="time every Database method on generated datasets of each size")
+    bench.add_argument("--sizes", type=_sizes, default=list(workload.DEFAULT_SIZES),
+                       help="comma-separated total session counts, e.g. 1000,100000,10000000")
+    bench.add_argument("--sessions-per-user", type=int, default=workload.DEFAULT_SESSIONS_PER_USER)
+    bench.add_argument("--repeat", type=int, default=workload.BENCHMARK_REPEAT, help="calls timed per method")
+    bench.add_argument("--report", default="benchmark_report.json", help="where to write the JSON report")
+    bench.add_argument("--compare", help="earlier report to compare median latencies against")
+    bench.set_defaults(handler=benchmark)
+
+    args = parser.parse_args()
+
+    db = get_database()
+    if not db or not db.is_connected():
+        print("❌ Could not connect to the database")
+        return 2
+    return args.handler(db, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,14 @@ import sys
 import json
 import os
 import hashlib
+from database import get_database, clear_read_cache, start_background_connect, database_status, DB_CONNECTING
 
 # Initialize pygame
 pygame.init()
 
+# Open the database in the background (as in main.py) so the screen draws at once
+start_background_connect()
+
 # Screen dimensions
 SCREEN_INFO = pygame.display.Info()
 SCREEN_WIDTH, SCREEN_HEIGHT = SCREEN_INFO.current_w, SCREEN_INFO.current_h
@@ -40,76 +44,20 @@ text_font = pygame.font.SysFont('timesnewroman', 24)
 small_font = pygame.font.SysFont('timesnewroman', 20)
 button_font = pygame.font.SysFont('timesnewroman', 22, bold=True)
 
-def get_database_connection():
-    """Create a database connection"""
-    try:
-        config_file = "mysql_config.json"
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                mysql_config = json.load(f)
-        else:
-            mysql_config = {
-                'host': 'localhost',
-                'user': 'root',
-                'password': '',
-                'database': 'focus_app',
-                'port': 3306
-            }
-        
-        from database import Database
-        return Database(mysql_config)
-    except Exception as e:  
-        print(f"Database connection error: {e}")
-        return None
-
 def get_all_users():
     """Get all users from database"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM users ORDER BY username")
-            users = cursor.fetchall()
-            cursor.close()
-            return users
-    except Exception as e:
-        print(f"Error loading users: {e}")
+    db = get_database()
+    if db:
+        return db.get_all_users()
     return []
 
 def verify_password(username, password):
     """Verify user password by comparing hashes"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            
-            username = username.strip()
-            password = password.strip()
-            
-            # Hash the input password
-            input_hash = hash_password(password)
-            
-            # Get user and stored hash
-            cursor.execute("SELECT id, username, password_hash FROM users WHERE username = %s", (username,))
-            user = cursor.fetchone()
-            
-            cursor.close()
-            db.connection.close()
-            
-            if not user:
-                return None
-            
-            stored_hash = user.get('password_hash', '').strip()
-            
-            # Compare hashes
-            if stored_hash and stored_hash == input_hash:
-                return {'id': user['id'], 'username': user['username']}
-            
-            return None
-            
-    except Exception as e:
-        print(f"Login error: {e}")
-        return None
+    db = get_database()
+    if db:
+        return db.verify_user(username.strip(), password.strip())
+    return None
+
 def save_current_user(user_id, username):
     """Save current user to file"""
     try:
@@ -215,12 +163,27 @@ def draw_input_box(screen, x, y, width, height, text, active, is_password=False)
     text_surface = text_font.render(display_text, True, TEXT_COLOR)
     screen.blit(text_surface, (x + 15, y + 12))
 
+def wait_for_connect(clock):
+    """Show a notice until the background connect has made its first attempt; False if the window was closed"""
+    while database_status() == DB_CONNECTING:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        screen.fill(BACKGROUND)
+        notice = text_font.render("Connecting to database...", True, TEXT_COLOR)
+        screen.blit(notice, notice.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
+        pygame.display.flip()
+        clock.tick(30)
+    return True
+
 def login_screen():
     """Main login screen"""
     global screen  # Declare at the start of the function
     clock = pygame.time.Clock()
     
-    # Get all users
+    # Get all users, once the database has had a chance to open
+    if not wait_for_connect(clock):
+        return None, None
     all_users = get_all_users()
     
     if not all_users:
@@ -229,6 +192,8 @@ def login_screen():
         pygame.quit()
         import subprocess
         subprocess.run([sys.executable, "user_management.py"])
+        # It created users in its own process; our cached (empty) list is stale
+        clear_read_cache()
         
         # After user management, check if users were created
         all_users = get_all_users()
@@ -337,6 +302,7 @@ def login_screen():
                     pygame.quit()
                     import subprocess
                     subprocess.run([sys.executable, "user_management.py"])
+                    clear_read_cache()
                     pygame.init()
                     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
                     pygame.display.set_caption("Focus Timer - Login")
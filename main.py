@@ -558,110 +558,6 @@ if not mysql_config:
     print("❌ Failed to configure MySQL. Exiting.")
     sys.exit(1)
 
-print("\n" + "="*50)
-print("Initializing Database...")
-print("="*50)
-
-def initialize_database_tables(config):
-    '''Create database and tables if they don't exist'''
-    if not _FIRST_RUN:
-        return True
-    
-    try:
-        import mysql.connector
-        
-        print("Connecting to MySQL...")
-        conn = mysql.connector.connect(
-            host=config['host'],
-            user=config['user'],
-            password=config['password'],
-            port=config.get('port', 3306),
-            connect_timeout=10,
-            autocommit=True
-        )
-        cursor = conn.cursor()
-        
-        print("Creating database...")
-        cursor.execute("CREATE DATABASE IF NOT EXISTS focus_app")
-        print("✅ Database 'focus_app' ready")
-        
-        cursor.execute("USE focus_app")
-        
-        print("Creating users table...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL DEFAULT '',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        print("✅ Users table ready")
-        
-        print("Creating blocked_sites table...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS blocked_sites (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                website VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-        print("✅ Blocked sites table ready")
-        
-        print("Creating todos table...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS todos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                task VARCHAR(255) NOT NULL,
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-        print("✅ Todos table ready")
-        
-        print("Creating study_sessions table...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS study_sessions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                subject VARCHAR(255),
-                duration INT NOT NULL,
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-        print("✅ Study sessions table ready")
-        
-        print("Closing database connection...")
-        try:
-            cursor.close()
-        except:
-            pass
-        try:
-            conn.close()
-        except:
-            pass
-        
-        print("✅ Database initialization complete!\n")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Database initialization error: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            conn.close()
-        except:
-            pass
-        return False
-
-initialize_database_tables(mysql_config)
-
 # Create flag file to skip checks on subsequent runs
 if _FIRST_RUN:
     try:
@@ -681,16 +577,14 @@ import pygame
 import cv2
 import mysql.connector
 
-# Import the database module
-try:
-    from database import Database
-    # Pass the config to the Database class
-    db = Database(mysql_config)
-    print("✅ Database connection established")
-except Exception as e:
-    print(f"❌ Database error: {e}")
-    print("App will run with limited functionality")
-    db = None
+# Connect in the background so the window opens at once; on first run this
+# also creates the database and its tables. The main screen shows how it went.
+import database
+database.start_background_connect(mysql_config)
+
+# Sync writes saved offline by any screen once the database is reachable
+import write_journal
+write_journal.start_replayer(database.get_database)
 
 import music_player
 
@@ -908,6 +802,27 @@ class VolumeControls:
                 next_text = self.font.render("⏭", True, (255, 255, 255))
                 screen.blit(next_text, (self.next_btn.centerx - 6, self.next_btn.centery - 6))
 
+# Database status line on the main screen: (text, color); "connected" is only
+# shown for a few seconds after it changes
+DB_STATUS_MESSAGES = {
+    database.DB_CONNECTING: ("Connecting to database...", (200, 200, 200)),
+    database.DB_AVAILABLE: ("Database connected", (100, 200, 150)),
+    database.DB_DEGRADED: ("Database offline - sessions and tasks are saved and synced later", (255, 200, 0)),
+}
+DB_CONNECTED_NOTICE_MS = 3000
+
+def draw_database_status(screen, font, status, shown_until):
+    """Draw the database status in the bottom left corner"""
+    if status == database.DB_AVAILABLE and pygame.time.get_ticks() > shown_until:
+        return
+    text, color = DB_STATUS_MESSAGES[status]
+    text_surface = font.render(text, True, color)
+    background = pygame.Surface((text_surface.get_width() + 20, text_surface.get_height() + 10), pygame.SRCALPHA)
+    background.fill((0, 0, 0, 150))
+    y = screen.get_height() - background.get_height() - 15
+    screen.blit(background, (15, y))
+    screen.blit(text_surface, (25, y + 5))
+
 def get_current_user():
     """Get current user from file - simple implementation"""
     try:
@@ -978,6 +893,10 @@ def main():
     running = True
     focus_hover = False
     guy_hover = False
+    
+    # Database status, as last drawn
+    db_status = None
+    db_status_until = 0
 
     while running:
         for event in pygame.event.get():
@@ -1064,6 +983,13 @@ def main():
         # Draw analytics button
         analytics_button.draw(screen)
         
+        # Database status, picked up from the background connect
+        status = database.database_status()
+        if status != db_status:
+            db_status = status
+            db_status_until = pygame.time.get_ticks() + DB_CONNECTED_NOTICE_MS
+        draw_database_status(screen, font_small, db_status, db_status_until)
+        
 
         
         # REMOVED: settings_button.draw(screen, font_small)
@@ -0,0 +1,645 @@
+from datetime import date, datetime
+
+import mysql.connector
+
+# Rows converted per UPDATE when upgrading old installs, so no single
+# statement holds locks on the whole table
+BATCH_SIZE = 5000
+
+# Held while migrating so two app windows starting together don't race
+LOCK_NAME = "focus_app_migrations"
+LOCK_TIMEOUT = 30  # seconds
+
+# study_sessions is RANGE-partitioned by month of start_time (migration 7);
+# this many empty months are kept ready ahead of today
+PARTITION_MONTHS_AHEAD = 3
+FUTURE_PARTITION = "PARTITION p_future VALUES LESS THAN MAXVALUE"
+
+# Columns copied into study_sessions_archive
+SESSION_COLUMNS = "id, user_id, start_time, end_time, duration_minutes, focus_rating, subject_tag, notes, distractions_count, client_id"
+
+# study_session_search holds a copy of each session's searchable text (only
+# for sessions that have any)
+SEARCH_COLUMNS = "session_id, user_id, start_time, duration_minutes, subject_tag, notes"
+
+
+def _columns(cursor, table):
+    """Return {column_name: column_type} for a table in the current database"""
+    cursor.execute("""
+        SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {name: column_type for name, column_type in cursor.fetchall()}
+
+
+def _indexes(cursor, table):
+    """Return the set of index names on a table in the current database"""
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _varchar_length(column_type):
+    """Parse the length out of a 'varchar(N)' column type"""
+    try:
+        return int(column_type.split('(')[1].rstrip(')'))
+    except (IndexError, ValueError):
+        return 0
+
+
+def _create_base_tables(conn, cursor):
+    """Migration 1: every table the app uses, in its current shape"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS study_sessions (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            start_time DATETIME NOT NULL,
+            end_time DATETIME,
+            duration_minutes INT,
+            focus_rating INT,  # 1-5 stars
+            subject_tag VARCHAR(50),  # What were you studying?
+            notes TEXT,
+            distractions_count INT DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blocked_sites (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            website VARCHAR(255) NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            UNIQUE KEY unique_user_site (user_id, website)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS todos (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            task VARCHAR(500) NOT NULL,
+            completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS personal_records (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            record_type VARCHAR(50) NOT NULL,  # 'longest_session', 'best_focus', etc.
+            record_value FLOAT NOT NULL,
+            achieved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            UNIQUE KEY unique_user_record (user_id, record_type)
+        )
+    """)
+
+
+def _convert_legacy_sessions(conn, cursor):
+    """Migration 2: move study_sessions created by old main.py onto the analytics columns"""
+    columns = _columns(cursor, 'study_sessions')
+
+    # Installs that only ever ran the old ALTERs may be missing some of these
+    analytics_columns = [
+        ('start_time', 'DATETIME NULL'),
+        ('end_time', 'DATETIME'),
+        ('duration_minutes', 'INT'),
+        ('focus_rating', 'INT'),
+        ('subject_tag', 'VARCHAR(50)'),
+        ('notes', 'TEXT'),
+        ('distractions_count', 'INT DEFAULT 0'),
+    ]
+    for name, definition in analytics_columns:
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE study_sessions ADD COLUMN {name} {definition}")
+
+    if 'duration' not in columns:
+        # Already the current shape
+        return
+
+    print("Converting legacy study_sessions rows...")
+    cursor.execute("SELECT MIN(id), MAX(id) FROM study_sessions WHERE start_time IS NULL")
+    low, high = cursor.fetchone()
+    converted = 0
+
+    # Legacy rows keep the session time in created_at. Nothing ever wrote
+    # their duration (old main.py only created the table), so its unit is
+    # unknown: rather than guess, the raw value is kept in legacy_duration and
+    # duration_minutes (and end_time) stay NULL until someone converts them.
+    while low is not None and low <= high:
+        cursor.execute("""
+            UPDATE study_sessions
+            SET start_time = COALESCE(created_at, NOW()),
+                subject_tag = LEFT(subject, 50)
+            WHERE id >= %s AND id < %s AND start_time IS NULL
+        """, (low, low + BATCH_SIZE))
+        converted += cursor.rowcount
+        conn.commit()
+        low += BATCH_SIZE
+    print(f"✅ Converted {converted} legacy sessions")
+    if converted:
+        print(f"⚠️ Their durations are in study_sessions.legacy_duration, unit unknown; "
+              f"set duration_minutes for them (then run db_tools.py backfill-rollups) once it's known")
+
+    cursor.execute("ALTER TABLE study_sessions MODIFY start_time DATETIME NOT NULL")
+    legacy_columns = [name for name in ('subject', 'completed', 'created_at') if name in columns]
+    cursor.execute(
+        "ALTER TABLE study_sessions CHANGE COLUMN duration legacy_duration INT NULL COMMENT 'unit unknown; see migration 2'"
+        + "".join(f", DROP COLUMN {name}" for name in legacy_columns)
+    )
+
+
+def _unify_column_definitions(conn, cursor):
+    """Migration 3: bring users, todos and blocked_sites from old main.py in line"""
+    users = _columns(cursor, 'users')
+    if _varchar_length(users.get('username', '')) < 255:
+        cursor.execute("ALTER TABLE users MODIFY username VARCHAR(255) NOT NULL")
+
+    todos = _columns(cursor, 'todos')
+    if _varchar_length(todos.get('task', '')) < 500:
+        cursor.execute("ALTER TABLE todos MODIFY task VARCHAR(500) NOT NULL")
+
+    sites = _columns(cursor, 'blocked_sites')
+    if 'added_at' not in sites and 'created_at' in sites:
+        cursor.execute("ALTER TABLE blocked_sites CHANGE COLUMN created_at added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+
+    if 'unique_user_site' not in _indexes(cursor, 'blocked_sites'):
+        # Old installs allowed duplicates; keep the first copy of each
+        cursor.execute("""
+            DELETE newer FROM blocked_sites newer
+            JOIN blocked_sites older
+              ON older.user_id = newer.user_id AND older.website = newer.website AND older.id < newer.id
+        """)
+        conn.commit()
+        cursor.execute("ALTER TABLE blocked_sites ADD UNIQUE KEY unique_user_site (user_id, website)")
+
+
+def _add_query_indexes(conn, cursor):
+    """Migration 4: composite/covering indexes for the queries in database.QUERIES"""
+    wanted = {
+        'study_sessions': [
+            # weekly/daily range scans plus records and best_day read only this index
+            ('idx_sessions_user_time', 'user_id, start_time, duration_minutes, focus_rating'),
+            # subject breakdown groups straight off the index
+            ('idx_sessions_user_subject', 'user_id, subject_tag, duration_minutes, focus_rating'),
+        ],
+        'todos': [
+            ('idx_todos_user_created', 'user_id, created_at'),
+            ('idx_todos_user_completed', 'user_id, completed, id'),
+        ],
+    }
+    for table, indexes in wanted.items():
+        existing = _indexes(cursor, table)
+        missing = [(name, columns) for name, columns in indexes if name not in existing]
+        if missing:
+            # One ALTER per table so it is only rebuilt once
+            cursor.execute(f"ALTER TABLE {table} " + ", ".join(
+                f"ADD INDEX {name} ({columns})" for name, columns in missing
+            ))
+    # blocked_sites is served by unique_user_site (user_id, website) from migration 3
+
+
+def backfill_daily_rollups(conn, user_ids=None, tables=('study_sessions',), compacted=False):
+    """Rebuild study_daily_rollup from the sessions in tables, one user per transaction
+
+    With compacted, the totals of sessions already folded into
+    study_subject_rollup are added back in, so compacted days aren't lost.
+    """
+    sources = [
+        f"""SELECT user_id, DATE(start_time) as day, duration_minutes as total_minutes, 1 as session_count,
+                   focus_rating as focus_sum, CASE WHEN focus_rating IS NULL THEN 0 ELSE 1 END as focus_count,
+                   duration_minutes as max_session, focus_rating as max_focus
+            FROM {table} WHERE user_id = %s"""
+        for table in tables
+    ]
+    if compacted:
+        sources.append(
+            "SELECT user_id, day, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus "
+            "FROM study_subject_rollup WHERE user_id = %s"
+        )
+
+    cursor = conn.cursor()
+    if user_ids is None:
+        user_tables = list(tables) + (['study_subject_rollup'] if compacted else [])
+        cursor.execute(" UNION ".join(f"SELECT DISTINCT user_id FROM {table}" for table in user_tables))
+        user_ids = [row[0] for row in cursor.fetchall()]
+
+    for user_id in user_ids:
+        # Replace the user's rows outright so rerunning never double counts
+        cursor.execute("DELETE FROM study_daily_rollup WHERE user_id = %s", (user_id,))
+        cursor.execute(f"""
+            INSERT INTO study_daily_rollup
+            (user_id, day, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus)
+            SELECT
+                user_id,
+                day,
+                COALESCE(SUM(total_minutes), 0),
+                SUM(session_count),
+                COALESCE(SUM(focus_sum), 0),
+                SUM(focus_count),
+                COALESCE(MAX(max_session), 0),
+                MAX(max_focus)
+            FROM ({" UNION ALL ".join(sources)}) s
+            GROUP BY user_id, day
+        """, (user_id,) * len(sources))
+        conn.commit()
+    cursor.close()
+    return len(user_ids)
+
+
+def _create_daily_rollup(conn, cursor):
+    """Migration 5: per-user, per-day totals so analytics cost scales with days, not sessions"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS study_daily_rollup (
+            user_id INT NOT NULL,
+            day DATE NOT NULL,
+            total_minutes INT NOT NULL DEFAULT 0,
+            session_count INT NOT NULL DEFAULT 0,
+            focus_sum INT NOT NULL DEFAULT 0,  # sum of non-null focus ratings
+            focus_count INT NOT NULL DEFAULT 0,  # sessions that had a focus rating
+            max_session INT NOT NULL DEFAULT 0,
+            max_focus INT,
+            PRIMARY KEY (user_id, day),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    backfill_daily_rollups(conn)
+
+
+def _add_client_ids(conn, cursor):
+    """Migration 6: client-generated ids so offline writes can be replayed idempotently"""
+    sessions = _columns(cursor, 'study_sessions')
+    if 'client_id' not in sessions:
+        cursor.execute("ALTER TABLE study_sessions ADD COLUMN client_id CHAR(32) NULL, ADD UNIQUE KEY unique_session_client (client_id)")
+
+    todos = _columns(cursor, 'todos')
+    if 'client_id' not in todos:
+        cursor.execute("ALTER TABLE todos ADD COLUMN client_id CHAR(32) NULL")
+
+    # Existing todos get random ids; the app keys todos by client_id from now on
+    cursor.execute("SELECT MIN(id), MAX(id) FROM todos WHERE client_id IS NULL")
+    low, high = cursor.fetchone()
+    while low is not None and low <= high:
+        cursor.execute("""
+            UPDATE todos SET client_id = REPLACE(UUID(), '-', '')
+            WHERE id >= %s AND id < %s AND client_id IS NULL
+        """, (low, low + BATCH_SIZE))
+        conn.commit()
+        low += BATCH_SIZE
+
+    if 'unique_todo_client' not in _indexes(cursor, 'todos'):
+        cursor.execute("ALTER TABLE todos MODIFY client_id CHAR(32) NOT NULL, ADD UNIQUE KEY unique_todo_client (client_id)")
+
+
+def month_start(day, months=0):
+    """First day of the month that is `months` after day's month"""
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _partition(month):
+    """Definition of the partition holding sessions that start in `month`"""
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{month_start(month, 1)}'))"
+
+
+def session_partitions(cursor):
+    """Return [(partition name, first day of its month)] for study_sessions, oldest first"""
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'study_sessions' AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    return [(name, date(int(name[1:5]), int(name[5:7]), 1))
+            for (name,) in cursor.fetchall() if name != 'p_future']
+
+
+def _partition_sessions(conn, cursor):
+    """Migration 7: monthly RANGE partitions on study_sessions.start_time, and a compressed archive table"""
+    # Partitioned InnoDB tables can't have foreign keys, and every unique key
+    # must include the partitioning column. client_id stays unique in practice:
+    # a retried or replayed session reuses its start_time.
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'study_sessions' AND REFERENCED_TABLE_NAME IS NOT NULL
+    """)
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE study_sessions DROP FOREIGN KEY {name}")
+    cursor.execute("""
+        ALTER TABLE study_sessions
+            MODIFY start_time DATETIME NOT NULL,
+            DROP PRIMARY KEY, ADD PRIMARY KEY (id, start_time),
+            DROP INDEX unique_session_client, ADD UNIQUE KEY unique_session_client (client_id, start_time)
+    """)
+
+    cursor.execute("SELECT MIN(start_time) FROM study_sessions")
+    oldest = cursor.fetchone()[0] or datetime.now()
+    month, last = month_start(oldest), month_start(date.today(), PARTITION_MONTHS_AHEAD)
+    partitions = []
+    while month <= last:
+        partitions.append(_partition(month))
+        month = month_start(month, 1)
+    print(f"Partitioning study_sessions into {len(partitions)} months...")
+    cursor.execute(
+        "ALTER TABLE study_sessions PARTITION BY RANGE (TO_DAYS(start_time)) ("
+        + ", ".join(partitions + [FUTURE_PARTITION]) + ")"
+    )
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS study_sessions_archive (
+            id INT NOT NULL,
+            user_id INT NOT NULL,
+            start_time DATETIME NOT NULL,
+            end_time DATETIME,
+            duration_minutes INT,
+            focus_rating INT,
+            subject_tag VARCHAR(50),
+            notes TEXT,
+            distractions_count INT DEFAULT 0,
+            client_id CHAR(32),
+            PRIMARY KEY (id, start_time),
+            INDEX idx_archive_user_time (user_id, start_time)
+        ) ROW_FORMAT=COMPRESSED
+    """)
+
+
+def ensure_session_partitions(cursor):
+    """Split monthly partitions off p_future so the coming months each have their own
+
+    Any sessions already in p_future for those months move into them.
+    """
+    partitions = session_partitions(cursor)
+    if not partitions:
+        # Not partitioned (yet)
+        return 0
+    month, target = partitions[-1][1], month_start(date.today(), PARTITION_MONTHS_AHEAD)
+    added = []
+    while month < target:
+        month = month_start(month, 1)
+        added.append(_partition(month))
+    if added:
+        cursor.execute(
+            "ALTER TABLE study_sessions REORGANIZE PARTITION p_future INTO ("
+            + ", ".join(added + [FUTURE_PARTITION]) + ")"
+        )
+    if 'partitions_until' in _columns(cursor, 'schema_version'):
+        # Lets startup skip this check until another month is due (see partitions_due)
+        cursor.execute("UPDATE schema_version SET partitions_until = %s", (month,))
+    return len(added)
+
+
+def archive_session_partitions(conn, before):
+    """Move every monthly partition that ends on or before `before` into study_sessions_archive
+
+    Each month is copied and committed, then its partition dropped, so the
+    live table never holds locks for longer than one month's copy. Returns
+    {partition name: rows archived}.
+    """
+    cursor = conn.cursor()
+    archived = {}
+    try:
+        for name, month in session_partitions(cursor):
+            if month_start(month, 1) > before:
+                break
+            # IGNORE: rerunning after a crash between the copy and the drop is harmless
+            cursor.execute(
+                f"INSERT IGNORE INTO study_sessions_archive ({SESSION_COLUMNS}) "
+                f"SELECT {SESSION_COLUMNS} FROM study_sessions PARTITION ({name})"
+            )
+            archived[name] = cursor.rowcount
+            conn.commit()
+            cursor.execute(f"ALTER TABLE study_sessions DROP PARTITION {name}")
+            print(f"  {name}: archived {archived[name]} sessions")
+    finally:
+        cursor.close()
+    return archived
+
+
+def _add_history_index(conn, cursor):
+    """Migration 8: (user_id, start_time, id) index for paging through session history"""
+    if 'idx_sessions_history' not in _indexes(cursor, 'study_sessions'):
+        # idx_sessions_user_time has other columns before id, so it can't
+        # return rows in (start_time, id) order without a filesort
+        cursor.execute("ALTER TABLE study_sessions ADD INDEX idx_sessions_history (user_id, start_time, id)")
+    # study_sessions_archive's idx_archive_user_time already ends in its primary key (id, start_time)
+
+
+def _add_search_indexes(conn, cursor):
+    """Migration 9: FULLTEXT search over todo text and session subjects and notes"""
+    if 'ft_todos_task' not in _indexes(cursor, 'todos'):
+        cursor.execute("ALTER TABLE todos ADD FULLTEXT INDEX ft_todos_task (task)")
+
+    # InnoDB can't put a FULLTEXT index on a partitioned table, so session
+    # text is searched in this copy, filled by a trigger on every insert.
+    # Rows stay when their session is archived, so old sessions remain findable.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS study_session_search (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            session_id INT NOT NULL,
+            user_id INT NOT NULL,
+            start_time DATETIME NOT NULL,
+            duration_minutes INT,
+            subject_tag VARCHAR(50),
+            notes TEXT,
+            INDEX idx_search_user_time (user_id, start_time),
+            FULLTEXT INDEX ft_session_search (subject_tag, notes)
+        )
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS study_sessions_search_insert")
+    cursor.execute(f"""
+        CREATE TRIGGER study_sessions_search_insert AFTER INSERT ON study_sessions
+        FOR EACH ROW
+            IF NEW.subject_tag > '' OR NEW.notes > '' THEN
+                INSERT INTO study_session_search ({SEARCH_COLUMNS})
+                VALUES (NEW.id, NEW.user_id, NEW.start_time, NEW.duration_minutes, NEW.subject_tag, NEW.notes);
+            END IF
+    """)
+    conn.commit()
+    rebuild_session_search(conn, tables=('study_sessions', 'study_sessions_archive'))
+
+
+def _create_subject_rollup(conn, cursor):
+    """Migration 10: per-user, per-day, per-subject totals of sessions removed by compaction"""
+    # Written only by Database.compact_old_sessions(), in the same transaction
+    # that deletes the sessions, so together they always hold every session
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS study_subject_rollup (
+            user_id INT NOT NULL,
+            day DATE NOT NULL,
+            subject_tag VARCHAR(50) NOT NULL DEFAULT '',
+            total_minutes INT NOT NULL DEFAULT 0,
+            session_count INT NOT NULL DEFAULT 0,
+            focus_sum INT NOT NULL DEFAULT 0,
+            focus_count INT NOT NULL DEFAULT 0,
+            max_session INT NOT NULL DEFAULT 0,
+            max_focus INT,
+            PRIMARY KEY (user_id, day, subject_tag),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+
+def _add_partition_horizon(conn, cursor):
+    """Migration 11: record in schema_version how far ahead study_sessions is partitioned"""
+    # Read with the version on startup, so partitions are only checked when a month is due
+    if 'partitions_until' not in _columns(cursor, 'schema_version'):
+        cursor.execute("ALTER TABLE schema_version ADD COLUMN partitions_until DATE")
+
+
+def rebuild_session_search(conn, user_ids=None, tables=('study_sessions',)):
+    """Refill study_session_search from the sessions in tables, for some users or everyone"""
+    cursor = conn.cursor()
+    copy = (f"INSERT INTO study_session_search ({SEARCH_COLUMNS}) "
+            "SELECT id, user_id, start_time, duration_minutes, subject_tag, notes FROM {table} "
+            "WHERE (subject_tag > '' OR notes > '')")
+    if user_ids is None:
+        cursor.execute("DELETE FROM study_session_search")
+        for table in tables:
+            cursor.execute(copy.format(table=table))
+        conn.commit()
+    for user_id in user_ids or ():
+        cursor.execute("DELETE FROM study_session_search WHERE user_id = %s", (user_id,))
+        for table in tables:
+            cursor.execute(copy.format(table=table) + " AND user_id = %s", (user_id,))
+        conn.commit()
+    cursor.close()
+
+
+# Ordered and append-only: never edit a migration that has shipped, add a new one
+MIGRATIONS = [
+    (1, "create base tables", _create_base_tables),
+    (2, "convert legacy study_sessions to analytics columns", _convert_legacy_sessions),
+    (3, "unify users, todos and blocked_sites with the current schema", _unify_column_definitions),
+    (4, "add composite and covering indexes for hot queries", _add_query_indexes),
+    (5, "add study_daily_rollup and backfill it from study_sessions", _create_daily_rollup),
+    (6, "add client_id to study_sessions and todos for offline replay", _add_client_ids),
+    (7, "partition study_sessions by month and add study_sessions_archive", _partition_sessions),
+    (8, "add a (user_id, start_time, id) index for session history pages", _add_history_index),
+    (9, "add FULLTEXT search over todos and session subjects and notes", _add_search_indexes),
+    (10, "add study_subject_rollup for compacted sessions", _create_subject_rollup),
+    (11, "record the newest study_sessions partition in schema_version", _add_partition_horizon),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_status(conn):
+    """Return (highest applied migration, first day of the newest monthly partition or None) in one query"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version), MAX(partitions_until) FROM schema_version")
+        version, partitions_until = cursor.fetchone()
+        return version or 0, partitions_until
+    except mysql.connector.errors.ProgrammingError:
+        # No schema_version, or one from before migration 11; migrating will fix either
+        return current_version(conn), None
+    finally:
+        cursor.close()
+
+
+def partitions_due(partitions_until):
+    """True if the coming months need partitions that partitions_until says aren't there yet"""
+    return partitions_until is None or partitions_until < month_start(date.today(), PARTITION_MONTHS_AHEAD)
+
+
+def current_version(conn):
+    """Return the highest applied migration, or 0 for a database that was never migrated"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+        return row[0] or 0
+    except mysql.connector.errors.ProgrammingError:
+        # schema_version table doesn't exist yet
+        return 0
+    finally:
+        cursor.close()
+
+
+def _ensure_version_table(cursor):
+    """Create schema_version, adding the description column to tables from older releases"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if 'description' not in _columns(cursor, 'schema_version'):
+        cursor.execute("ALTER TABLE schema_version ADD COLUMN description VARCHAR(255) AFTER version")
+
+
+def _take_migration_lock(cursor):
+    """Hold the named lock that keeps two windows from changing the schema at once"""
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        raise mysql.connector.errors.OperationalError("Timed out waiting for another window to finish migrating")
+
+
+def _release_migration_lock(cursor):
+    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    cursor.fetchone()
+    cursor.close()
+
+
+def maintain_session_partitions(conn):
+    """Add any partitions the coming months need; run before archiving and on a startup that finds them due
+
+    Without this, sessions past the last monthly partition pile up in
+    p_future, where neither partition pruning nor archiving can reach them.
+    """
+    cursor = conn.cursor()
+    _take_migration_lock(cursor)
+    try:
+        added = ensure_session_partitions(cursor)
+        conn.commit()
+        if added:
+            print(f"✅ Added {added} study_sessions partition(s)")
+        return added
+    finally:
+        _release_migration_lock(cursor)
+
+
+def run_migrations(conn):
+    """Apply every migration newer than the database's schema_version, in order"""
+    cursor = conn.cursor()
+    _take_migration_lock(cursor)
+    try:
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT version FROM schema_version")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            print(f"Applying migration {version}: {description}...")
+            migrate(conn, cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            conn.commit()
+            print(f"✅ Migration {version} applied")
+
+        # Keep empty partitions ready for the coming months
+        added = ensure_session_partitions(cursor)
+        conn.commit()
+        if added:
+            print(f"✅ Added {added} study_sessions partition(s)")
+    finally:
+        _release_migration_lock(cursor)
@@ -0,0 +1,231 @@
+from collections import Counter
+from datetime import datetime
+import atexit
+import os
+import sys
+import threading
+import time
+
+SLOW_QUERY_LOG = "slow_queries.log"
+DEFAULT_SLOW_QUERY_MS = 200
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+# Frames from these files are skipped when working out who ran a query
+_INTERNAL_FILES = {'database.py', 'sqlite_database.py', 'query_stats.py', 'migrations.py',
+                   'contextlib.py', 'threading.py', 'thread.py', '_base.py'}
+
+
+def _normalize(sql):
+    """Collapse whitespace so the same statement always maps to one entry"""
+    return " ".join(sql.split())
+
+
+def _call_site():
+    """Return 'file:line function' for the first frame outside the data layer"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES:
+            return f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    # e.g. the parallel analytics workers, which have no app frames
+    return f"thread {threading.current_thread().name}"
+
+
+class StatementStats:
+    """Running totals for one SQL statement"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * len(BUCKETS_MS)
+        self.call_sites = Counter()
+
+    def add(self, elapsed_ms, rows, call_site):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        self.call_sites[call_site] += 1
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                break
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls"""
+        target = self.calls * fraction
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.histogram):
+            seen += count
+            if seen >= target:
+                return bound if bound != float('inf') else self.max_ms
+        return self.max_ms
+
+
+class QueryStats:
+    """Per-statement latency, row counts and call sites for every query this process runs"""
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, slow_log_path=SLOW_QUERY_LOG):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = slow_log_path
+        self.summary_at_exit = False
+        self._names = {}
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def register_names(self, queries):
+        """Label statements from a {name: sql} dict (e.g. database.QUERIES) by name in reports"""
+        with self._lock:
+            for name, sql in queries.items():
+                self._names[_normalize(sql)] = name
+
+    def record(self, sql, elapsed_ms, rows, call_site):
+        key = _normalize(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats(self._names.get(key, key[:70]))
+            stats.add(elapsed_ms, rows, call_site)
+
+        if self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms:
+            self._log_slow(key, elapsed_ms, rows, call_site)
+
+    def _log_slow(self, sql, elapsed_ms, rows, call_site):
+        line = f"{datetime.now().isoformat(' ', 'seconds')}\t{elapsed_ms:.1f}ms\t{rows} rows\t{call_site}\t{sql}\n"
+        try:
+            with self._lock:
+                with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+    def format_summary(self, limit=20):
+        """Table of the statements with the most total time"""
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+            if not statements:
+                return "No queries recorded"
+
+            lines = [
+                f"{'statement':<32} {'calls':>6} {'total ms':>10} {'avg ms':>8} {'p50':>6} {'p95':>6} {'max ms':>8} {'rows':>8}  top caller",
+                "-" * 120,
+            ]
+            for s in statements:
+                top_site = s.call_sites.most_common(1)[0][0]
+                lines.append(
+                    f"{s.name[:32]:<32} {s.calls:>6} {s.total_ms:>10.1f} {s.total_ms / s.calls:>8.1f} "
+                    f"{s.percentile(0.5):>6g} {s.percentile(0.95):>6g} {s.max_ms:>8.1f} {s.rows:>8}  {top_site}"
+                )
+            return "\n".join(lines)
+
+    def print_summary(self):
+        print("\n📊 Query summary")
+        print(self.format_summary())
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times each statement, including fetching its rows"""
+
+    def __init__(self, cursor, stats):
+        self._raw = cursor
+        self._stats = stats
+        self._pending = None  # [sql, elapsed_ms, rows, call_site] until the result is consumed
+
+    def _finish(self):
+        if self._pending is not None:
+            self._stats.record(*self._pending)
+            self._pending = None
+
+    def _run(self, method, sql, args, kwargs):
+        self._finish()
+        call_site = _call_site()
+        start = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            rows = max(self._raw.rowcount or 0, 0)
+            self._pending = [sql, elapsed_ms, rows, call_site]
+
+    def execute(self, sql, *args, **kwargs):
+        result = self._run(self._raw.execute, sql, args, kwargs)
+        if kwargs.get('multi'):
+            # The statements' results are read later through the generator
+            self._finish()
+        return result
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._run(self._raw.executemany, sql, args, kwargs)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        if self._pending is not None:
+            self._pending[1] += (time.perf_counter() - start) * 1000
+            if isinstance(result, list):
+                self._pending[2] += len(result)
+            elif result is not None:
+                self._pending[2] += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._raw.fetchone)
+
+    def fetchall(self):
+        return self._fetch(self._raw.fetchall)
+
+    def fetchmany(self, size):
+        return self._fetch(self._raw.fetchmany, size)
+
+    def close(self):
+        self._finish()
+        return self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors report to a QueryStats"""
+
+    def __init__(self, conn, stats):
+        self._raw = conn
+        self._stats = stats
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+_stats = QueryStats()
+
+
+def get_stats():
+    """Return the process-wide query statistics"""
+    return _stats
+
+
+def configure(config):
+    """Apply slow_query_ms / query_stats_at_exit from mysql_config.json"""
+    _stats.slow_query_ms = config.get('slow_query_ms', DEFAULT_SLOW_QUERY_MS)
+    _stats.summary_at_exit = bool(config.get('query_stats_at_exit', False))
+
+
+def _summary_at_exit():
+    if _stats.summary_at_exit:
+        _stats.print_summary()
+
+
+atexit.register(_summary_at_exit)
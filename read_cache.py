@@ -0,0 +1,75 @@
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+DEFAULT_CACHE_SIZE = 256  # entries; 0 turns the cache off
+DEFAULT_CACHE_TTL = 300  # seconds; None keeps entries until evicted or invalidated
+
+
+class ReadCache:
+    """Size-bounded LRU of query results, with optional expiry
+
+    Values are copied in and out, so callers can modify what they get back
+    without changing what later callers see. generation goes up on every
+    invalidation; a reader passes the generation it started at to put(), so
+    a result read before a concurrent write is never stored after it.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (True, value) for a live entry, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, generation=None):
+        """Store value, unless something was invalidated since generation (when given)"""
+        if not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def format_summary(self):
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "n/a"
+        return f"Read cache: {self.hits} hits, {self.misses} misses ({rate}), {len(self._entries)} entries"
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+import mysql.connector
+
+DEFAULT_REPLICA_MAX_LAG = 5  # seconds a replica may trail the primary and still serve reads
+REPLICA_CHECK_INTERVAL = 5  # seconds between replication lag checks
+REPLICA_RETRY_INTERVAL = 30  # seconds before a replica that failed is tried again
+
+# Users who wrote recently, shared by every window of the app (the timer
+# records a session, the dashboard then reads it)
+READ_PINS_FILE = "read_pins.json"
+
+
+class Replica:
+    """A read replica's connection pool and its last measured replication lag"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None  # seconds behind the primary; None if unknown or broken
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def usable(self, max_lag):
+        """True if the replica is up and at most max_lag seconds behind, re-measuring every few seconds"""
+        with self._lock:
+            if time.monotonic() >= self._next_check:
+                self.lag = self._measure_lag()
+                interval = REPLICA_CHECK_INTERVAL if self.lag is not None else REPLICA_RETRY_INTERVAL
+                self._next_check = time.monotonic() + interval
+            return self.lag is not None and self.lag <= max_lag
+
+    def mark_down(self):
+        """Stop using the replica until the retry interval has passed (after a failed read)"""
+        with self._lock:
+            self.lag = None
+            self._next_check = time.monotonic() + REPLICA_RETRY_INTERVAL
+
+    def _measure_lag(self):
+        try:
+            conn = self.pool.get_connection()
+        except mysql.connector.Error as err:
+            print(f"⚠️ Read replica {self.name} unavailable: {err}")
+            return None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.errors.ProgrammingError:
+                # Before MySQL 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            rows = cursor.fetchall()
+            cursor.close()
+        except mysql.connector.Error as err:
+            print(f"⚠️ Could not check read replica {self.name}: {err}")
+            self.pool.discard(conn)
+            return None
+        self.pool.release(conn)
+        if not rows:
+            print(f"⚠️ {self.name} is not replicating; not using it for reads")
+            return None
+        # NULL while replication is stopped
+        status = rows[0]
+        return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+
+
+class ReadPins:
+    """Users whose reads stay on the primary for a while after they write
+
+    Kept in a small file so the pin made by one window (the timer) is seen
+    by the next (the dashboard), which runs as a separate process.
+    """
+
+    def __init__(self, seconds, path=READ_PINS_FILE):
+        self.seconds = seconds
+        self.path = path
+        self._pins = {}  # str(user_id) -> time.time() the pin expires
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def pin(self, user_id):
+        with self._lock:
+            self._reload()
+            now = time.time()
+            self._pins = {user: until for user, until in self._pins.items() if until > now}
+            self._pins[str(user_id)] = now + self.seconds
+            try:
+                temp = self.path + ".tmp"
+                with open(temp, 'w', encoding='utf-8') as f:
+                    json.dump(self._pins, f)
+                os.replace(temp, self.path)
+                self._mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                print(f"⚠️ Could not save read pins: {e}")
+
+    def is_pinned(self, user_id):
+        with self._lock:
+            self._reload()
+            return self._pins.get(str(user_id), 0) > time.time()
+
+    def _reload(self):
+        """Pick up pins written by other processes since the last look"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._pins = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError):
+            pass
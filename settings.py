@@ -4,10 +4,15 @@ import json
 import os
 import subprocess
 import threading
+from database import get_database, start_background_connect, database_status, DB_AVAILABLE
+from write_journal import get_journal
 
 # Initialize pygame
 pygame.init()
 
+# Open the database in the background (as in main.py) so the screen draws at once
+start_background_connect()
+
 # Screen dimensions
 SCREEN_INFO = pygame.display.Info()
 SCREEN_WIDTH, SCREEN_HEIGHT = SCREEN_INFO.current_w, SCREEN_INFO.current_h
@@ -40,28 +45,6 @@ small_font = pygame.font.SysFont('timesnewroman', 20)
 tiny_font = pygame.font.SysFont('timesnewroman', 18)
 button_font = pygame.font.SysFont('timesnewroman', 22, bold=True)
 
-def get_database_connection():
-    """Create a database connection"""
-    try:
-        config_file = "mysql_config.json"
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                mysql_config = json.load(f)
-        else:
-            mysql_config = {
-                'host': 'localhost',
-                'user': 'root',
-                'password': '',
-                'database': 'focus_app',
-                'port': 3306
-            }
-        
-        from database import Database
-        return Database(mysql_config)
-    except Exception as e:  
-        print(f"Database connection error: {e}")
-        return None
-
 def get_current_user():
     """Get current user from file"""
     try:
@@ -77,102 +60,58 @@ def get_current_user():
 
 def get_all_users():
     """Get all users from database"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM users ORDER BY username")
-            users = cursor.fetchall()
-            cursor.close()
-            db.connection.close()
-            return users
-    except Exception as e:
-        print(f"Error loading users: {e}")
+    db = get_database()
+    if db:
+        return db.get_all_users()
     return []
 
 def get_blocked_sites(user_id):
     """Get user's blocked sites"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT website FROM blocked_sites WHERE user_id = %s ORDER BY website", (user_id,))
-            sites = cursor.fetchall()
-            cursor.close()
-            db.connection.close()
-            return [site['website'] for site in sites]
-    except Exception as e:
-        print(f"Error loading blocked sites: {e}")
+    db = get_database()
+    if db:
+        return db.get_blocked_sites(user_id)
     return []
 
 def add_blocked_site(user_id, website):
     """Add a blocked site"""
-    try:
-        website = website.strip().lower()
-        if not website:
-            return False, "Website cannot be empty"
-        
-        # Remove http:// or https://
-        website = website.replace('http://', '').replace('https://', '')
-        website = website.replace('www.', '')
-        
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor()
-            
-            # Check if already exists
-            cursor.execute("SELECT id FROM blocked_sites WHERE user_id = %s AND website = %s", 
-                          (user_id, website))
-            if cursor.fetchone():
-                cursor.close()
-                db.connection.close()
-                return False, "Website already blocked"
-            
-            # Try to add site
-            try:
-                cursor.execute("INSERT INTO blocked_sites (user_id, website) VALUES (%s, %s)", 
-                              (user_id, website))
-                db.connection.commit()
-                cursor.close()
-                db.connection.close()
-                return True, "Website added successfully"
-            except Exception as insert_error:
-                error_msg = str(insert_error)
-                cursor.close()
-                db.connection.close()
-                
-                # Check for foreign key constraint error
-                if "foreign key constraint" in error_msg.lower():
-                    return False, f"User ID {user_id} not found in database. Please log in again."
-                elif "1452" in error_msg:  # MySQL foreign key error code
-                    return False, f"User ID {user_id} not found in database. Please log in again."
-                else:
-                    return False, f"Error: {error_msg}"
-                    
-    except Exception as e:
-        print(f"Error adding blocked site: {e}")
-        import traceback
-        traceback.print_exc()
-        return False, f"Error: {str(e)}"
+    website = website.strip().lower()
+    if not website:
+        return False, "Website cannot be empty"
+    
+    # Remove http:// or https://
+    website = website.replace('http://', '').replace('https://', '')
+    website = website.replace('www.', '')
+    
+    # Offline, or older offline writes still queued: journal this one behind them
+    db = get_database()
+    if not db or not db.is_connected() or not get_journal().catch_up(db):
+        if get_journal().append('add_blocked_site', {'user_id': user_id, 'website': website}):
+            return True, "Offline: website will be added when the database is back"
+        return False, "Could not connect to database"
+    
+    # Check if already exists
+    if website in db.get_blocked_sites(user_id):
+        return False, "Website already blocked"
     
-    return False, "Could not connect to database"
+    if db.add_blocked_site(user_id, website):
+        return True, "Website added successfully"
+    
+    # Most likely a foreign key failure from a stale current_user.txt
+    if not db.get_user_by_id(user_id):
+        return False, f"User ID {user_id} not found in database. Please log in again."
+    return False, "Error: could not add website"
 
 def remove_blocked_site(user_id, website):
     """Remove a blocked site"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor()
-            cursor.execute("DELETE FROM blocked_sites WHERE user_id = %s AND website = %s", 
-                          (user_id, website))
-            db.connection.commit()
-            cursor.close()
-            return True, "Website removed successfully"
-    except Exception as e:
-        print(f"Error removing blocked site: {e}")
-        return False, f"Error: {str(e)}"
+    db = get_database()
+    if not db or not db.is_connected() or not get_journal().catch_up(db):
+        if get_journal().append('remove_blocked_site', {'user_id': user_id, 'website': website}):
+            return True, "Offline: website will be removed when the database is back"
+        return False, "Could not connect to database"
     
-    return False, "Could not connect to database"
+    if db.remove_blocked_site(user_id, website):
+        return True, "Website removed successfully"
+    return False, "Error: could not remove website"
 
 class Button:
     def __init__(self, x, y, width, height, text, color=BUTTON_PRIMARY, hover_color=BUTTON_HOVER):
@@ -258,31 +197,24 @@ def settings_screen():
         else:
             return
     
-    # Verify user exists in database
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM users WHERE id = %s", (user_id,))
-            user_data = cursor.fetchone()
-            cursor.close()
-            db.connection.close()
-            
-            if not user_data:
-                # User doesn't exist in database anymore
-                print(f"User ID {user_id} not found in database!")
-                pygame.quit()
-                import login_screen
-                result = login_screen.login_screen()
-                if result[0]:
-                    user_id, username = result
-                    pygame.init()
-                    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-                    pygame.display.set_caption("Focus Timer - Settings")
-                else:
-                    return
-    except Exception as e:
-        print(f"Error validating user: {e}")
+    # Verify user exists in database (if it's already open; otherwise once it is, below)
+    db = get_database()
+    if db and db.is_connected():
+        user_data = db.get_user_by_id(user_id)
+        
+        if not user_data:
+            # User doesn't exist in database anymore
+            print(f"User ID {user_id} not found in database!")
+            pygame.quit()
+            import login_screen
+            result = login_screen.login_screen()
+            if result[0]:
+                user_id, username = result
+                pygame.init()
+                screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+                pygame.display.set_caption("Focus Timer - Settings")
+            else:
+                return
     
     # State
     current_tab = "account"  # account, websites, database, music, about
@@ -328,10 +260,20 @@ def settings_screen():
     # User management button
     manage_users_button = Button(SCREEN_WIDTH - 220, 40, 180, 50, "Manage Users")
     
+    # Whether the database was open at startup; if not, what was loaded above is reloaded once it is
+    db_available = database_status() == DB_AVAILABLE
+    
     running = True
     while running:
         mouse_pos = pygame.mouse.get_pos()
         
+        if not db_available and database_status() == DB_AVAILABLE:
+            db_available = True
+            blocked_sites = get_blocked_sites(user_id)
+            if not get_database().get_user_by_id(user_id):
+                message = f"User ID {user_id} not found in database. Please log in again."
+                message_color = ERROR_RED
+        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
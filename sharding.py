@@ -0,0 +1,380 @@
+from concurrent.futures import ThreadPoolExecutor
+import random
+import uuid
+
+import mysql.connector
+
+import migrations
+from database import open_database
+
+# Users get random ids so any shard can create one without asking the
+# others: an id only ever lives on the shard it hashes to, so that shard's
+# primary key is enough to keep it unique. Signed INT, like users.id.
+MAX_USER_ID = 2 ** 31 - 1
+
+# Per-user tables move_user() copies, as (table, columns, key). Ids are
+# reassigned by the target's AUTO_INCREMENT; key is the column that
+# identifies a copied row on the target.
+SESSION_COPY_COLUMNS = ('user_id, start_time, end_time, duration_minutes, focus_rating, subject_tag, notes, '
+                        'distractions_count, client_id')
+MOVED_TABLES = (
+    ('blocked_sites', 'user_id, website, added_at', 'website'),
+    ('todos', 'user_id, task, completed, created_at, client_id', 'client_id'),
+    ('study_sessions', SESSION_COPY_COLUMNS, 'client_id'),
+    # The archive has no AUTO_INCREMENT, and its source ids may already be
+    # taken on the target, so rows pass through the target's study_sessions
+    # for a fresh id (see _copy_archived_sessions)
+    ('study_sessions_archive', SESSION_COPY_COLUMNS, 'client_id'),
+)
+MOVE_BATCH_SIZE = 1000  # rows per copy/delete transaction
+
+
+def shard_index(user_id, shards):
+    """Jump consistent hash of user_id onto range(shards)
+
+    Appending a shard moves only about 1/shards of the users to it (plain
+    modulo would reshuffle nearly all of them), which keeps rebalancing small.
+    Shards must therefore only ever be added at the end of the list.
+    """
+    key = user_id & 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_configs(config):
+    """One full config per shard: the shard's own settings over the shared top-level ones"""
+    shared = {key: value for key, value in config.items() if key != 'shards'}
+    return [dict(shared, **shard) for shard in config['shards']]
+
+
+class ShardedDatabase:
+    """Database facade over several shards, each a complete Database of its own
+
+    Calls about one user run on the shard that user's id hashes to. Calls
+    that aren't (listing users, logging in by name, maintenance) run on
+    every shard in parallel and their results are merged.
+    """
+
+    # Database methods whose first argument is the user_id they read or write
+    USER_METHODS = (
+        'get_user_by_id', 'update_password', 'delete_user',
+        'add_blocked_site', 'get_blocked_sites', 'remove_blocked_site',
+        'record_study_session', 'get_study_analytics', 'get_recent_sessions', 'get_session_history',
+        'get_study_time_by_period', 'get_todos', 'get_completed_todos', 'save_todo_changes',
+        'search', 'check_query_plans',
+    )
+
+    def __init__(self, config):
+        self.config = config
+        configs = shard_configs(config)
+        with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+            self.shards = list(executor.map(open_database, configs))
+
+    def shard_for(self, user_id):
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def __getattr__(self, name):
+        if name not in self.USER_METHODS:
+            raise AttributeError(name)
+
+        def call(user_id, *args, **kwargs):
+            return getattr(self.shard_for(user_id), name)(user_id, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def _fan_out(self, name, *args):
+        """Call name(*args) on every shard at once; returns the results in shard order"""
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            return list(executor.map(lambda shard: getattr(shard, name)(*args), self.shards))
+
+    def connect(self):
+        return all(self._fan_out('connect'))
+
+    def is_connected(self):
+        """True once every shard has a connection pool"""
+        return all(shard.is_connected() for shard in self.shards)
+
+    def clear_cache(self):
+        for shard in self.shards:
+            shard.clear_cache()
+
+    def query_summary(self):
+        # Statement stats are collected per process, across every shard
+        return self.shards[0].query_summary()
+
+    # Users: each lives on one shard, but names are looked up everywhere
+    def create_user(self, username, password):
+        """Create a user on the shard their new id hashes to; returns the id, or None"""
+        if any(self._fan_out('get_user_by_username', username)):
+            print(f"Error creating user: username {username} is taken")
+            return None
+        user_id = random.randint(1, MAX_USER_ID)
+        return self.shard_for(user_id).create_user(username, password, user_id)
+
+    def verify_user(self, username, password):
+        return next((user for user in self._fan_out('verify_user', username, password) if user), None)
+
+    def get_user_by_username(self, username):
+        return next((user for user in self._fan_out('get_user_by_username', username) if user), None)
+
+    def get_all_users(self):
+        """Every shard's users, merged and sorted by name"""
+        users = {}
+        for shard_users in self._fan_out('get_all_users'):
+            # A user being rebalanced briefly exists on two shards
+            for user in shard_users:
+                users[user['id']] = user
+        return sorted(users.values(), key=lambda user: user['username'])
+
+    def update_username(self, user_id, new_username):
+        """Rename a user, unless another shard already has a user by that name"""
+        if any(user and user['id'] != user_id for user in self._fan_out('get_user_by_username', new_username)):
+            print(f"Error updating username: {new_username} is taken")
+            return False
+        return self.shard_for(user_id).update_username(user_id, new_username)
+
+    # Batched writes, split by shard
+    def _by_shard(self, items, user_id):
+        """Group items by the shard that owns user_id(item), keeping their order"""
+        groups = {}
+        for item in items:
+            groups.setdefault(shard_index(user_id(item), len(self.shards)), []).append(item)
+        return groups
+
+    def record_study_sessions(self, sessions):
+        """Record sessions on their users' shards, in parallel; one transaction per shard
+
+        Returns how many were recorded, or None if any shard's batch failed
+        (other shards' batches may still have been saved).
+        """
+        groups = self._by_shard(sessions, lambda session: session['user_id'])
+        if not groups:
+            return 0
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            counts = list(executor.map(
+                lambda group: self.shards[group[0]].record_study_sessions(group[1]), groups.items()
+            ))
+        return None if None in counts else sum(counts)
+
+    def replay_writes(self, entries):
+        """Replay journaled writes on each entry's shard; raises like Database.replay_writes
+
+        Replaying is idempotent, so if one shard fails the whole batch can
+        simply be replayed again.
+        """
+        for index, shard_entries in self._by_shard(entries, lambda entry: entry['args']['user_id']).items():
+            self.shards[index].replay_writes(shard_entries)
+
+    # Maintenance, on every shard
+    def backfill_daily_rollups(self, user_id=None):
+        if user_id is not None:
+            return self.shard_for(user_id).backfill_daily_rollups(user_id)
+        counts = self._fan_out('backfill_daily_rollups')
+        return None if None in counts else sum(counts)
+
+    def archive_old_sessions(self, retention_months=None):
+        counts = self._fan_out('archive_old_sessions', retention_months)
+        return None if None in counts else sum(counts)
+
+    def compact_old_sessions(self, older_than_months=None):
+        counts = self._fan_out('compact_old_sessions', older_than_months)
+        return None if None in counts else sum(counts)
+
+    def dump(self, path):
+        print("Error dumping database: dump each shard with its own config")
+        return None
+
+    def restore(self, path):
+        print("Error restoring database: restore each shard with its own config")
+        return None
+
+    def rebalance(self, user_ids=None, dry_run=False):
+        """Move every user who isn't on the shard their id hashes to, e.g. after adding a shard
+
+        Returns the [(user_id, from shard, to shard)] moves made (or, with
+        dry_run, needed), or None if a move failed. Rerunning after a failure
+        picks up where it stopped.
+        """
+        moves = []
+        for index, shard in enumerate(self.shards):
+            shard.cache.invalidate(('get_all_users',))
+            for user in shard.get_all_users():
+                home = shard_index(user['id'], len(self.shards))
+                if home != index and (user_ids is None or user['id'] in user_ids):
+                    moves.append((user['id'], index, home))
+        if dry_run:
+            return moves
+
+        for user_id, source, target in moves:
+            try:
+                moved = move_user(self.shards[source], self.shards[target], user_id)
+            except mysql.connector.Error as err:
+                print(f"Error moving user {user_id}: {err}")
+                return None
+            print(f"  user {user_id}: shard {source} -> {target} ({sum(moved.values())} rows)")
+        return moves
+
+
+def _copy_archived_sessions(dst_cursor, user_id, values):
+    """Add archived sessions (SESSION_COPY_COLUMNS tuples) to the target's archive under new ids
+
+    Each is inserted into study_sessions for an AUTO_INCREMENT id and moved
+    straight into the archive, in the caller's transaction. Ones whose
+    client_id the target's archive already has (from an interrupted run)
+    are skipped.
+    """
+    client_ids = [row[-1] for row in values]
+    marks = ", ".join(["%s"] * len(client_ids))
+    dst_cursor.execute(
+        f"SELECT client_id FROM study_sessions_archive WHERE user_id = %s AND client_id IN ({marks})",
+        (user_id, *client_ids)
+    )
+    copied = {row[0] for row in dst_cursor.fetchall()}
+    values = [row for row in values if row[-1] not in copied]
+    if not values:
+        return
+    client_ids = [row[-1] for row in values]
+    marks = ", ".join(["%s"] * len(client_ids))
+    dst_cursor.executemany(
+        f"INSERT INTO study_sessions ({SESSION_COPY_COLUMNS}) VALUES ({', '.join(['%s'] * len(values[0]))})", values
+    )
+    dst_cursor.execute(
+        f"INSERT INTO study_sessions_archive ({migrations.SESSION_COLUMNS}) "
+        f"SELECT {migrations.SESSION_COLUMNS} FROM study_sessions WHERE user_id = %s AND client_id IN ({marks})",
+        (user_id, *client_ids)
+    )
+    dst_cursor.execute(
+        f"DELETE FROM study_sessions WHERE user_id = %s AND client_id IN ({marks})", (user_id, *client_ids)
+    )
+
+
+def move_user(source, target, user_id):
+    """Move one user's rows from the source Database to the target, while the app stays up
+
+    Run it after the shard map already sends the user to target, so new
+    writes land there. Rows are copied a batch at a time and only deleted
+    from the source once the target is seen to hold them; a move that fails
+    part way can be rerun. Raises mysql.connector.Error; returns {table: rows moved}.
+    """
+    moved = {}
+    with source._connection() as src, target._connection() as dst:
+        src_cursor = src.cursor(dictionary=True)
+        dst_cursor = dst.cursor()
+
+        # The user first: the other tables' foreign keys point at it
+        src_cursor.execute("SELECT id, username, password_hash, created_at FROM users WHERE id = %s", (user_id,))
+        user = src_cursor.fetchone()
+        if user is None:
+            return moved
+        dst_cursor.execute(
+            f"{target.INSERT_IGNORE} INTO users (id, username, password_hash, created_at) VALUES (%s, %s, %s, %s)",
+            (user['id'], user['username'], user['password_hash'], user['created_at'])
+        )
+        dst.commit()
+
+        # Sessions from before client ids existed get one, so a rerun can't copy them twice
+        for table in ('study_sessions', 'study_sessions_archive'):
+            src_cursor.execute(f"SELECT id FROM {table} WHERE user_id = %s AND client_id IS NULL", (user_id,))
+            unnamed = [(uuid.uuid4().hex, user_id, row['id']) for row in src_cursor.fetchall()]
+            if unnamed:
+                src_cursor.executemany(f"UPDATE {table} SET client_id = %s WHERE user_id = %s AND id = %s", unnamed)
+                src.commit()
+
+        for table, columns, key in MOVED_TABLES:
+            moved[table] = 0
+            names = [name.strip() for name in columns.split(',')]
+            placeholders = ", ".join(["%s"] * len(names))
+            while True:
+                src_cursor.execute(
+                    f"SELECT {'' if 'id' in names else 'id, '}{columns} FROM {table} "
+                    "WHERE user_id = %s ORDER BY id LIMIT %s",
+                    (user_id, MOVE_BATCH_SIZE)
+                )
+                rows = src_cursor.fetchall()
+                if not rows:
+                    break
+                values = [tuple(row[name] for name in names) for row in rows]
+                if table == 'study_sessions_archive':
+                    _copy_archived_sessions(dst_cursor, user_id, values)
+                else:
+                    # IGNORE: rows already copied by an earlier, interrupted run are skipped
+                    dst_cursor.executemany(
+                        f"{target.INSERT_IGNORE} INTO {table} ({columns}) VALUES ({placeholders})", values
+                    )
+                dst.commit()
+
+                keys = {row[key] for row in rows}
+                dst_cursor.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE user_id = %s AND {key} IN ({', '.join(['%s'] * len(keys))})",
+                    (user_id, *keys)
+                )
+                if dst_cursor.fetchone()[0] < len(keys):
+                    raise mysql.connector.errors.IntegrityError(
+                        f"{table} rows for user {user_id} did not all arrive on the target; source left intact"
+                    )
+                ids = [row['id'] for row in rows]
+                src_cursor.execute(
+                    f"DELETE FROM {table} WHERE user_id = %s AND id IN ({', '.join(['%s'] * len(ids))})",
+                    (user_id, *ids)
+                )
+                src.commit()
+                moved[table] += len(rows)
+
+        # Keep the higher of each record, and its date when the target has none
+        src_cursor.execute(
+            "SELECT record_type, record_value, achieved_at FROM personal_records WHERE user_id = %s", (user_id,)
+        )
+        records = src_cursor.fetchall()
+        if records:
+            dst_cursor.executemany(
+                f"{target.INSERT_IGNORE} INTO personal_records (user_id, record_type, record_value, achieved_at) "
+                "VALUES (%s, %s, %s, %s)",
+                [(user_id, row['record_type'], row['record_value'], row['achieved_at']) for row in records]
+            )
+            dst_cursor.executemany(
+                target.queries['record_upsert'],
+                [(user_id, row['record_type'], row['record_value']) for row in records]
+            )
+            dst.commit()
+        moved['personal_records'] = len(records)
+
+        # Totals of compacted sessions; keyed by (user, day, subject), so a rerun skips what's there
+        src_cursor.execute(
+            "SELECT day, subject_tag, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus "
+            "FROM study_subject_rollup WHERE user_id = %s", (user_id,)
+        )
+        compacted = src_cursor.fetchall()
+        if compacted:
+            dst_cursor.executemany(
+                f"{target.INSERT_IGNORE} INTO study_subject_rollup (user_id, day, subject_tag, total_minutes, "
+                "session_count, focus_sum, focus_count, max_session, max_focus) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                [(user_id, row['day'], row['subject_tag'], row['total_minutes'], row['session_count'], row['focus_sum'],
+                  row['focus_count'], row['max_session'], row['max_focus']) for row in compacted]
+            )
+            dst.commit()
+        moved['study_subject_rollup'] = len(compacted)
+        src_cursor.close()
+        dst_cursor.close()
+
+        # Rebuilt from the sessions now on the target, so rerunning can't count a day twice
+        migrations.backfill_daily_rollups(dst, [user_id], target.SESSION_TABLES, compacted=True)
+        migrations.rebuild_session_search(dst, [user_id], target.SESSION_TABLES)
+
+        cursor = src.cursor()
+        cursor.execute("DELETE FROM study_session_search WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM study_daily_rollup WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM study_subject_rollup WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM personal_records WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        src.commit()
+        cursor.close()
+
+    for db in (source, target):
+        db._forget_user(user_id)
+        db.cache.invalidate(('get_blocked_sites', user_id), ('get_todos', user_id))
+    return moved
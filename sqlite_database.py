@@ -0,0 +1,562 @@
+import sqlite3
+from datetime import date, datetime
+import atexit
+import os
+import threading
+
+import mysql.connector
+
+from database import (Database, ConnectionPool, QUERIES, DEFAULT_POOL_SIZE, DEFAULT_POOL_TIMEOUT,
+                      DEFAULT_SESSION_RETENTION_MONTHS)
+from migrations import SESSION_COLUMNS, month_start
+
+DEFAULT_SQLITE_PATH = "focus_app.db"
+
+# Applied to every new connection. WAL lets the dashboard read while the
+# timer writes; NORMAL sync is safe under WAL and avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",  # 16 MB
+    "PRAGMA temp_store = MEMORY",
+)
+
+# sqlite3.OperationalError messages that mean another connection holds the
+# database, vs. ones that mean the SQL itself is wrong (see _mysql_error)
+BUSY_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+SQL_MISTAKE_MESSAGES = ("no such ", "syntax error", "has no column", "already exists", "ambiguous column")
+
+# Bumped whenever SCHEMA changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 6
+
+# Sessions moved out of study_sessions by archive_old_sessions()
+ARCHIVE_TABLE = """
+CREATE TABLE IF NOT EXISTS study_sessions_archive (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    start_time DATETIME NOT NULL,
+    end_time DATETIME,
+    duration_minutes INTEGER,
+    focus_rating INTEGER,
+    subject_tag VARCHAR(50),
+    notes TEXT,
+    distractions_count INTEGER DEFAULT 0,
+    client_id CHAR(32),
+    PRIMARY KEY (id, start_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_archive_user_time ON study_sessions_archive (user_id, start_time);
+"""
+
+# Totals of sessions removed by compact_old_sessions(), as in migration 10
+SUBJECT_ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS study_subject_rollup (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day DATE NOT NULL,
+    subject_tag VARCHAR(50) NOT NULL DEFAULT '',
+    total_minutes INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    focus_sum INTEGER NOT NULL DEFAULT 0,
+    focus_count INTEGER NOT NULL DEFAULT 0,
+    max_session INTEGER NOT NULL DEFAULT 0,
+    max_focus INTEGER,
+    PRIMARY KEY (user_id, day, subject_tag)
+) WITHOUT ROWID;
+"""
+
+# FTS5 stand-ins for migration 9's FULLTEXT indexes. todos_search indexes
+# todos in place (external content, kept in step by triggers); session text
+# is copied into study_session_search so it survives archiving, as on MySQL.
+SEARCH_TABLES = """
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_search USING fts5(task, content='todos', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS todos_search_insert AFTER INSERT ON todos BEGIN
+    INSERT INTO todos_search (rowid, task) VALUES (new.id, new.task);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_search_delete AFTER DELETE ON todos BEGIN
+    INSERT INTO todos_search (todos_search, rowid, task) VALUES ('delete', old.id, old.task);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_search_update AFTER UPDATE OF task ON todos BEGIN
+    INSERT INTO todos_search (todos_search, rowid, task) VALUES ('delete', old.id, old.task);
+    INSERT INTO todos_search (rowid, task) VALUES (new.id, new.task);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS study_session_search USING fts5(
+    subject_tag, notes,
+    session_id UNINDEXED, user_id UNINDEXED, start_time UNINDEXED, duration_minutes UNINDEXED
+);
+CREATE TRIGGER IF NOT EXISTS study_sessions_search_insert AFTER INSERT ON study_sessions
+WHEN new.subject_tag > '' OR new.notes > '' BEGIN
+    INSERT INTO study_session_search (session_id, user_id, start_time, duration_minutes, subject_tag, notes)
+    VALUES (new.id, new.user_id, new.start_time, new.duration_minutes, new.subject_tag, new.notes);
+END;
+"""
+
+# The SQLite equivalent of migrations 1-10, for new database files. SQLite has
+# no partitions; archiving moves rows instead.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS study_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    start_time DATETIME NOT NULL,
+    end_time DATETIME,
+    duration_minutes INTEGER,
+    focus_rating INTEGER,
+    subject_tag VARCHAR(50),
+    notes TEXT,
+    distractions_count INTEGER DEFAULT 0,
+    client_id CHAR(32) UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_time
+    ON study_sessions (user_id, start_time, duration_minutes, focus_rating);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_subject
+    ON study_sessions (user_id, subject_tag, duration_minutes, focus_rating);
+CREATE INDEX IF NOT EXISTS idx_sessions_history ON study_sessions (user_id, start_time, id);
+
+CREATE TABLE IF NOT EXISTS blocked_sites (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    website VARCHAR(255) NOT NULL,
+    added_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (user_id, website)
+);
+
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    task VARCHAR(500) NOT NULL,
+    completed BOOLEAN DEFAULT 0,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    client_id CHAR(32) NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_todos_user_created ON todos (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_todos_user_completed ON todos (user_id, completed, id);
+
+CREATE TABLE IF NOT EXISTS personal_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    record_type VARCHAR(50) NOT NULL,
+    record_value FLOAT NOT NULL,
+    achieved_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (user_id, record_type)
+);
+
+CREATE TABLE IF NOT EXISTS study_daily_rollup (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day DATE NOT NULL,
+    total_minutes INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    focus_sum INTEGER NOT NULL DEFAULT 0,
+    focus_count INTEGER NOT NULL DEFAULT 0,
+    max_session INTEGER NOT NULL DEFAULT 0,
+    max_focus INTEGER,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+""" + ARCHIVE_TABLE + SEARCH_TABLES + SUBJECT_ROLLUP_TABLE
+
+# Steps from each older user_version to the next, for existing files
+UPGRADES = {
+    2: """
+        ALTER TABLE study_sessions ADD COLUMN client_id CHAR(32);
+        CREATE UNIQUE INDEX IF NOT EXISTS unique_session_client ON study_sessions (client_id);
+        ALTER TABLE todos ADD COLUMN client_id CHAR(32);
+        UPDATE todos SET client_id = lower(hex(randomblob(16))) WHERE client_id IS NULL;
+        CREATE UNIQUE INDEX IF NOT EXISTS unique_todo_client ON todos (client_id);
+    """,
+    3: ARCHIVE_TABLE,
+    4: "CREATE INDEX IF NOT EXISTS idx_sessions_history ON study_sessions (user_id, start_time, id);",
+    5: SEARCH_TABLES + """
+        INSERT INTO todos_search (todos_search) VALUES ('rebuild');
+        INSERT INTO study_session_search (session_id, user_id, start_time, duration_minutes, subject_tag, notes)
+            SELECT id, user_id, start_time, duration_minutes, subject_tag, notes FROM study_sessions
+            WHERE subject_tag > '' OR notes > ''
+            UNION ALL
+            SELECT id, user_id, start_time, duration_minutes, subject_tag, notes FROM study_sessions_archive
+            WHERE subject_tag > '' OR notes > '';
+    """,
+    6: SUBJECT_ROLLUP_TABLE,
+}
+
+# SQLite has no DAYNAME(); strftime('%w') is 0 for Sunday
+_DAYNAME = """
+    CASE strftime('%w', day)
+        WHEN '0' THEN 'Sunday' WHEN '1' THEN 'Monday' WHEN '2' THEN 'Tuesday'
+        WHEN '3' THEN 'Wednesday' WHEN '4' THEN 'Thursday' WHEN '5' THEN 'Friday'
+        ELSE 'Saturday'
+    END"""
+
+# Sunday-start week of the year, the weeks YEARWEEK() groups by (strftime's
+# %U only exists in newer SQLite releases)
+_WEEK = "((CAST(strftime('%j', day) AS INTEGER) + 6 - CAST(strftime('%w', day) AS INTEGER)) / 7)"
+
+# Statements whose MySQL form doesn't run on SQLite. Averages multiply by
+# 1.0 because SQLite divides integers as integers.
+SQLITE_QUERIES = dict(
+    QUERIES,
+    weekly_data=f"""
+        SELECT
+            CAST(strftime('%Y', day) AS INTEGER) as year,
+            {_WEEK} as week,
+            SUM(total_minutes) as total_minutes,
+            SUM(session_count) as session_count,
+            SUM(focus_sum) * 1.0 / NULLIF(SUM(focus_count), 0) as avg_focus
+        FROM study_daily_rollup
+        WHERE user_id = %s AND day >= %s
+        GROUP BY year, week
+        ORDER BY year DESC, week DESC
+        LIMIT 4
+    """,
+    daily_data="""
+        SELECT
+            day as date,
+            total_minutes as daily_minutes,
+            session_count as sessions,
+            focus_sum * 1.0 / NULLIF(focus_count, 0) as avg_focus
+        FROM study_daily_rollup
+        WHERE user_id = %s AND day >= %s
+        ORDER BY date DESC
+    """,
+    records="""
+        SELECT
+            MAX(max_session) as longest_session,
+            SUM(total_minutes) * 1.0 / NULLIF(SUM(session_count), 0) as avg_session_length,
+            SUM(total_minutes) as total_study_time,
+            SUM(session_count) as total_sessions,
+            MAX(max_focus) as best_focus,
+            SUM(focus_sum) * 1.0 / NULLIF(SUM(focus_count), 0) as avg_focus_lifetime
+        FROM study_daily_rollup
+        WHERE user_id = %s
+    """,
+    best_day=f"""
+        SELECT
+            {_DAYNAME} as day_name,
+            SUM(total_minutes) * 1.0 / SUM(session_count) as avg_minutes,
+            SUM(session_count) as session_count
+        FROM study_daily_rollup
+        WHERE user_id = %s
+        GROUP BY strftime('%w', day)
+        ORDER BY avg_minutes DESC
+        LIMIT 1
+    """,
+    # FTS5 ranks with bm25(), lower is better. start_time comes back as text
+    # from the FTS table, so its type is named for PARSE_COLNAMES.
+    search_sessions="""
+        SELECT
+            session_id as id, start_time as "start_time [DATETIME]", duration_minutes, subject_tag, notes,
+            -bm25(study_session_search) as score
+        FROM study_session_search
+        WHERE study_session_search MATCH %s AND user_id = %s AND start_time >= %s AND start_time < %s
+        ORDER BY score DESC
+        LIMIT %s
+    """,
+    search_todos="""
+        SELECT todos.id, todos.task, todos.completed, -bm25(todos_search) as score
+        FROM todos_search
+        JOIN todos ON todos.id = todos_search.rowid
+        WHERE todos_search MATCH %s AND todos.user_id = %s
+        ORDER BY score DESC
+        LIMIT %s
+    """,
+    rollup_upsert="""
+        INSERT INTO study_daily_rollup
+        (user_id, day, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            session_count = session_count + excluded.session_count,
+            focus_sum = focus_sum + excluded.focus_sum,
+            focus_count = focus_count + excluded.focus_count,
+            max_session = MAX(max_session, excluded.max_session),
+            max_focus = COALESCE(MAX(max_focus, excluded.max_focus), max_focus, excluded.max_focus)
+    """,
+    subject_rollup_upsert="""
+        INSERT INTO study_subject_rollup
+        (user_id, day, subject_tag, total_minutes, session_count, focus_sum, focus_count, max_session, max_focus)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (user_id, day, subject_tag) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            session_count = session_count + excluded.session_count,
+            focus_sum = focus_sum + excluded.focus_sum,
+            focus_count = focus_count + excluded.focus_count,
+            max_session = MAX(max_session, excluded.max_session),
+            max_focus = COALESCE(MAX(max_focus, excluded.max_focus), max_focus, excluded.max_focus)
+    """,
+    todo_upsert="""
+        INSERT INTO todos (user_id, client_id, task, completed)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (client_id) DO UPDATE SET task = excluded.task, completed = excluded.completed
+    """,
+    record_upsert="""
+        INSERT INTO personal_records (user_id, record_type, record_value)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (user_id, record_type) DO UPDATE SET
+            achieved_at = CASE WHEN excluded.record_value > record_value THEN excluded.achieved_at ELSE achieved_at END,
+            record_value = MAX(record_value, excluded.record_value)
+    """,
+)
+
+
+# Store datetimes the way MySQL DATETIME does, and read them back as objects
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "seconds"))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+def _mysql_error(err):
+    """Re-raise sqlite3 errors as the mysql.connector types Database already catches"""
+    if isinstance(err, sqlite3.IntegrityError):
+        return mysql.connector.errors.IntegrityError(msg=str(err))
+    if isinstance(err, sqlite3.OperationalError):
+        # sqlite3 raises OperationalError for bad SQL too; only a busy or locked
+        # database is worth a retry (or a fresh connection) like MySQL's
+        message = str(err).lower()
+        if any(busy in message for busy in BUSY_MESSAGES):
+            return mysql.connector.errors.OperationalError(msg=str(err))
+        if any(mistake in message for mistake in SQL_MISTAKE_MESSAGES):
+            return mysql.connector.errors.ProgrammingError(msg=str(err))
+        return mysql.connector.errors.DatabaseError(msg=str(err))
+    if isinstance(err, sqlite3.ProgrammingError):
+        return mysql.connector.errors.ProgrammingError(msg=str(err))
+    return mysql.connector.errors.DatabaseError(msg=str(err))
+
+
+class SQLiteCursor:
+    """Gives a sqlite3 cursor the slice of the mysql.connector cursor API Database uses"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(sql.replace('%s', '?'), tuple(params or ()))
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def executemany(self, sql, seq_params):
+        try:
+            self._cursor.executemany(sql.replace('%s', '?'), [tuple(params) for params in seq_params])
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Wraps a sqlite3 connection so it can sit in a ConnectionPool"""
+
+    def __init__(self, path):
+        try:
+            # Pooled connections move between threads, one at a time
+            self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                         check_same_thread=False)
+            for pragma in PRAGMAS:
+                self._conn.execute(pragma)
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def cursor(self, dictionary=False, prepared=False):
+        # sqlite3 already keeps compiled statements per connection, so prepared is a no-op
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLitePool(ConnectionPool):
+    """ConnectionPool over SQLite connections to one database file"""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT):
+        super().__init__({'path': path}, size, timeout)
+        self.path = path
+
+    def _connect(self):
+        return SQLiteConnection(self.path)
+
+    def _alive(self, conn):
+        # A local file never times a connection out
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_sqlite_pool(config):
+    """Return the process-wide pool for this database file, creating it on first use"""
+    path = os.path.abspath(config.get('sqlite_path', DEFAULT_SQLITE_PATH))
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = SQLitePool(
+                path,
+                config.get('pool_size', DEFAULT_POOL_SIZE),
+                config.get('pool_timeout', DEFAULT_POOL_TIMEOUT)
+            )
+            _pools[path] = pool
+        return pool
+
+
+def close_sqlite_pools():
+    """Close idle SQLite connections (registered to run at exit)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_sqlite_pools)
+
+
+class SQLiteDatabase(Database):
+    """Database backed by a local SQLite file, for single-user installs with no MySQL server"""
+
+    queries = SQLITE_QUERIES
+
+    # WAL gives a BEGIN'd reader a snapshot; foreign_keys can only change outside a transaction
+    SNAPSHOT_START = "BEGIN"
+    BULK_LOAD_START = ("PRAGMA foreign_keys = OFF",)
+    BULK_LOAD_END = ("PRAGMA foreign_keys = ON",)
+    INSERT_IGNORE = "INSERT OR IGNORE"
+
+    def connect(self):
+        """Open the SQLite file, creating it and its tables on first use"""
+        try:
+            self.pool = get_sqlite_pool(self.config)
+            self.initialize_database()
+            print(f"✅ Using local SQLite database {self.pool.path}")
+            return True
+        except mysql.connector.Error as err:
+            print(f"❌ SQLite database error: {err}")
+            self.pool = None
+            return False
+
+    def create_database(self):
+        """SQLite creates the file on connect; only the tables are needed"""
+        return self.connect()
+
+    def initialize_database(self):
+        """Create the tables unless PRAGMA user_version says they are current"""
+        if self.pool.schema_checked:
+            return
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            cursor.close()
+            try:
+                if version == 0:
+                    conn._conn.executescript(SCHEMA)
+                    conn._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                else:
+                    for upgrade in range(version + 1, SCHEMA_VERSION + 1):
+                        print(f"Upgrading SQLite schema to version {upgrade}...")
+                        conn._conn.executescript(UPGRADES[upgrade])
+                        conn._conn.execute(f"PRAGMA user_version = {upgrade}")
+            except sqlite3.Error as err:
+                raise _mysql_error(err) from err
+        self.pool.schema_checked = True
+
+    def archive_old_sessions(self, retention_months=None):
+        """Move sessions from months older than the retention window to study_sessions_archive"""
+        months = self._months_setting(retention_months, 'session_retention_months', DEFAULT_SESSION_RETENTION_MONTHS)
+        if months is None:
+            return None
+        cutoff = datetime.combine(month_start(date.today(), -months), datetime.min.time())
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"{self.INSERT_IGNORE} INTO study_sessions_archive ({SESSION_COLUMNS}) "
+                    f"SELECT {SESSION_COLUMNS} FROM study_sessions WHERE start_time < %s",
+                    (cutoff,)
+                )
+                cursor.execute("DELETE FROM study_sessions WHERE start_time < %s", (cutoff,))
+                archived = cursor.rowcount
+                conn.commit()
+                cursor.close()
+            return archived
+        except mysql.connector.Error as err:
+            print(f"Error archiving sessions: {err}")
+            return None
+
+    def _search_terms(self, words):
+        """FTS5 query matching any of words as a prefix; quoted so words like "or" stay words"""
+        return " OR ".join(f'"{word}"*' for word in words)
+
+    def _match_params(self, terms):
+        """FTS5 scores with bm25(), so the terms appear once"""
+        return (terms,)
+
+    def _analytics_batch(self, queries, replica=None):
+        """No network round trips to save in-process, so batch is just sequential"""
+        return self._analytics_sequential(queries, replica)
+
+    def check_query_plans(self, user_id):
+        """EXPLAIN QUERY PLAN every hot query and return the ones that scan a whole table"""
+        samples = self._plan_samples(user_id)
+
+        full_scans = []
+        with self._connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for key, sql, params in samples:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                for step in cursor.fetchall():
+                    # "SCAN <table>" without an index is a full table scan
+                    detail = step['detail']
+                    if detail.startswith('SCAN ') and 'INDEX' not in detail:
+                        full_scans.append((key, detail.split()[1], None))
+            cursor.close()
+        return full_scans
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+import re
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+        ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+        ('november', 'nov'), ('december', 'dec'),
+    ], 1)
+    for name in names
+}
+
+# Filler words in queries like "that chemistry session from march"; matching
+# them would rank every note that happens to contain them
+IGNORED_WORDS = {
+    'a', 'an', 'and', 'the', 'that', 'this', 'from', 'in', 'on', 'of', 'for', 'with', 'my', 'i', 'to', 'at',
+    'about', 'session', 'sessions',
+}
+
+
+def parse_query(query, today=None):
+    """Split search box text into (words to match, (start, end) of a month or year named in it, or None)
+
+    A month without a year means its most recent occurrence, so in May
+    "march" is this March and "june" last June.
+    """
+    today = today or date.today()
+    words, month, year = [], None, None
+    for token in re.findall(r"\w+", query.lower()):
+        if token in MONTHS:
+            month = MONTHS[token]
+        elif re.fullmatch(r"(19|20)\d\d", token):
+            year = int(token)
+        elif token not in IGNORED_WORDS:
+            words.append(token)
+
+    if month:
+        if year is None:
+            year = today.year if month <= today.month else today.year - 1
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        return words, (start, end)
+    if year:
+        return words, (datetime(year, 1, 1), datetime(year + 1, 1, 1))
+    return words, None
@@ -10,31 +10,13 @@ import subprocess
 import platform
 import json
 import math
-import threading
+import uuid
+from datetime import datetime
+from database import get_database, start_background_connect
+from async_database import FrameTasks, wait_for_async_database
+from write_behind import get_writer
+from write_journal import get_journal
 
-# Database connection function
-def get_database_connection():
-    """Create a database connection using saved config"""
-    try:
-        config_file = "mysql_config.json"
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                mysql_config = json.load(f)
-        else:
-            mysql_config = {
-                'host': 'localhost',
-                'user': 'root',
-                'password': '',
-                'database': 'focus_app',
-                'port': 3306
-            }
-        
-        from database import Database
-        return Database(mysql_config)
-    except Exception as e:  
-        print(f"Database connection error: {e}")
-        return None
-    
 # Initialize pygame
 pygame.init()
 
@@ -305,47 +287,91 @@ class Button:
 
 
 class TodoItem:
-    def __init__(self, text, completed=False):
+    def __init__(self, text, completed=False, client_id=None):
         self.text = text
         self.completed = completed
+        # Stable id chosen here, so the row can be saved (or replayed) before MySQL assigns one
+        self.client_id = client_id or uuid.uuid4().hex
 
 
 class TodoList:
-    def __init__(self, x, y, width, height, user_id, db=None):
+    def __init__(self, x, y, width, height, user_id, tasks=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.user_id = user_id
-        self.db = db  # Reuse database connection
+        self.tasks = tasks  # Loads in the background when given
+        self.loading = False
         self.items = []
         self.input_text = ""
         self.input_active = False
         self.hovered_index = -1
         
+        # Last saved (text, completed) by client_id, diffed against self.items on save
+        self._saved = {}
+        
         # Load todos from database
         self.load_todos()
+    
+    @property
+    def db(self):
+        """The shared Database, or None while it's connecting or unavailable"""
+        return get_database()
         
     def load_todos(self):
         """Load todos from database"""
         try:
-            if self.db:
-                todos = self.db.get_todos(self.user_id)
-                self.items = [TodoItem(todo['task'], todo['completed']) for todo in todos]
-                print(f"Loaded {len(self.items)} todos")
+            if self.tasks:
+                self.loading = True
+                self.tasks.start(self._fetch_todos(), self._loaded, "Loading todos")
+            elif self.db:
+                self._loaded(self.db.get_todos(self.user_id))
         except Exception as e:
             print(f"Error loading todos: {e}")
     
+    async def _fetch_todos(self):
+        adb = await wait_for_async_database()
+        return await adb.get_todos(self.user_id) if adb else []
+    
+    def _loaded(self, todos):
+        """Show todos read from the database, keeping any added while they loaded"""
+        self.loading = False
+        loaded = [TodoItem(todo['task'], todo['completed'], todo['client_id']) for todo in todos]
+        self._saved = {item.client_id: (item.text, item.completed) for item in loaded}
+        self.items = loaded + self.items
+        print(f"Loaded {len(loaded)} todos")
+    
     def save_todos(self):
-        """Save todos to database asynchronously"""
-        def _save_in_background():
-            try:
-                if self.db:
-                    self.db.save_todos(self.user_id, [(item.text, item.completed) for item in self.items])
-                    print("✓ Todos saved")
-            except Exception as e:
-                print(f"Error saving todos: {e}")
-        
-        # Run save in background thread so UI doesn't freeze
-        thread = threading.Thread(target=_save_in_background, daemon=True)
-        thread.start()
+        """Queue a save of changed todos on the background writer"""
+        # Queued saves for this list merge; the one that runs diffs the latest state
+        get_writer().submit(('todos', self.user_id), self._save_changes, "Saving todos")
+    
+    def _save_changes(self):
+        """Write only the rows that differ from the last save (runs on the writer thread)"""
+        # Copy state up front; the UI thread may keep editing while we write
+        items = [(item.client_id, item.text, item.completed) for item in self.items]
+        upserts = [(client_id, text, completed) for client_id, text, completed in items
+                   if self._saved.get(client_id) != (text, completed)]
+        kept = {client_id for client_id, _, _ in items}
+        deletes = [client_id for client_id in self._saved if client_id not in kept]
+        
+        if not (upserts or deletes):
+            return
+        
+        db = self.db
+        saved = (db and db.is_connected() and get_journal().catch_up(db)
+                 and db.save_todo_changes(self.user_id, upserts, deletes))
+        if not saved:
+            # Keep the change in the offline journal, behind any older offline
+            # writes; it is replayed when MySQL is back
+            changes = {'user_id': self.user_id, 'upserts': upserts, 'deletes': deletes}
+            if not get_journal().append('todo_changes', changes):
+                # Nothing recorded as saved, so the next save retries the same diff
+                return False
+        
+        for client_id, text, completed in upserts:
+            self._saved[client_id] = (text, completed)
+        for client_id in deletes:
+            del self._saved[client_id]
+        print(f"✓ Todos saved ({len(upserts)} added or changed, {len(deletes)} removed)")
     
     def handle_event(self, event):
         mouse_pos = pygame.mouse.get_pos()
@@ -447,7 +473,7 @@ class TodoList:
         screen.blit(title, (self.rect.x + 25, self.rect.y + 20))
         
         # Counter (aligned with title)
-        counter_text = f"{completed}/{len(self.items)}"
+        counter_text = "Loading..." if self.loading else f"{completed}/{len(self.items)}"
         counter = small_font.render(counter_text, True, ACCENT_SILVER)
         screen.blit(counter, (self.rect.right - 240, self.rect.y + 23))
         
@@ -539,10 +565,12 @@ class TimerApp:
         self.original_seconds = 1500
         self.start_time = 0
         
-        # Database connection
-        self.db = get_database_connection()
-        if not self.db:
-            print("⚠️ Database connection failed - running in limited mode")
+        # Database connection, opened in the background (as in main.py) so the
+        # window draws at once; the first loads wait for it off the pygame thread
+        start_background_connect()
+        
+        # Database reads finishing in the background, picked up each frame
+        self.tasks = FrameTasks()
         
         # Website blocking
         self.blocking_active = False
@@ -576,33 +604,54 @@ class TimerApp:
         todo_height = 280
         todo_y = SCREEN_HEIGHT//2 + 130  # Below start button with gap
         self.todo_list = TodoList(SCREEN_WIDTH//2 - todo_width//2, todo_y, 
-                                  todo_width, todo_height, user_id, self.db)
+                                  todo_width, todo_height, user_id, self.tasks)
         
         # Timer input
         self.timer_input = ""
         self.timer_input_active = False
         
+        # Last background save failure, shown in the status panel for a few seconds
+        self.save_error = None
+        self.save_error_until = 0
+        
         # Load blocked sites
         self.load_blocked_sites()
         
+    @property
+    def db(self):
+        """The shared Database, or None while it's connecting or unavailable"""
+        return get_database()
+    
     def load_blocked_sites(self):
-        """Load blocked sites from database and write to blocked_sites.txt"""
+        """Start loading blocked sites from database; they are written to blocked_sites.txt when they arrive"""
         try:
-            if self.db:
-                self.blocked_sites = self.db.get_blocked_sites(self.user_id)
-                print(f"📋 Loaded {len(self.blocked_sites)} blocked sites for user {self.username}")
-                
-                # Write to blocked_sites.txt for website_blocker.py to use
-                with open("blocked_sites.txt", "w") as f:
-                    for site in self.blocked_sites:
-                        f.write(site + "\n")
-                print(f"✅ Written {len(self.blocked_sites)} sites to blocked_sites.txt")
-            else:
-                self.blocked_sites = []
-                print("⚠️ No database connection - using empty blocked sites list")
+            self.tasks.start(self._fetch_blocked_sites(), self._blocked_sites_loaded, "Loading blocked sites")
         except Exception as e:
             print(f"❌ Error loading blocked sites: {e}")
             self.blocked_sites = []
+    
+    async def _fetch_blocked_sites(self):
+        adb = await wait_for_async_database()
+        return await adb.get_blocked_sites(self.user_id) if adb else None
+    
+    def _blocked_sites_loaded(self, sites):
+        if sites is None:
+            # Leave blocked_sites.txt as the last successful load wrote it
+            self.blocked_sites = []
+            print("⚠️ No database connection - using empty blocked sites list")
+            return
+        self.blocked_sites = sites
+        print(f"📋 Loaded {len(self.blocked_sites)} blocked sites for user {self.username}")
+        
+        # Write to blocked_sites.txt for website_blocker.py to use
+        with open("blocked_sites.txt", "w") as f:
+            for site in self.blocked_sites:
+                f.write(site + "\n")
+        print(f"✅ Written {len(self.blocked_sites)} sites to blocked_sites.txt")
+        
+        # Started while the list was still loading: block now that there's something to block
+        if self.running and not self.paused:
+            self.activate_blocking()
 
     def handle_event(self, event):
         mouse_pos = pygame.mouse.get_pos()
@@ -733,6 +782,7 @@ class TimerApp:
         self.start_stop_button.color = BUTTON_DANGER
         self.original_seconds = self.remaining_seconds
         self.start_time = time.time()
+        # If the site list is still loading, _blocked_sites_loaded() blocks once it arrives
         self.activate_blocking()
         
     def stop_timer(self):
@@ -763,12 +813,27 @@ class TimerApp:
         
         # Record study time
         study_minutes = self.original_seconds // 60
-        if study_minutes > 0 and self.db:
-            try:
-                self.db.record_study_session(self.user_id, study_minutes)
-                print(f"✅ Recorded {study_minutes} minutes for {self.username}")
-            except Exception as e:
-                print(f"Error recording session: {e}")
+        if study_minutes > 0:
+            # Fixed now so a replay from the offline journal records the same session
+            session = {
+                'user_id': self.user_id,
+                'duration_minutes': study_minutes,
+                'client_id': uuid.uuid4().hex,
+                'start_time': datetime.now().isoformat(" ", "seconds"),
+            }
+            
+            def _record():
+                db = self.db
+                if db and db.is_connected() and get_journal().catch_up(db) and db.record_study_session(
+                        self.user_id, study_minutes, client_id=session['client_id'],
+                        start_time=datetime.fromisoformat(session['start_time'])) is not None:
+                    print(f"✅ Recorded {study_minutes} minutes for {self.username}")
+                    return
+                # MySQL unreachable, or older offline writes still queued: keep the session behind them
+                return get_journal().append('session', session)
+            
+            # Each session is its own write, so key it uniquely rather than merging
+            get_writer().submit(('session', session['client_id']), _record, "Recording study session")
         
         # Reset timer to original time
         self.remaining_seconds = 1500
@@ -776,6 +841,9 @@ class TimerApp:
             
     def go_back(self):
         self.deactivate_blocking()
+        # Don't leave todo or session writes behind when switching screens
+        if not get_writer().flush():
+            print("⚠️ Some changes may not have been saved")
         if hasattr(self.video_bg, 'cap'):
             self.video_bg.release()
         pygame.quit()
@@ -889,6 +957,10 @@ class TimerApp:
             else:
                 status_text = "Click timer to edit • Click START to begin"
                 status_color = ACCENT_SILVER
+        
+        if self.save_error and time.time() < self.save_error_until:
+            status_text = f"⚠ {self.save_error}"
+            status_color = DANGER_RED
                 
         status_surf = text_font.render(status_text, True, status_color)
         status_text_rect = status_surf.get_rect(center=status_rect.center)
@@ -911,6 +983,15 @@ class TimerApp:
                 else:
                     self.handle_event(event)
             
+            # Hand finished background loads to the screen
+            self.tasks.poll()
+            
+            # Pick up failures from the background writer without waiting on it
+            errors = get_writer().pop_errors()
+            if errors:
+                self.save_error = errors[-1]
+                self.save_error_until = time.time() + 5
+            
             self.update_timer()
             self.draw(screen)
             
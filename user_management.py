@@ -4,10 +4,14 @@ import json
 import os
 import hashlib
 import subprocess
+from database import get_database, start_background_connect, database_status, DB_AVAILABLE
 
 # Initialize pygame
 pygame.init()
 
+# Open the database in the background (as in main.py) so the screen draws at once
+start_background_connect()
+
 # Screen dimensions
 SCREEN_INFO = pygame.display.Info()
 SCREEN_WIDTH, SCREEN_HEIGHT = SCREEN_INFO.current_w, SCREEN_INFO.current_h
@@ -42,28 +46,6 @@ def hash_password(password):
     '''Hash password using SHA-256'''
     return hashlib.sha256(password.encode()).hexdigest()
 
-def get_database_connection():
-    """Create a database connection"""
-    try:
-        config_file = "mysql_config.json"
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                mysql_config = json.load(f)
-        else:
-            mysql_config = {
-                'host': 'localhost',
-                'user': 'root',
-                'password': '',
-                'database': 'focus_app',
-                'port': 3306
-            }
-        
-        from database import Database
-        return Database(mysql_config)
-    except Exception as e:  
-        print(f"Database connection error: {e}")
-        return None
-
 def create_user(username, password):
     """Create a new user in database with hashed password"""
     try:
@@ -79,31 +61,16 @@ def create_user(username, password):
         if len(password) < 4:
             return False, "Password must be at least 4 characters"
         
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            
+        db = get_database()
+        if db and db.is_connected():
             # Check if username already exists
-            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-            if cursor.fetchone():
-                cursor.close()
-                db.connection.close()
+            if db.get_user_by_username(username):
                 return False, "Username already exists"
             
             # Hash password and insert
-            try:
-                password_hash = hash_password(password)
-                cursor.execute("INSERT INTO users (username, password_hash) VALUES (%s, %s)", 
-                              (username, password_hash))
-                db.connection.commit()
-                cursor.close()
-                db.connection.close()
+            if db.create_user(username, password):
                 return True, "User created successfully!"
-            except Exception as e:
-                print(f"Failed to create user: {e}")
-                cursor.close()
-                db.connection.close()
-                return False, f"Failed to create user: {str(e)[:200]}"
+            return False, "Failed to create user"
                 
     except Exception as e:
         error_str = str(e)
@@ -127,17 +94,9 @@ def create_user(username, password):
 
 def get_all_users():
     """Get all users from database"""
-    try:
-        db = get_database_connection()
-        if db and db.connection:
-            cursor = db.connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM users ORDER BY username")
-            users = cursor.fetchall()
-            cursor.close()
-            db.connection.close()
-            return users
-    except Exception as e:
-        print(f"Error loading users: {e}")
+    db = get_database()
+    if db:
+        return db.get_all_users()
     return []
 
 class Button:
@@ -212,8 +171,9 @@ def user_management_screen(first_time=False):
     message = ""
     message_color = TEXT_COLOR
     
-    # Cache existing users
+    # Cache existing users (again once the database is open, if it isn't yet)
     existing_users = get_all_users()
+    db_available = database_status() == DB_AVAILABLE
     
     if first_time:
         message = "Welcome! Please create your first user account."
@@ -248,6 +208,12 @@ def user_management_screen(first_time=False):
     while running:
         mouse_pos = pygame.mouse.get_pos()
         
+        if not db_available and database_status() == DB_AVAILABLE:
+            db_available = True
+            existing_users = get_all_users()
+            if not continue_button and existing_users:
+                continue_button = Button(SCREEN_WIDTH - 200, 50, 150, 50, "Continue →")
+        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return None
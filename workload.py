@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import random
+import statistics
+import time
+import uuid
+
+import mysql.connector
+
+import query_stats
+from database import connect_args, open_database
+
+# Hour-of-day weights: late morning, afternoon and an evening peak
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 1, 2, 4, 6, 9, 10, 9, 6, 7, 9, 10, 9, 7, 6, 8, 10, 9, 6, 3]
+# Monday..Sunday; students study less on Saturday
+WEEKDAY_WEIGHTS = [10, 10, 9, 9, 7, 4, 6]
+DURATIONS = [15, 25, 25, 25, 30, 45, 50, 50, 60, 90]
+FOCUS_RATINGS = [None, None, 1, 2, 3, 3, 4, 4, 4, 5]
+SUBJECTS = [None, "math", "physics", "chemistry", "history", "english", "cs", "biology", "economics"]
+SITES = ["youtube.com", "reddit.com", "twitter.com", "instagram.com", "tiktok.com", "netflix.com",
+         "facebook.com", "twitch.tv", "discord.com", "news.ycombinator.com"]
+
+SESSIONS_PER_DAY = 3  # average, used to spread a user's history over past days
+GENERATE_BATCH_SIZE = 1000
+
+DEFAULT_SIZES = (1000, 100000)
+DEFAULT_SESSIONS_PER_USER = 2000  # about two years of history
+BENCHMARK_REPEAT = 20
+BENCHMARK_USERS = 10  # users sampled per method
+
+
+def _session_times(rng, count, now):
+    """Yield start times over the last count / SESSIONS_PER_DAY days with realistic weights
+
+    Times on today can be later than now; generate() clamps them.
+    """
+    days = max(1, count // SESSIONS_PER_DAY)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_offsets = range(days)
+    # Weight each past day by its weekday
+    day_weights = [WEEKDAY_WEIGHTS[(today - timedelta(days=offset)).weekday()] for offset in day_offsets]
+    for offset in rng.choices(day_offsets, day_weights, k=count):
+        hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+        yield today - timedelta(days=offset, hours=-hour, minutes=-rng.randrange(60))
+
+
+def generate(db, users=10, sessions_per_user=DEFAULT_SESSIONS_PER_USER, todos_per_user=20, sites_per_user=5, seed=1):
+    """Fill db with synthetic users and their sessions, todos and blocked sites; returns the user ids"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    run = uuid.uuid4().hex[:8]
+    user_ids = []
+
+    for n in range(users):
+        user_id = db.create_user(f"bench_{run}_{n}", "password")
+        if user_id is None:
+            raise RuntimeError("Could not create benchmark user")
+        user_ids.append(user_id)
+
+        batch = []
+        for start_time in _session_times(rng, sessions_per_user, now):
+            duration = rng.choice(DURATIONS)
+            batch.append({
+                'user_id': user_id,
+                # Today's later hours would be in the future; end those sessions now instead
+                'start_time': min(start_time, now - timedelta(minutes=duration)),
+                'duration_minutes': duration,
+                'focus_rating': rng.choice(FOCUS_RATINGS),
+                'subject_tag': rng.choice(SUBJECTS),
+                'distractions_count': rng.randrange(5),
+            })
+            if len(batch) >= GENERATE_BATCH_SIZE:
+                if db.record_study_sessions(batch) is None:
+                    raise RuntimeError("Could not record benchmark sessions")
+                batch = []
+        if batch and db.record_study_sessions(batch) is None:
+            raise RuntimeError("Could not record benchmark sessions")
+
+        todos = [(uuid.uuid4().hex, f"Task {i}", rng.random() < 0.4) for i in range(todos_per_user)]
+        db.save_todo_changes(user_id, upserts=todos)
+        for site in rng.sample(SITES, min(sites_per_user, len(SITES))):
+            db.add_blocked_site(user_id, site)
+
+        print(f"  user {n + 1}/{users}: {sessions_per_user} sessions")
+    return user_ids
+
+
+def _time_calls(fn, args_list, repeat):
+    """Run fn over args_list repeat times; returns per-call latencies in ms"""
+    latencies = []
+    for i in range(repeat):
+        args = args_list[i % len(args_list)]
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        'calls': len(ordered),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[max(0, int(len(ordered) * 0.95) - 1)], 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def benchmark_methods(db, user_ids, repeat=BENCHMARK_REPEAT):
+    """Time every Database read and write method against existing data"""
+    users = [(user_id,) for user_id in user_ids[:BENCHMARK_USERS]]
+    usernames = [(user['username'],) for user in db.get_all_users()[:BENCHMARK_USERS]]
+    now = datetime.now()
+
+    cases = [
+        # What AnalyticsDashboard.get_personal_analytics runs
+        ('get_study_analytics[sequential]', lambda u: db.get_study_analytics(u, 'sequential'), users),
+        ('get_study_analytics[batch]', lambda u: db.get_study_analytics(u, 'batch'), users),
+        ('get_study_analytics[parallel]', lambda u: db.get_study_analytics(u, 'parallel'), users),
+        ('get_completed_todos', db.get_completed_todos, users),
+        ('get_recent_sessions', db.get_recent_sessions, users),
+        # First and a deep page of history cost the same with keyset paging
+        ('get_session_history[first]', db.get_session_history, users),
+        ('get_session_history[deep]', lambda u: db.get_session_history(u, (now - timedelta(days=500), 0)), users),
+        ('get_study_time_by_period', db.get_study_time_by_period, users),
+        ('get_todos', db.get_todos, users),
+        ('get_blocked_sites', db.get_blocked_sites, users),
+        ('get_all_users', db.get_all_users, [()]),
+        ('get_user_by_username', db.get_user_by_username, usernames),
+        ('get_user_by_id', db.get_user_by_id, users),
+        ('verify_user', lambda name: db.verify_user(name, "password"), usernames),
+        ('record_study_session', lambda u: db.record_study_session(u, 25, 4, "bench", start_time=now), users),
+        ('save_todo_changes', lambda u: db.save_todo_changes(u, [(uuid.uuid4().hex, "bench", False)]), users),
+        ('add_blocked_site', lambda u: db.add_blocked_site(u, f"bench-{uuid.uuid4().hex[:8]}.com"), users),
+    ]
+
+    results = {}
+    for name, fn, args_list in cases:
+        results[name] = _summarize(_time_calls(fn, args_list, repeat))
+        print(f"  {name:<36} median {results[name]['median_ms']:>9.2f} ms   p95 {results[name]['p95_ms']:>9.2f} ms")
+    return results
+
+
+def _open_for_size(config, size):
+    """A fresh Database for one benchmark size: its own SQLite file or MySQL schema
+
+    The read cache is off, so every repeat times the query rather than a cache hit.
+    """
+    config = dict(config, cache_size=0)
+    if config.get('backend') == 'sqlite':
+        path = f"bench_{size}.db"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        config['sqlite_path'] = path
+    else:
+        name = f"focus_bench_{size}"
+        server = connect_args(config)
+        server.pop('database', None)
+        conn = mysql.connector.connect(**server)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        cursor.execute(f"CREATE DATABASE {name}")
+        cursor.close()
+        conn.close()
+        config['database'] = name
+    db = open_database(config)
+    if not db.is_connected():
+        raise RuntimeError(f"Could not open benchmark database for {size} sessions")
+    return db
+
+
+def run_benchmark(config, sizes=DEFAULT_SIZES, sessions_per_user=DEFAULT_SESSIONS_PER_USER, repeat=BENCHMARK_REPEAT):
+    """Generate each dataset size from scratch, time every method on it, and return a report dict"""
+    report = {
+        'created_at': datetime.now().isoformat(" ", "seconds"),
+        'backend': config.get('backend', 'mysql'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sessions_per_user': sessions_per_user,
+        'sizes': {},
+    }
+    for size in sizes:
+        users = max(1, size // sessions_per_user)
+        print(f"\n=== {size} sessions ({users} users) ===")
+        db = _open_for_size(config, size)
+
+        start = time.perf_counter()
+        user_ids = generate(db, users=users, sessions_per_user=min(size, sessions_per_user))
+        load_seconds = time.perf_counter() - start
+        print(f"  generated in {load_seconds:.1f}s")
+
+        stats = query_stats.get_stats()
+        stats.reset()
+        report['sizes'][str(size)] = {
+            'users': users,
+            'generate_seconds': round(load_seconds, 2),
+            'methods': benchmark_methods(db, user_ids, repeat),
+            'statements': stats.format_summary(),
+        }
+    return report
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def compare_reports(old, new):
+    """Lines comparing median latency per method between two reports"""
+    lines = []
+    for size, result in new['sizes'].items():
+        before = old.get('sizes', {}).get(size)
+        if not before:
+            continue
+        lines.append(f"{size} sessions:")
+        for method, timing in result['methods'].items():
+            previous = before['methods'].get(method)
+            if not previous or not previous['median_ms']:
+                continue
+            ratio = timing['median_ms'] / previous['median_ms']
+            lines.append(f"  {method:<36} {previous['median_ms']:>9.2f} -> {timing['median_ms']:>9.2f} ms  ({ratio:.2f}x)")
+    return lines
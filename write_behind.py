@@ -0,0 +1,142 @@
+from collections import OrderedDict, deque
+import atexit
+import threading
+import time
+
+# Seconds to hold a write so rapid clicks on the same thing merge into one
+DEFAULT_FLUSH_DELAY = 0.5
+
+# Seconds to keep waiting for queued writes when the window closes
+SHUTDOWN_TIMEOUT = 10
+
+# Failures kept for the UI to pick up; older ones are dropped
+MAX_ERRORS = 20
+
+
+class WriteBehindQueue:
+    """Single background writer that runs queued database writes in order
+
+    Writes are submitted under a key. A newer write with the same key
+    replaces the pending one (latest state wins) and moves to the back of
+    the queue, so what reaches MySQL is always in submission order.
+    """
+
+    def __init__(self, flush_delay=DEFAULT_FLUSH_DELAY):
+        self.flush_delay = flush_delay
+        self._pending = OrderedDict()  # key -> (description, write)
+        self._in_flight = False
+        self._flush_requested = False
+        self._closed = False
+        self._errors = deque(maxlen=MAX_ERRORS)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, key, write, description="Saving"):
+        """Queue write() to run on the writer thread, replacing any pending write with this key"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write queue is closed")
+            self._pending.pop(key, None)
+            self._pending[key] = (description, write)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self):
+        """Writer thread: wait out the coalescing window, then run everything pending"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give follow-up clicks a moment to replace this write
+                deadline = time.monotonic() + self.flush_delay
+                while not self._closed and not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = list(self._pending.values())
+                self._pending.clear()
+                self._in_flight = True
+
+            for description, write in batch:
+                try:
+                    if write() is False:
+                        self._report(f"{description} failed")
+                except Exception as e:
+                    self._report(f"{description} failed: {e}")
+
+            with self._cond:
+                self._in_flight = False
+                self._cond.notify_all()
+
+    def _report(self, message):
+        print(f"❌ {message}")
+        with self._cond:
+            self._errors.append(message)
+
+    def pop_errors(self):
+        """Return and clear failures since the last call (polled by the UI)"""
+        with self._cond:
+            errors = list(self._errors)
+            self._errors.clear()
+            return errors
+
+    def pending(self):
+        """True while any write is queued or running"""
+        with self._cond:
+            return bool(self._pending) or self._in_flight
+
+    def flush(self, timeout=SHUTDOWN_TIMEOUT):
+        """Run queued writes now and wait for them; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # Cut the coalescing wait short
+            self._flush_requested = True
+            self._cond.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_requested = False
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """Flush, then stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        done = self.flush(timeout)
+        if not done:
+            print("⚠️ Some changes were still saving when the app closed")
+        return done
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the write queue shared by every screen in this process"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehindQueue()
+        return _writer
+
+
+def close_writer():
+    """Flush outstanding writes (registered to run at exit)"""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.close()
+
+
+atexit.register(close_writer)
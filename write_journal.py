@@ -0,0 +1,238 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import mysql.connector
+
+JOURNAL_FILE = "pending_writes.jsonl"
+
+# Entries being replayed are moved here first, so new offline writes can
+# keep appending to JOURNAL_FILE while a replay is running
+REPLAY_FILE = JOURNAL_FILE + ".replaying"
+
+# Entries MySQL rejected outright (e.g. their user was deleted); kept for
+# inspection instead of blocking the journal forever
+REJECTED_FILE = JOURNAL_FILE + ".rejected"
+
+# Every screen runs in its own process and may journal or replay, so the
+# files are guarded by OS locks on these, not just a threading.Lock:
+# appends and the move to REPLAY_FILE exclude each other, and only one
+# process replays at a time
+LOCK_SUFFIX = ".lock"
+
+REPLAY_BATCH_SIZE = 100
+REPLAY_INTERVAL = 30  # seconds between checks for pending writes
+
+# Errors that mean "database unreachable", as opposed to a bad entry
+OUTAGE_ERRORS = (
+    mysql.connector.errors.InterfaceError,
+    mysql.connector.errors.OperationalError,
+    mysql.connector.errors.PoolError,
+)
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """Hold an exclusive lock on path across processes; yields False if it's taken and not blocking"""
+    with open(path, 'a+b') as f:
+        locked = False
+        while not locked:
+            try:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                locked = True
+            except OSError:
+                if fcntl and blocking:
+                    raise
+                if not blocking:
+                    break
+                time.sleep(0.05)
+        try:
+            yield locked
+        finally:
+            if locked:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_entries(path):
+    """Read journal entries, skipping a torn last line from a crash mid-write"""
+    entries = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"⚠️ Skipping unreadable line in {path}")
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _write_entries(path, entries, mode='w'):
+    """Write entries as JSON lines and fsync before returning"""
+    with open(path, mode, encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _rewrite_entries(path, entries):
+    """Replace a file's entries atomically, so a crash leaves the old or new list, never half"""
+    temp_path = path + ".tmp"
+    _write_entries(temp_path, entries)
+    os.replace(temp_path, path)
+
+
+class WriteJournal:
+    """Append-only file of writes that could not reach the database"""
+
+    def __init__(self, path=JOURNAL_FILE, replay_path=REPLAY_FILE, rejected_path=REJECTED_FILE):
+        self.path = path
+        self.replay_path = replay_path
+        self.rejected_path = rejected_path
+        self._lock = threading.Lock()
+
+    def append(self, op, args):
+        """Durably record a write for later replay; returns False if it could not be saved"""
+        entry = {
+            'id': uuid.uuid4().hex,
+            'op': op,
+            'args': args,
+            'queued_at': datetime.now().isoformat(" ", "seconds"),
+        }
+        try:
+            with self._lock, _file_lock(self.path + LOCK_SUFFIX):
+                _write_entries(self.path, [entry], mode='a')
+            print(f"💾 Saved {op} offline; it will sync when the database is back")
+            return True
+        except OSError as e:
+            print(f"❌ Could not save {op} offline: {e}")
+            return False
+
+    def has_pending(self):
+        """True if any writes are waiting to be replayed"""
+        return any(os.path.exists(path) and os.path.getsize(path) > 0
+                   for path in (self.replay_path, self.path))
+
+    def catch_up(self, db):
+        """Replay anything pending before a direct write, so the write lands after it
+
+        True if nothing is left pending and the caller can write to db. False
+        if entries remain (the database dropped, or another process is
+        replaying them); the caller should then journal its write as well,
+        so it is applied behind them rather than overwritten by them.
+        """
+        if not self.has_pending():
+            return True
+        self.replay(db)
+        return not self.has_pending()
+
+    def _claim(self):
+        """Take the oldest pending entries: a replay left unfinished, else the whole journal
+
+        Call with the replay lock held.
+        """
+        with self._lock, _file_lock(self.path + LOCK_SUFFIX):
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.path):
+                    return []
+                os.replace(self.path, self.replay_path)
+        return _read_entries(self.replay_path)
+
+    def replay(self, db, batch_size=REPLAY_BATCH_SIZE):
+        """Apply pending entries in batches; stops at the first outage and keeps the rest
+
+        Does nothing if another process is already replaying.
+        """
+        with _file_lock(self.replay_path + LOCK_SUFFIX, blocking=False) as locked:
+            if not locked:
+                return 0
+            return self._replay(db, batch_size)
+
+    def _replay(self, db, batch_size):
+        entries = self._claim()
+        applied = 0
+
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            try:
+                db.replay_writes(batch)
+                applied += len(batch)
+                continue
+            except OUTAGE_ERRORS as err:
+                print(f"Database unavailable while replaying ({err}); will retry")
+                _rewrite_entries(self.replay_path, entries[start:])
+                return applied
+            except mysql.connector.Error:
+                pass
+
+            # Something in the batch is bad; find it one entry at a time
+            for offset, entry in enumerate(batch):
+                try:
+                    db.replay_writes([entry])
+                    applied += 1
+                except OUTAGE_ERRORS as err:
+                    print(f"Database unavailable while replaying ({err}); will retry")
+                    _rewrite_entries(self.replay_path, entries[start + offset:])
+                    return applied
+                except mysql.connector.Error as err:
+                    print(f"❌ Rejected offline {entry['op']}: {err}")
+                    _write_entries(self.rejected_path, [dict(entry, error=str(err))], mode='a')
+
+        if os.path.exists(self.replay_path):
+            os.remove(self.replay_path)
+        if applied:
+            print(f"✅ Synced {applied} offline write(s)")
+        return applied
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Return the journal shared by every screen in this process"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = WriteJournal()
+        return _journal
+
+
+def start_replayer(get_db, interval=REPLAY_INTERVAL):
+    """Start a daemon thread that replays the journal whenever the database is reachable"""
+    journal = get_journal()
+
+    def _run():
+        while True:
+            try:
+                if journal.has_pending():
+                    db = get_db()
+                    if db and (db.is_connected() or db.connect()):
+                        journal.replay(db)
+            except Exception as e:
+                print(f"Error replaying offline writes: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_run, name="journal-replayer", daemon=True)
+    thread.start()
+    return thread